@@ -0,0 +1,89 @@
+"""
+Cache Hit Benchmark
+Author: fdyytu
+Created at: 2026-10-18 08:10:00 UTC
+
+Bandingkan latency hit memory cache:
+- before: memory cache menyimpan string JSON, setiap hit json.loads
+- after:  memory cache menyimpan object hidup, setiap hit copy struktural
+
+Jalankan: python bench_cache.py [iterations]
+Memakai database sementara, shop.db tidak disentuh.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import database
+
+def _sample_values():
+    from ext.constants import Balance
+    now = datetime.now(timezone.utc)
+    return {
+        'balance_growid': Balance(150, 20, 3),
+        'all_products': [
+            {
+                'code': f"P{i:03d}", 'name': f"Product {i}", 'price': 100 + i,
+                'description': "Lorem ipsum dolor sit amet", 'created_at': now.isoformat()
+            }
+            for i in range(30)
+        ],
+        'trx_history_growid': [
+            {
+                'id': i, 'growid': 'growid', 'type': 'PURCHASE', 'details': f"Bought P{i:03d}",
+                'old_balance': '1,000 WL', 'new_balance': '900 WL', 'created_at': now.isoformat()
+            }
+            for i in range(10)
+        ],
+        'rate_limit:user:1': {'commands': [time.time() - i for i in range(20)], 'last_reset': time.time()},
+        'cooldown:1:buy': time.time()
+    }
+
+def _bench(func, iterations: int) -> float:
+    """Rata-rata mikrodetik per panggilan"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+async def _bench_async(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+async def run(iterations: int = 20000):
+    from ext.cache_manager import CacheManager, CustomJSONDecoder, CustomJSONEncoder, _copy_value
+
+    cache = CacheManager()
+    values = _sample_values()
+    for key, value in values.items():
+        await cache.set(key, value, expires_in=3600)
+
+    print(f"{'key':<22}{'before (us)':>12}{'after (us)':>12}{'get() (us)':>12}{'speedup':>10}")
+    for key, value in values.items():
+        serialized = json.dumps(value, cls=CustomJSONEncoder)
+        entry = cache.memory_cache.get(key)
+
+        before = _bench(lambda: json.loads(serialized, cls=CustomJSONDecoder), iterations)
+        after = _bench(lambda: _copy_value(entry.value), iterations)
+        full = await _bench_async(lambda: cache.get(key), iterations)
+        print(f"{key:<22}{before:>12.2f}{after:>12.2f}{full:>12.2f}{before / after:>9.1f}x")
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, 'bench.db')
+        database.setup_database()
+        try:
+            asyncio.run(run(iterations))
+        finally:
+            database.close_pool()
+
+if __name__ == "__main__":
+    main()
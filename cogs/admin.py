@@ -28,7 +28,8 @@ from ext.constants import (
     MAX_STOCK_FILE_SIZE,
     VALID_STOCK_FORMATS,
     Permissions,
-    Stock 
+    Stock,
+    Database
 )
 
 # Import services
@@ -37,8 +38,12 @@ from ext.balance_manager import BalanceManagerService
 from ext.product_manager import ProductManagerService
 from ext.trx import TransactionManager
 from ext.cache_manager import CacheManager
-from ext.base_handler import BaseLockHandler, BaseResponseHandler
+from ext.base_handler import BaseLockHandler, BaseResponseHandler, get_lock_metrics, reset_lock_metrics
 from utils.command_handler import AdvancedCommandHandler
+from query_profiler import profiler as query_profiler
+from db_archive import ArchiveError, list_archives, search_archive
+from db_backup import BackupError, list_snapshots
+from ext.db_maintenance import BackupProgress
 
 class AdminCog(commands.Cog, BaseLockHandler, BaseResponseHandler):
     def __init__(self, bot):
@@ -696,22 +701,455 @@ class AdminCog(commands.Cog, BaseLockHandler, BaseResponseHandler):
             
             # Cache Stats
             cache_stats = await self.cache_manager.get_stats()
+            loader = cache_stats['loader']
             embed.add_field(
                 name="📊 Cache Statistics",
                 value=(
                     f"```yml\n"
-                    f"Items: {cache_stats['items']}\n"
-                    f"Hit Rate: {cache_stats['hit_rate']:.1f}%\n"
+                    f"Items: {cache_stats['items']} memory / {cache_stats['database']['items']} stored\n"
+                    f"Hit Rate: {cache_stats['hit_rate']:.1f}% "
+                    f"(L1 {cache_stats['l1_hit_rate']:.1f}% / L2 {cache_stats['l2_hit_rate']:.1f}%)\n"
+                    f"Lookups: {cache_stats['lookups']} ({cache_stats['misses']} misses)\n"
+                    f"Evictions: {cache_stats['evictions']} / Expired: {cache_stats['expirations']}\n"
                     f"Memory Usage: {cache_stats['memory_usage']:.1f}MB\n"
-                    f"```"
+                    f"Stored Size: {cache_stats['database']['bytes']/1024/1024:.1f}MB (avg {cache_stats['avg_size']}B)\n"
+                    f"Pending Writes: {cache_stats['pending_writes']}\n"
+                    f"Loader: p50 {loader['p50_ms']:.1f}ms / p95 {loader['p95_ms']:.1f}ms / p99 {loader['p99_ms']:.1f}ms\n"
+                    + (
+                        f"Warm-up: {cache_stats['warmup']['seconds']:.2f}s "
+                        f"({sum(cache_stats['warmup']['rows'].values())} rows)\n"
+                        if cache_stats['warmup'] else ""
+                    )
+                    + "```"
                 ),
                 inline=False
             )
+
+            # Namespace dengan lookup terbanyak
+            namespaces = sorted(
+                cache_stats['namespaces'].items(),
+                key=lambda item: item[1]['lookups'],
+                reverse=True
+            )[:8]
+            if namespaces:
+                lines = [
+                    f"{name:<12} {ns['hit_rate']:5.1f}% L1 {ns['l1_hits']} L2 {ns['l2_hits']} "
+                    f"miss {ns['misses']} ev {ns['evictions']} ~{ns['avg_size']}B "
+                    f"p95 {ns['loader']['p95_ms']:.0f}ms"
+                    for name, ns in namespaces
+                ]
+                embed.add_field(
+                    name="🗂️ Cache Namespaces",
+                    value="```yml\n" + "\n".join(lines)[:1000] + "\n```",
+                    inline=False
+                )
             
             await self.send_response_once(ctx, embed=embed)
             
         await self._process_command(ctx, "systeminfo", execute)
 
+    @commands.command(name="dbprofile")
+    async def db_profile(self, ctx, action: str = "show", limit: int = 10):
+        """Show or control the SQL query profiler (show/on/off/reset)"""
+        async def execute():
+            action_lower = action.lower()
+            if action_lower not in ['show', 'on', 'off', 'reset']:
+                raise ValueError("Please specify 'show', 'on', 'off' or 'reset'")
+
+            if action_lower == 'on':
+                query_profiler.enable()
+            elif action_lower == 'off':
+                query_profiler.disable()
+            elif action_lower == 'reset':
+                query_profiler.reset()
+
+            stats = query_profiler.get_stats()
+            embed = discord.Embed(
+                title="🐢 Query Profiler",
+                color=COLORS.INFO if stats['enabled'] else COLORS.WARNING,
+                timestamp=datetime.now(timezone.utc)
+            )
+            embed.add_field(
+                name="📊 Summary",
+                value=(
+                    f"```yml\n"
+                    f"Enabled: {stats['enabled']}\n"
+                    f"Since: {stats['started_at'] or '-'}\n"
+                    f"Statements: {stats['statements']}\n"
+                    f"Rows: {stats['rows']}\n"
+                    f"Total Time: {stats['total_ms']:.1f}ms (avg {stats['avg_ms']:.2f}ms)\n"
+                    f"Slow (>= {stats['slow_threshold_ms']}ms): {stats['slow']}\n"
+                    f"```"
+                ),
+                inline=False
+            )
+
+            for i, entry in enumerate(query_profiler.get_slow_queries()[:min(max(1, limit), 20)], 1):
+                sql = entry['sql'] if len(entry['sql']) <= 300 else entry['sql'][:297] + "..."
+                plan = "\n".join(entry['plan'] or [])[:300]
+                embed.add_field(
+                    name=f"#{i} {entry['elapsed_ms']:.1f}ms • {entry['rows']} rows • {entry['module']}",
+                    value=(
+                        f"```sql\n{sql}\n```"
+                        + (f"```\n{plan}\n```" if plan else "")
+                    ),
+                    inline=False
+                )
+
+            embed.set_footer(text="!dbprofile [show|on|off|reset] [limit]")
+            await self.send_response_once(ctx, embed=embed)
+
+        await self._process_command(ctx, "dbprofile", execute)
+
+    @commands.command(name="locks")
+    async def lock_metrics(self, ctx, action: str = "show", limit: int = 10):
+        """Show lock contention per key prefix (show/reset)"""
+        async def execute():
+            action_lower = action.lower()
+            if action_lower not in ['show', 'reset']:
+                raise ValueError("Please specify 'show' or 'reset'")
+            if action_lower == 'reset':
+                reset_lock_metrics()
+
+            metrics = get_lock_metrics()
+            registries = metrics['registries'].values()
+            prefixes = sorted(
+                metrics['prefixes'].items(),
+                key=lambda item: (item[1]['timeouts'], item[1]['wait_p95_ms'], item[1]['contended']),
+                reverse=True
+            )[:min(max(1, limit), 20)]
+
+            embed = discord.Embed(
+                title="🔒 Lock Contention",
+                color=COLORS.WARNING if any(stats['timeouts'] for _, stats in prefixes) else COLORS.INFO,
+                timestamp=datetime.now(timezone.utc)
+            )
+            embed.add_field(
+                name="📊 Summary",
+                value=(
+                    f"```yml\n"
+                    f"Registries: {len(metrics['registries'])}\n"
+                    f"Live Locks: {sum(r['live'] for r in registries)} "
+                    f"(held {sum(r['held'] for r in registries)}, peak {sum(r['peak'] for r in registries)})\n"
+                    f"Waiters: {sum(r['waiters'] for r in registries)}\n"
+                    f"Acquired: {sum(r['acquired'] for r in registries)}\n"
+                    f"Timeouts: {sum(r['timeouts'] for r in registries)}\n"
+                    f"Reaped: {sum(r['reaped'] for r in registries)}\n"
+                    f"```"
+                ),
+                inline=False
+            )
+
+            for prefix, stats in prefixes:
+                histogram = " ".join(
+                    f"{bucket}:{count}" for bucket, count in stats['wait_histogram'].items() if count
+                )
+                embed.add_field(
+                    name=f"{prefix}* • {stats['acquired']} acquired • {stats['timeouts']} timeouts",
+                    value=(
+                        f"```yml\n"
+                        f"Contended: {stats['contended']} / Waiting: {stats['waiters']}\n"
+                        f"Wait: p50 {stats['wait_p50_ms']:.1f}ms / p95 {stats['wait_p95_ms']:.1f}ms / "
+                        f"p99 {stats['wait_p99_ms']:.1f}ms / max {stats['wait_max_ms']:.1f}ms\n"
+                        f"Hold: p50 {stats['hold_p50_ms']:.1f}ms / p95 {stats['hold_p95_ms']:.1f}ms / "
+                        f"p99 {stats['hold_p99_ms']:.1f}ms / max {stats['hold_max_ms']:.1f}ms\n"
+                        f"Wait Histogram: {histogram or '-'}\n"
+                        f"```"
+                    ),
+                    inline=False
+                )
+
+            embed.set_footer(text="!locks [show|reset] [limit]")
+            await self.send_response_once(ctx, embed=embed)
+
+        await self._process_command(ctx, "locks", execute)
+
+    def _get_db_maintenance(self):
+        maintenance = self.bot.get_cog('DatabaseMaintenance')
+        if not maintenance:
+            raise ValueError("Database maintenance service is not loaded")
+        return maintenance
+
+    async def _run_with_progress(self, ctx, title: str, progress: BackupProgress, coro) -> Any:
+        """Jalankan operasi database panjang sambil meng-update pesan progress"""
+        def progress_embed() -> discord.Embed:
+            return discord.Embed(
+                title=title,
+                description=(
+                    f"```yml\n"
+                    f"Progress: {progress.percent:.0f}%\n"
+                    f"Pages: {progress.copied}/{progress.total}\n"
+                    f"```"
+                ),
+                color=COLORS.INFO
+            )
+
+        message = await ctx.send(embed=progress_embed())
+        task = asyncio.create_task(coro)
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=2)
+                if not task.done():
+                    await message.edit(embed=progress_embed())
+            return task.result()
+        finally:
+            await message.delete()
+
+    @commands.command(name="backup")
+    async def backup(self, ctx, action: str = "now"):
+        """Create or list database snapshots (now/list)"""
+        async def execute():
+            action_lower = action.lower()
+            if action_lower not in ['now', 'list']:
+                raise ValueError("Please specify 'now' or 'list'")
+
+            maintenance = self._get_db_maintenance()
+
+            if action_lower == 'list':
+                snapshots = await maintenance.run_in_thread(list_snapshots)
+                if not snapshots:
+                    raise ValueError("No snapshots found")
+
+                embed = discord.Embed(
+                    title="💾 Database Snapshots",
+                    color=COLORS.INFO,
+                    timestamp=datetime.now(timezone.utc)
+                )
+                embed.description = "```yml\n" + "\n".join(
+                    f"{s['name']}: {s['size'] / 1024:.0f}KB"
+                    for s in snapshots[:20]
+                ) + "\n```"
+                embed.set_footer(text=f"{len(snapshots)} snapshot(s) • !restore <name>")
+                await self.send_response_once(ctx, embed=embed)
+                return
+
+            progress = BackupProgress("Backup", self.logger)
+            try:
+                result = await self._run_with_progress(
+                    ctx, "💾 Creating Snapshot...", progress,
+                    maintenance.create_backup(progress)
+                )
+            except BackupError as e:
+                raise ValueError(str(e))
+
+            embed = discord.Embed(
+                title="✅ Snapshot Created",
+                color=COLORS.SUCCESS,
+                timestamp=datetime.now(timezone.utc)
+            )
+            embed.add_field(
+                name="Details",
+                value=(
+                    f"```yml\n"
+                    f"File: {result['name']}\n"
+                    f"Pages: {result['pages']}\n"
+                    f"Size: {result['db_size'] / 1024:.0f}KB -> {result['size'] / 1024:.0f}KB\n"
+                    f"Duration: {result['seconds']:.2f}s\n"
+                    f"Throughput: {result['throughput_mb_s']}MB/s\n"
+                    f"Pruned: {len(result['pruned'])}\n"
+                    f"```"
+                ),
+                inline=False
+            )
+            await self.send_response_once(ctx, embed=embed)
+
+        await self._process_command(ctx, "backup", execute)
+
+    @commands.command(name="restore")
+    async def restore(self, ctx, name: str):
+        """Restore database from a snapshot"""
+        async def execute():
+            maintenance = self._get_db_maintenance()
+
+            if not await self._confirm_action(
+                ctx,
+                f"Restore database from `{name}`? Current data will be replaced "
+                f"(a pre-restore snapshot is created first)."
+            ):
+                raise ValueError("Operation cancelled by user")
+
+            progress = BackupProgress("Restore", self.logger)
+            try:
+                result = await self._run_with_progress(
+                    ctx, "♻️ Restoring Snapshot...", progress,
+                    maintenance.restore_backup(name, progress)
+                )
+            except BackupError as e:
+                raise ValueError(str(e))
+
+            embed = discord.Embed(
+                title="✅ Database Restored",
+                color=COLORS.SUCCESS,
+                timestamp=datetime.now(timezone.utc)
+            )
+            embed.add_field(
+                name="Details",
+                value=(
+                    f"```yml\n"
+                    f"From: {result['name']}\n"
+                    f"Pages: {result['pages']}\n"
+                    f"Duration: {result['seconds']:.2f}s\n"
+                    f"Previous State: {result['safety_snapshot']}\n"
+                    f"```"
+                ),
+                inline=False
+            )
+            embed.set_footer(text=f"Restored by {ctx.author}")
+            await self.send_response_once(ctx, embed=embed)
+
+        await self._process_command(ctx, "restore", execute)
+
+    @commands.command(name="dbmaint")
+    async def db_maint(self, ctx, action: str = "stats"):
+        """Show database file/WAL stats or run maintenance (stats/checkpoint/vacuum/optimize)"""
+        async def execute():
+            action_lower = action.lower()
+            if action_lower not in ['stats', 'checkpoint', 'vacuum', 'optimize']:
+                raise ValueError("Please specify 'stats', 'checkpoint', 'vacuum' or 'optimize'")
+
+            maintenance = self._get_db_maintenance()
+
+            if action_lower == 'checkpoint':
+                await maintenance.run_checkpoint('TRUNCATE')
+            elif action_lower == 'vacuum':
+                if maintenance.backup_running:
+                    raise ValueError("A backup or restore is running, try again later")
+                if not await maintenance.run_vacuum():
+                    raise ValueError("Nothing to vacuum")
+            elif action_lower == 'optimize':
+                await maintenance.run_optimize()
+
+            stats = await maintenance.get_stats()
+            mb = 1024 * 1024
+
+            def when(result: Optional[Dict]) -> str:
+                return result['at'].strftime('%Y-%m-%d %H:%M:%S') if result and 'at' in result else '-'
+
+            embed = discord.Embed(
+                title="🧹 Database Maintenance",
+                color=COLORS.INFO,
+                timestamp=datetime.now(timezone.utc)
+            )
+            embed.add_field(
+                name="📁 Storage",
+                value=(
+                    f"```yml\n"
+                    f"Database: {stats['db_size'] / mb:.2f}MB\n"
+                    f"WAL: {stats['wal_size'] / mb:.2f}MB\n"
+                    f"Pages: {stats['page_count']} x {stats['page_size']}B\n"
+                    f"Free Pages: {stats['freelist_count']} ({stats['free_percent']}%)\n"
+                    f"Auto Vacuum: {stats['auto_vacuum']}\n"
+                    f"```"
+                ),
+                inline=False
+            )
+
+            writes = stats['writes_per_min']
+            embed.add_field(
+                name="🕒 Last Runs",
+                value=(
+                    f"```yml\n"
+                    f"Writes/min: {f'{writes:.0f}' if writes is not None else '-'}"
+                    f"{' (quiet)' if stats['quiet'] else ''}\n"
+                    f"Checkpoint: {when(stats['last_checkpoint'])}\n"
+                    f"Vacuum: {when(stats['last_vacuum'])}\n"
+                    f"Optimize: {when(stats['last_optimize'])}\n"
+                    f"Backup: {stats['last_backup']['name'] if stats['last_backup'] else '-'}\n"
+                    f"```"
+                ),
+                inline=False
+            )
+            embed.set_footer(text="!dbmaint [stats|checkpoint|vacuum|optimize]")
+            await self.send_response_once(ctx, embed=embed)
+
+        await self._process_command(ctx, "dbmaint", execute)
+
+    @commands.command(name="archive")
+    async def archive(self, ctx, action: str = "list"):
+        """Run log retention now or list archive files (run/list)"""
+        async def execute():
+            action_lower = action.lower()
+            if action_lower not in ['run', 'list']:
+                raise ValueError("Please specify 'run' or 'list'")
+
+            maintenance = self._get_db_maintenance()
+            embed = discord.Embed(
+                title="🗄️ Log Archive",
+                color=COLORS.INFO,
+                timestamp=datetime.now(timezone.utc)
+            )
+
+            if action_lower == 'run':
+                try:
+                    result = await maintenance.run_archive()
+                except ArchiveError as e:
+                    raise ValueError(str(e))
+                embed.add_field(
+                    name=f"✅ Archived {result['rows']} rows in {result['seconds']:.2f}s",
+                    value="```yml\n" + "\n".join(
+                        f"{table}: {rows}" for table, rows in result['tables'].items()
+                    ) + "\n```",
+                    inline=False
+                )
+
+            archives = await maintenance.run_in_thread(list_archives)
+            by_table: Dict[str, List[str]] = {}
+            for entry in archives:
+                by_table.setdefault(entry['table'], []).append(
+                    f"{entry['month']}: {entry['size'] / 1024:.0f}KB"
+                )
+            for table, lines in by_table.items():
+                embed.add_field(
+                    name=f"📁 {table} (keep {Database.RETENTION_DAYS.get(table, 0)} days)",
+                    value="```yml\n" + "\n".join(lines[:12]) + "\n```",
+                    inline=False
+                )
+            if not by_table and action_lower == 'list':
+                raise ValueError("No archives found")
+
+            embed.set_footer(text="!archive [run|list] • !archivesearch <table> <column> <value> [limit]")
+            await self.send_response_once(ctx, embed=embed)
+
+        await self._process_command(ctx, "archive", execute)
+
+    @commands.command(name="archivesearch")
+    async def archive_search(self, ctx, table: str, column: str, value: str, limit: int = 10):
+        """Search archived log rows, newest first"""
+        async def execute():
+            try:
+                rows = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    search_archive,
+                    table.lower(),
+                    {column: value},
+                    min(max(1, limit), 25)
+                )
+            except ArchiveError as e:
+                raise ValueError(str(e))
+
+            if not rows:
+                raise ValueError("No archived rows found")
+
+            embed = discord.Embed(
+                title=f"🗄️ Archived {table.lower()} - {column}={value}",
+                color=COLORS.INFO,
+                timestamp=datetime.now(timezone.utc)
+            )
+            for row in rows:
+                details = "\n".join(
+                    f"{k}: {v}" for k, v in row.items()
+                    if k != 'id' and v is not None
+                )
+                embed.add_field(
+                    name=f"#{row['id']}",
+                    value=f"```yml\n{details[:1000]}\n```",
+                    inline=False
+                )
+            embed.set_footer(text=f"Showing {len(rows)} archived rows")
+            await self.send_response_once(ctx, embed=embed)
+
+        await self._process_command(ctx, "archivesearch", execute)
+
     @commands.command(name="maintenance")
     async def maintenance(self, ctx, mode: str):
         """Toggle maintenance mode"""
@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 import json
 import asyncio
 from .utils import Embed, Permissions, event_dispatcher
-from database import get_connection
+from database import execute_write, run_write
 import sqlite3
 from asyncio import Lock
 import os
@@ -31,26 +31,6 @@ class AutoMod(commands.Cog):
         self._banned_words_cache = set(word.lower() for word in self.config["banned_words"]["words"])
         # Task untuk cleanup
         self.cleanup_task = self.bot.loop.create_task(self.periodic_cleanup())
-        # Setup database
-        self.setup_database()
-
-    def setup_database(self):
-        """Setup database tables for automod"""
-        conn = get_connection()
-        try:
-            c = conn.cursor()
-            c.execute('''CREATE TABLE IF NOT EXISTS automod_warnings
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         user_id TEXT,
-                         guild_id TEXT,
-                         warning_type TEXT,
-                         reason TEXT,
-                         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-            conn.commit()
-        except Exception as e:
-            logger.error(f"Error setting up database: {e}")
-        finally:
-            conn.close()
 
     def register_handlers(self):
         """Register event handlers with dispatcher"""
@@ -78,14 +58,8 @@ class AutoMod(commands.Cog):
                             del dict_locks[key]
                 
                 # Cleanup old warnings from database
-                conn = get_connection()
-                try:
-                    c = conn.cursor()
-                    c.execute('''DELETE FROM automod_warnings 
-                               WHERE timestamp < datetime('now', '-30 days')''')
-                    conn.commit()
-                finally:
-                    conn.close()
+                await execute_write('''DELETE FROM automod_warnings 
+                           WHERE timestamp < datetime('now', '-30 days')''')
                     
             except Exception as e:
                 logger.error(f"Error in cleanup: {e}")
@@ -284,29 +258,23 @@ class AutoMod(commands.Cog):
                     pass
 
                 # Log warning to database
-                conn = get_connection()
-                try:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
+                def log_warning(conn):
+                    conn.execute("""
                         INSERT INTO automod_warnings (user_id, guild_id, warning_type, reason)
                         VALUES (?, ?, ?, ?)
                     """, (str(message.author.id), str(message.guild.id), violation_type, reason))
                     
                     # Check warning threshold
-                    cursor.execute("""
+                    return conn.execute("""
                         SELECT COUNT(*) FROM automod_warnings
                         WHERE user_id = ? AND guild_id = ?
                         AND timestamp > datetime('now', '-1 day')
-                    """, (str(message.author.id), str(message.guild.id)))
-                    
-                    warning_count = cursor.fetchone()[0]
-                    conn.commit()
+                    """, (str(message.author.id), str(message.guild.id))).fetchone()[0]
+                
+                warning_count = await run_write(log_warning)
 
-                    if warning_count >= self.config["punishments"]["warn_threshold"]:
-                        await self.mute_user(message.author)
-                finally:
-                    conn.close()
+                if warning_count >= self.config["punishments"]["warn_threshold"]:
+                    await self.mute_user(message.author)
 
         except Exception as e:
             logger.error(f"Error handling violation: {e}")
@@ -6,7 +6,8 @@ import random
 import asyncio
 from typing import Optional, Dict, List
 from .utils import Embed, event_dispatcher
-from database import get_connection
+from database import connection, enqueue_write, execute_write, run_write
+import queries
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,64 +20,6 @@ class Leveling(commands.Cog):
         self.xp_cooldown = {}
         self.register_handlers()
 
-    def setup_tables(self):
-        """Setup necessary database tables"""
-        conn = None
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # User levels table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS user_levels (
-                    guild_id TEXT NOT NULL,
-                    user_id TEXT NOT NULL,
-                    xp INTEGER DEFAULT 0,
-                    level INTEGER DEFAULT 0,
-                    messages INTEGER DEFAULT 0,
-                    last_message TIMESTAMP,
-                    PRIMARY KEY (guild_id, user_id)
-                )
-            """)
-            
-            # Level rewards table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS level_rewards (
-                    guild_id TEXT NOT NULL,
-                    level INTEGER NOT NULL,
-                    role_id TEXT NOT NULL,
-                    PRIMARY KEY (guild_id, level)
-                )
-            """)
-            
-            # Leveling settings table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS leveling_settings (
-                    guild_id TEXT PRIMARY KEY,
-                    enabled BOOLEAN DEFAULT TRUE,
-                    announcement_channel TEXT,
-                    min_xp INTEGER DEFAULT 15,
-                    max_xp INTEGER DEFAULT 25,
-                    cooldown INTEGER DEFAULT 60,
-                    stack_rewards BOOLEAN DEFAULT TRUE,
-                    ignored_channels TEXT,
-                    ignored_roles TEXT,
-                    double_xp_roles TEXT
-                )
-            """)
-            
-            conn.commit()
-            logger.info("Leveling tables created successfully")
-            
-        except sqlite3.Error as e:
-            logger.error(f"Failed to setup leveling tables: {e}")
-            if conn:
-                conn.rollback()
-            raise
-        finally:
-            if conn:
-                conn.close()
-
     def register_handlers(self):
         """Register event handlers"""
         event_dispatcher.register('level_reward', self.handle_reward)
@@ -84,100 +27,93 @@ class Leveling(commands.Cog):
     async def handle_reward(self, member, level):
         """Handle level rewards"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
 
-            # Get reward roles for this level
-            cursor.execute("""
-                SELECT role_id FROM level_rewards
-                WHERE guild_id = ? AND level <= ?
-                ORDER BY level DESC
-            """, (str(member.guild.id), level))
-            
-            rewards = cursor.fetchall()
-            
-            # Get settings to check if rewards should stack
-            cursor.execute("""
-                SELECT stack_rewards FROM leveling_settings
-                WHERE guild_id = ?
-            """, (str(member.guild.id),))
-            
-            settings = cursor.fetchone()
-            stack_rewards = settings['stack_rewards'] if settings else True
+                # Get reward roles for this level
+                cursor.execute("""
+                    SELECT role_id FROM level_rewards
+                    WHERE guild_id = ? AND level <= ?
+                    ORDER BY level DESC
+                """, (str(member.guild.id), level))
             
-            roles_to_add = []
-            for reward in rewards:
-                role = member.guild.get_role(int(reward['role_id']))
-                if role and role not in member.roles:
-                    roles_to_add.append(role)
-                    if not stack_rewards:
-                        break  # Only add highest level role if not stacking
+                rewards = cursor.fetchall()
             
-            if roles_to_add:
-                await member.add_roles(*roles_to_add)
-                
-                # Get announcement channel
+                # Get settings to check if rewards should stack
                 cursor.execute("""
-                    SELECT announcement_channel FROM leveling_settings
+                    SELECT stack_rewards FROM leveling_settings
                     WHERE guild_id = ?
                 """, (str(member.guild.id),))
+            
+                settings = cursor.fetchone()
+                stack_rewards = settings['stack_rewards'] if settings else True
+            
+                roles_to_add = []
+                for reward in rewards:
+                    role = member.guild.get_role(int(reward['role_id']))
+                    if role and role not in member.roles:
+                        roles_to_add.append(role)
+                        if not stack_rewards:
+                            break  # Only add highest level role if not stacking
+            
+                if roles_to_add:
+                    await member.add_roles(*roles_to_add)
                 
-                channel_data = cursor.fetchone()
-                if channel_data and channel_data['announcement_channel']:
-                    channel = member.guild.get_channel(int(channel_data['announcement_channel']))
-                    if channel:
-                        role_mentions = ' '.join(role.mention for role in roles_to_add)
-                        await channel.send(
-                            f"🎉 Congratulations {member.mention}! "
-                            f"You reached level {level} and earned: {role_mentions}"
-                        )
+                    # Get announcement channel
+                    cursor.execute("""
+                        SELECT announcement_channel FROM leveling_settings
+                        WHERE guild_id = ?
+                    """, (str(member.guild.id),))
+                
+                    channel_data = cursor.fetchone()
+                    if channel_data and channel_data['announcement_channel']:
+                        channel = member.guild.get_channel(int(channel_data['announcement_channel']))
+                        if channel:
+                            role_mentions = ' '.join(role.mention for role in roles_to_add)
+                            await channel.send(
+                                f"🎉 Congratulations {member.mention}! "
+                                f"You reached level {level} and earned: {role_mentions}"
+                            )
 
         except Exception as e:
             logger.error(f"Error handling level reward: {e}")
-        finally:
-            if conn:
-                conn.close()
 
     def get_settings(self, guild_id: int) -> Dict:
         """Get leveling settings for a guild"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM leveling_settings WHERE guild_id = ?
-            """, (str(guild_id),))
-            data = cursor.fetchone()
-            
-            if not data:
-                default_settings = {
-                    'enabled': True,
-                    'announcement_channel': None,
-                    'min_xp': 15,
-                    'max_xp': 25,
-                    'cooldown': 60,
-                    'stack_rewards': True,
-                    'ignored_channels': None,
-                    'ignored_roles': None,
-                    'double_xp_roles': None
-                }
-                
+            with connection() as conn:
+                cursor = conn.cursor()
+            
                 cursor.execute("""
-                    INSERT INTO leveling_settings (guild_id)
-                    VALUES (?)
+                    SELECT * FROM leveling_settings WHERE guild_id = ?
                 """, (str(guild_id),))
-                conn.commit()
-                return default_settings
+                data = cursor.fetchone()
+            
+                if not data:
+                    default_settings = {
+                        'enabled': True,
+                        'announcement_channel': None,
+                        'min_xp': 15,
+                        'max_xp': 25,
+                        'cooldown': 60,
+                        'stack_rewards': True,
+                        'ignored_channels': None,
+                        'ignored_roles': None,
+                        'double_xp_roles': None
+                    }
                 
-            return dict(data)
+                    # get_settings sinkron: default cukup diantrikan ke write queue
+                    enqueue_write("""
+                        INSERT OR IGNORE INTO leveling_settings (guild_id)
+                        VALUES (?)
+                    """, (str(guild_id),))
+                    return default_settings
+                
+                return dict(data)
             
         except sqlite3.Error as e:
             logger.error(f"Failed to get leveling settings: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     def calculate_xp_for_level(self, level: int) -> int:
         """Calculate XP required for a specific level"""
@@ -224,29 +160,18 @@ class Leveling(commands.Cog):
             if any(str(role.id) in ignored_roles for role in message.author.roles):
                 return
         
-        conn = None
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Calculate XP gain
-            xp_gain = random.randint(settings['min_xp'], settings['max_xp'])
-            
-            # Check double XP roles
-            if settings['double_xp_roles']:
-                double_xp_roles = settings['double_xp_roles'].split(',')
-                if any(str(role.id) in double_xp_roles for role in message.author.roles):
-                    xp_gain *= 2
-            
+        # Calculate XP gain
+        xp_gain = random.randint(settings['min_xp'], settings['max_xp'])
+        
+        # Check double XP roles
+        if settings['double_xp_roles']:
+            double_xp_roles = settings['double_xp_roles'].split(',')
+            if any(str(role.id) in double_xp_roles for role in message.author.roles):
+                xp_gain *= 2
+
+        def apply_xp(conn):
             # Update or insert user data
-            cursor.execute("""
-                INSERT INTO user_levels (guild_id, user_id, xp, messages, last_message)
-                VALUES (?, ?, ?, 1, ?)
-                ON CONFLICT(guild_id, user_id) DO UPDATE SET
-                xp = xp + ?,
-                messages = messages + 1,
-                last_message = ?
-            """, (
+            queries.execute(conn, queries.ADD_XP, (
                 guild_id,
                 user_id,
                 xp_gain,
@@ -256,35 +181,30 @@ class Leveling(commands.Cog):
             ))
             
             # Get updated XP
-            cursor.execute("""
-                SELECT xp, level FROM user_levels
-                WHERE guild_id = ? AND user_id = ?
-            """, (guild_id, user_id))
-            data = cursor.fetchone()
+            data = queries.execute(conn, queries.GET_XP, (guild_id, user_id)).fetchone()
             
             if data:
                 new_level = self.calculate_level_for_xp(data['xp'])
                 if new_level > data['level']:
                     # Update level
-                    cursor.execute("""
-                        UPDATE user_levels
-                        SET level = ?
-                        WHERE guild_id = ? AND user_id = ?
-                    """, (new_level, guild_id, user_id))
-                    
-                    # Handle level up
-                    await self.handle_level_up(message.author, new_level)
+                    queries.execute(conn, queries.SET_LEVEL, (new_level, guild_id, user_id))
+                    return new_level
+            return None
+
+        # Cooldown dipasang sebelum await: pesan berikutnya yang datang selama
+        # write masih antre tidak lolos cek cooldown di atas
+        self.xp_cooldown[cooldown_key] = current_time
+
+        try:
+            # XP dari banyak pesan di-commit bersama oleh write queue
+            new_level = await run_write(apply_xp)
             
-            conn.commit()
-            self.xp_cooldown[cooldown_key] = current_time
+            # Handle level up
+            if new_level is not None:
+                await self.handle_level_up(message.author, new_level)
             
         except sqlite3.Error as e:
             logger.error(f"Failed to update user XP: {e}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                conn.close()
 
     async def handle_level_up(self, member, new_level):
         """Handle level up events"""
@@ -316,55 +236,51 @@ class Leveling(commands.Cog):
         """Show rank for a user"""
         member = member or ctx.author
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM user_levels
-                WHERE guild_id = ? AND user_id = ?
-            """, (str(ctx.guild.id), str(member.id)))
-            data = cursor.fetchone()
-            
-            if not data:
-                return await ctx.send(f"❌ {member.mention} hasn't gained any XP yet!")
-            
-            # Get rank
-            cursor.execute("""
-                SELECT COUNT(*) as rank
-                FROM user_levels
-                WHERE guild_id = ? AND xp > ?
-            """, (str(ctx.guild.id), data['xp']))
-            rank_data = cursor.fetchone()
-            
-            rank = rank_data['rank'] + 1
-            
-            # Calculate progress to next level
-            current_level_xp = self.calculate_xp_for_level(data['level'])
-            next_level_xp = self.calculate_xp_for_level(data['level'] + 1)
-            xp_needed = next_level_xp - current_level_xp
-            xp_progress = data['xp'] - current_level_xp
-            progress_percent = (xp_progress / xp_needed) * 100
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            embed = Embed.create(
-                title=f"Rank for {member.display_name}",
-                color=member.color,
-                field_Level=str(data['level']),
-                field_Rank=f"#{rank}",
-                field_XP=f"{data['xp']:,} XP",
-                field_Messages=f"{data['messages']:,} messages",
-                field_Progress=f"{progress_percent:.1f}% to level {data['level'] + 1}"
-            )
+                cursor.execute("""
+                    SELECT * FROM user_levels
+                    WHERE guild_id = ? AND user_id = ?
+                """, (str(ctx.guild.id), str(member.id)))
+                data = cursor.fetchone()
             
-            await ctx.send(embed=embed)
+                if not data:
+                    return await ctx.send(f"❌ {member.mention} hasn't gained any XP yet!")
+            
+                # Get rank
+                cursor.execute("""
+                    SELECT COUNT(*) as rank
+                    FROM user_levels
+                    WHERE guild_id = ? AND xp > ?
+                """, (str(ctx.guild.id), data['xp']))
+                rank_data = cursor.fetchone()
+            
+                rank = rank_data['rank'] + 1
+            
+                # Calculate progress to next level
+                current_level_xp = self.calculate_xp_for_level(data['level'])
+                next_level_xp = self.calculate_xp_for_level(data['level'] + 1)
+                xp_needed = next_level_xp - current_level_xp
+                xp_progress = data['xp'] - current_level_xp
+                progress_percent = (xp_progress / xp_needed) * 100
+            
+                embed = Embed.create(
+                    title=f"Rank for {member.display_name}",
+                    color=member.color,
+                    field_Level=str(data['level']),
+                    field_Rank=f"#{rank}",
+                    field_XP=f"{data['xp']:,} XP",
+                    field_Messages=f"{data['messages']:,} messages",
+                    field_Progress=f"{progress_percent:.1f}% to level {data['level'] + 1}"
+                )
+            
+                await ctx.send(embed=embed)
             
         except sqlite3.Error as e:
             logger.error(f"Failed to get user rank: {e}")
             await ctx.send("❌ An error occurred while getting rank data")
-        finally:
-            if conn:
-                conn.close()
 
     @level.command(name="top")
     async def show_leaderboard(self, ctx, page: int = 1):
@@ -372,64 +288,60 @@ class Leveling(commands.Cog):
         if page < 1:
             return await ctx.send("❌ Page number must be 1 or higher!")
             
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Get total pages
-            cursor.execute("""
-                SELECT COUNT(*) as count
-                FROM user_levels
-                WHERE guild_id = ?
-            """, (str(ctx.guild.id),))
-            total = cursor.fetchone()['count']
-            
-            per_page = 10
-            pages = (total + per_page - 1) // per_page
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            if page > pages and pages > 0:
-                return await ctx.send(f"❌ Invalid page! Total pages: {pages}")
+                # Get total pages
+                cursor.execute("""
+                    SELECT COUNT(*) as count
+                    FROM user_levels
+                    WHERE guild_id = ?
+                """, (str(ctx.guild.id),))
+                total = cursor.fetchone()['count']
             
-            # Get leaderboard data
-            cursor.execute("""
-                SELECT user_id, xp, level, messages
-                FROM user_levels
-                WHERE guild_id = ?
-                ORDER BY xp DESC
-                LIMIT ? OFFSET ?
-            """, (str(ctx.guild.id), per_page, (page - 1) * per_page))
-            leaders = cursor.fetchall()
+                per_page = 10
+                pages = (total + per_page - 1) // per_page
             
-            if not leaders:
-                return await ctx.send("❌ No users have gained XP yet!")
+                if page > pages and pages > 0:
+                    return await ctx.send(f"❌ Invalid page! Total pages: {pages}")
             
-            embed = Embed.create(
-                title="🏆 XP Leaderboard",
-                color=discord.Color.gold(),
-                description=f"Page {page}/{pages}"
-            )
+                # Get leaderboard data
+                cursor.execute("""
+                    SELECT user_id, xp, level, messages
+                    FROM user_levels
+                    WHERE guild_id = ?
+                    ORDER BY xp DESC
+                    LIMIT ? OFFSET ?
+                """, (str(ctx.guild.id), per_page, (page - 1) * per_page))
+                leaders = cursor.fetchall()
+            
+                if not leaders:
+                    return await ctx.send("❌ No users have gained XP yet!")
+            
+                embed = Embed.create(
+                    title="🏆 XP Leaderboard",
+                    color=discord.Color.gold(),
+                    description=f"Page {page}/{pages}"
+                )
             
-            for i, leader in enumerate(leaders, 1):
-                member = ctx.guild.get_member(int(leader['user_id']))
-                name = member.display_name if member else "Unknown User"
+                for i, leader in enumerate(leaders, 1):
+                    member = ctx.guild.get_member(int(leader['user_id']))
+                    name = member.display_name if member else "Unknown User"
                 
-                embed.add_field(
-                    name=f"#{(page-1)*per_page + i}. {name}",
-                    value=f"Level: {leader['level']}\n"
-                          f"XP: {leader['xp']:,}\n"
-                          f"Messages: {leader['messages']:,}",
-                    inline=False
-                )
+                    embed.add_field(
+                        name=f"#{(page-1)*per_page + i}. {name}",
+                        value=f"Level: {leader['level']}\n"
+                              f"XP: {leader['xp']:,}\n"
+                              f"Messages: {leader['messages']:,}",
+                        inline=False
+                    )
                 
-            await ctx.send(embed=embed)
+                await ctx.send(embed=embed)
             
         except sqlite3.Error as e:
             logger.error(f"Failed to get leaderboard: {e}")
             await ctx.send("❌ An error occurred while getting leaderboard")
-        finally:
-            if conn:
-                conn.close()
 
     @commands.group(name="levelset", aliases=["lset"])
     @commands.has_permissions(administrator=True)
@@ -469,17 +381,12 @@ class Leveling(commands.Cog):
     @levelset.command(name="toggle")
     async def toggle_leveling(self, ctx, enabled: bool):
         """Toggle leveling system"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE leveling_settings
                 SET enabled = ?
                 WHERE guild_id = ?
             """, (enabled, str(ctx.guild.id)))
-            conn.commit()
             
             status = "enabled" if enabled else "disabled"
             await ctx.send(f"✅ Leveling system {status}!")
@@ -487,26 +394,18 @@ class Leveling(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to toggle leveling: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="channel")
     async def set_announcement_channel(self, ctx, channel: discord.TextChannel = None):
         """Set level up announcement channel"""
         channel_id = str(channel.id) if channel else None
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE leveling_settings
                 SET announcement_channel = ?
                 WHERE guild_id = ?
             """, (channel_id, str(ctx.guild.id)))
-            conn.commit()
             
             if channel:
                 await ctx.send(f"✅ Level up announcements will be sent to {channel.mention}")
@@ -516,9 +415,6 @@ class Leveling(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to set announcement channel: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="xprange")
     async def set_xp_range(self, ctx, min_xp: int, max_xp: int):
@@ -526,26 +422,18 @@ class Leveling(commands.Cog):
         if min_xp < 1 or max_xp < min_xp:
             return await ctx.send("❌ Invalid XP range!")
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE leveling_settings
                 SET min_xp = ?, max_xp = ?
                 WHERE guild_id = ?
             """, (min_xp, max_xp, str(ctx.guild.id)))
-            conn.commit()
             
             await ctx.send(f"✅ XP gain range set to {min_xp}-{max_xp}")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to set XP range: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="cooldown")
     async def set_cooldown(self, ctx, seconds: int):
@@ -553,41 +441,28 @@ class Leveling(commands.Cog):
         if seconds < 0:
             return await ctx.send("❌ Cooldown cannot be negative!")
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE leveling_settings
                 SET cooldown = ?
                 WHERE guild_id = ?
             """, (seconds, str(ctx.guild.id)))
-            conn.commit()
             
             await ctx.send(f"✅ XP gain cooldown set to {seconds} seconds")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to set cooldown: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="stackrewards")
     async def toggle_stack_rewards(self, ctx, enabled: bool):
         """Toggle stacking of level rewards"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE leveling_settings
                 SET stack_rewards = ?
                 WHERE guild_id = ?
             """, (enabled, str(ctx.guild.id)))
-            conn.commit()
             
             status = "will now stack" if enabled else "will no longer stack"
             await ctx.send(f"✅ Level rewards {status}")
@@ -595,9 +470,6 @@ class Leveling(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to toggle stack rewards: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="addreward")
     async def add_level_reward(self, ctx, level: int, role: discord.Role):
@@ -605,42 +477,29 @@ class Leveling(commands.Cog):
         if level < 1:
             return await ctx.send("❌ Level must be greater than 0!")
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 INSERT OR REPLACE INTO level_rewards
                 (guild_id, level, role_id)
                 VALUES (?, ?, ?)
             """, (str(ctx.guild.id), level, str(role.id)))
-            conn.commit()
             
             await ctx.send(f"✅ {role.mention} will be awarded at level {level}")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to add level reward: {e}")
             await ctx.send("❌ An error occurred while adding reward")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="removereward")
     async def remove_level_reward(self, ctx, level: int):
         """Remove a level reward"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            result = await execute_write("""
                 DELETE FROM level_rewards
                 WHERE guild_id = ? AND level = ?
             """, (str(ctx.guild.id), level))
-            conn.commit()
             
-            if cursor.rowcount > 0:
+            if result.rowcount > 0:
                 await ctx.send(f"✅ Removed reward for level {level}")
             else:
                 await ctx.send("❌ No reward found for that level")
@@ -648,174 +507,151 @@ class Leveling(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to remove level reward: {e}")
             await ctx.send("❌ An error occurred while removing reward")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="rewards")
     async def list_rewards(self, ctx):
         """List all level rewards"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT level, role_id
-                FROM level_rewards
-                WHERE guild_id = ?
-                ORDER BY level ASC
-            """, (str(ctx.guild.id),))
-            rewards = cursor.fetchall()
+                cursor.execute("""
+                    SELECT level, role_id
+                    FROM level_rewards
+                    WHERE guild_id = ?
+                    ORDER BY level ASC
+                """, (str(ctx.guild.id),))
+                rewards = cursor.fetchall()
             
-            if not rewards:
-                return await ctx.send("❌ No level rewards set!")
+                if not rewards:
+                    return await ctx.send("❌ No level rewards set!")
             
-            embed = Embed.create(
-                title="🎁 Level Rewards",
-                color=discord.Color.blue()
-            )
+                embed = Embed.create(
+                    title="🎁 Level Rewards",
+                    color=discord.Color.blue()
+                )
             
-            for reward in rewards:
-                role = ctx.guild.get_role(int(reward['role_id']))
-                if role:
-                    embed.add_field(
-                        name=f"Level {reward['level']}",
-                        value=role.mention,
-                        inline=False
-                    )
+                for reward in rewards:
+                    role = ctx.guild.get_role(int(reward['role_id']))
+                    if role:
+                        embed.add_field(
+                            name=f"Level {reward['level']}",
+                            value=role.mention,
+                            inline=False
+                        )
             
-            await ctx.send(embed=embed)
+                await ctx.send(embed=embed)
             
         except sqlite3.Error as e:
             logger.error(f"Failed to list rewards: {e}")
             await ctx.send("❌ An error occurred while getting rewards")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="ignorechannel")
     async def toggle_ignore_channel(self, ctx, channel: discord.TextChannel):
         """Toggle XP gain in a channel"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT ignored_channels FROM leveling_settings
-                WHERE guild_id = ?
-            """, (str(ctx.guild.id),))
-            data = cursor.fetchone()
-            
-            ignored = set(data['ignored_channels'].split(',') if data['ignored_channels'] else [])
-            channel_id = str(channel.id)
-            
-            if channel_id in ignored:
-                ignored.remove(channel_id)
-                action = "enabled"
-            else:
-                ignored.add(channel_id)
-                action = "disabled"
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                UPDATE leveling_settings
-                SET ignored_channels = ?
-                WHERE guild_id = ?
-            """, (','.join(ignored) if ignored else None, str(ctx.guild.id)))
-            conn.commit()
+                cursor.execute("""
+                    SELECT ignored_channels FROM leveling_settings
+                    WHERE guild_id = ?
+                """, (str(ctx.guild.id),))
+                data = cursor.fetchone()
+            
+                ignored = set(data['ignored_channels'].split(',') if data['ignored_channels'] else [])
+                channel_id = str(channel.id)
+            
+                if channel_id in ignored:
+                    ignored.remove(channel_id)
+                    action = "enabled"
+                else:
+                    ignored.add(channel_id)
+                    action = "disabled"
+            
+                await execute_write("""
+                    UPDATE leveling_settings
+                    SET ignored_channels = ?
+                    WHERE guild_id = ?
+                """, (','.join(ignored) if ignored else None, str(ctx.guild.id)))
             
-            await ctx.send(f"✅ XP gain {action} in {channel.mention}")
+                await ctx.send(f"✅ XP gain {action} in {channel.mention}")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to toggle ignored channel: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="ignorerole")
     async def toggle_ignore_role(self, ctx, role: discord.Role):
         """Toggle XP gain for a role"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT ignored_roles FROM leveling_settings
-                WHERE guild_id = ?
-            """, (str(ctx.guild.id),))
-            data = cursor.fetchone()
-            
-            ignored = set(data['ignored_roles'].split(',') if data['ignored_roles'] else [])
-            role_id = str(role.id)
-            
-            if role_id in ignored:
-                ignored.remove(role_id)
-                action = "enabled"
-            else:
-                ignored.add(role_id)
-                action = "disabled"
-            
-            cursor.execute("""
-                UPDATE leveling_settings
-                SET ignored_roles = ?
-                WHERE guild_id = ?
-            """, (','.join(ignored) if ignored else None, str(ctx.guild.id)))
-            conn.commit()
+                cursor.execute("""
+                    SELECT ignored_roles FROM leveling_settings
+                    WHERE guild_id = ?
+                """, (str(ctx.guild.id),))
+                data = cursor.fetchone()
+            
+                ignored = set(data['ignored_roles'].split(',') if data['ignored_roles'] else [])
+                role_id = str(role.id)
+            
+                if role_id in ignored:
+                    ignored.remove(role_id)
+                    action = "enabled"
+                else:
+                    ignored.add(role_id)
+                    action = "disabled"
+            
+                await execute_write("""
+                    UPDATE leveling_settings
+                    SET ignored_roles = ?
+                    WHERE guild_id = ?
+                """, (','.join(ignored) if ignored else None, str(ctx.guild.id)))
             
-            await ctx.send(f"✅ XP gain {action} for {role.mention}")
+                await ctx.send(f"✅ XP gain {action} for {role.mention}")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to toggle ignored role: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
     @levelset.command(name="doublexp")
     async def toggle_double_xp_role(self, ctx, role: discord.Role):
         """Toggle double XP for a role"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT double_xp_roles FROM leveling_settings
-                WHERE guild_id = ?
-            """, (str(ctx.guild.id),))
-            data = cursor.fetchone()
-            
-            double_xp = set(data['double_xp_roles'].split(',') if data['double_xp_roles'] else [])
-            role_id = str(role.id)
-            
-            if role_id in double_xp:
-                double_xp.remove(role_id)
-                action = "disabled"
-            else:
-                double_xp.add(role_id)
-                action = "enabled"
-            
-            cursor.execute("""
-                UPDATE leveling_settings
-                SET double_xp_roles = ?
-                WHERE guild_id = ?
-            """, (','.join(double_xp) if double_xp else None, str(ctx.guild.id)))
-            conn.commit()
+                cursor.execute("""
+                    SELECT double_xp_roles FROM leveling_settings
+                    WHERE guild_id = ?
+                """, (str(ctx.guild.id),))
+                data = cursor.fetchone()
+            
+                double_xp = set(data['double_xp_roles'].split(',') if data['double_xp_roles'] else [])
+                role_id = str(role.id)
+            
+                if role_id in double_xp:
+                    double_xp.remove(role_id)
+                    action = "disabled"
+                else:
+                    double_xp.add(role_id)
+                    action = "enabled"
+            
+                await execute_write("""
+                    UPDATE leveling_settings
+                    SET double_xp_roles = ?
+                    WHERE guild_id = ?
+                """, (','.join(double_xp) if double_xp else None, str(ctx.guild.id)))
             
-            await ctx.send(f"✅ Double XP {action} for {role.mention}")
+                await ctx.send(f"✅ Double XP {action} for {role.mention}")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to toggle double XP role: {e}")
             await ctx.send("❌ An error occurred while updating settings")
-        finally:
-            if conn:
-                conn.close()
 
 async def setup(bot):
     """Setup the Leveling cog"""
     cog = Leveling(bot)
-    cog.setup_tables()
     await bot.add_cog(cog)
\ No newline at end of file
@@ -4,7 +4,7 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from .utils import Embed, event_dispatcher
-from database import get_connection
+from database import connection, enqueue_write, execute_write
 import sqlite3
 import logging
 
@@ -17,67 +17,6 @@ class Management(commands.Cog):
         self.bot = bot
         self.register_handlers()
 
-    def setup_tables(self):
-        """Setup necessary database tables"""
-        conn = None
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Server settings
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS server_settings (
-                    guild_id TEXT PRIMARY KEY,
-                    prefix TEXT DEFAULT '!',
-                    auto_role TEXT,
-                    mute_role TEXT,
-                    mod_role TEXT,
-                    admin_role TEXT,
-                    suggestion_channel TEXT,
-                    report_channel TEXT,
-                    log_channel TEXT,
-                    join_age INTEGER DEFAULT 0,
-                    verification_required BOOLEAN DEFAULT FALSE
-                )
-            """)
-            
-            # Channel permissions
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS channel_permissions (
-                    guild_id TEXT,
-                    channel_id TEXT,
-                    role_id TEXT,
-                    permission_type TEXT,
-                    allowed BOOLEAN DEFAULT TRUE,
-                    PRIMARY KEY (guild_id, channel_id, role_id, permission_type)
-                )
-            """)
-            
-            # Scheduled tasks
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS scheduled_tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id TEXT,
-                    task_type TEXT,
-                    execute_at DATETIME,
-                    data TEXT,
-                    created_by TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.commit()
-            logger.info("Management tables created successfully")
-            
-        except sqlite3.Error as e:
-            logger.error(f"Failed to setup management tables: {e}")
-            if conn:
-                conn.rollback()
-            raise
-        finally:
-            if conn:
-                conn.close()
-
     def register_handlers(self):
         """Register event handlers"""
         event_dispatcher.register('role_update', self.log_role_change)
@@ -86,44 +25,40 @@ class Management(commands.Cog):
 
     def get_settings(self, guild_id: int) -> Dict:
         """Get server settings"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM server_settings WHERE guild_id = ?
-            """, (str(guild_id),))
-            data = cursor.fetchone()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            if not data:
-                default_settings = {
-                    'prefix': '!',
-                    'auto_role': None,
-                    'mute_role': None,
-                    'mod_role': None,
-                    'admin_role': None,
-                    'suggestion_channel': None,
-                    'report_channel': None,
-                    'log_channel': None,
-                    'join_age': 0,
-                    'verification_required': False
-                }
-                
                 cursor.execute("""
-                    INSERT INTO server_settings (guild_id, prefix)
-                    VALUES (?, ?)
-                """, (str(guild_id), '!'))
-                conn.commit()
-                return default_settings
+                    SELECT * FROM server_settings WHERE guild_id = ?
+                """, (str(guild_id),))
+                data = cursor.fetchone()
+            
+                if not data:
+                    default_settings = {
+                        'prefix': '!',
+                        'auto_role': None,
+                        'mute_role': None,
+                        'mod_role': None,
+                        'admin_role': None,
+                        'suggestion_channel': None,
+                        'report_channel': None,
+                        'log_channel': None,
+                        'join_age': 0,
+                        'verification_required': False
+                    }
+                
+                    # get_settings sinkron: default cukup diantrikan ke write queue
+                    enqueue_write("""
+                        INSERT OR IGNORE INTO server_settings (guild_id, prefix)
+                        VALUES (?, ?)
+                    """, (str(guild_id), '!'))
+                    return default_settings
                 
-            return dict(data)
+                return dict(data)
         except sqlite3.Error as e:
             logger.error(f"Failed to get server settings: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     @commands.group(name="config")
     @commands.has_permissions(administrator=True)
@@ -152,43 +87,30 @@ class Management(commands.Cog):
         if len(prefix) > 5:
             return await ctx.send("❌ Prefix must be 5 characters or less!")
         
-        conn = None    
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE server_settings
                 SET prefix = ?
                 WHERE guild_id = ?
             """, (prefix, str(ctx.guild.id)))
-            conn.commit()
             
             await ctx.send(f"✅ Prefix set to `{prefix}`")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to set prefix: {e}")
             await ctx.send("❌ An error occurred while setting the prefix")
-        finally:
-            if conn:
-                conn.close()
 
     @config.command(name="autorole")
     async def set_auto_role(self, ctx, role: discord.Role = None):
         """Set auto-role for new members"""
         role_id = str(role.id) if role else None
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE server_settings
                 SET auto_role = ?
                 WHERE guild_id = ?
             """, (role_id, str(ctx.guild.id)))
-            conn.commit()
             
             if role:
                 await ctx.send(f"✅ Auto-role set to {role.mention}")
@@ -198,9 +120,6 @@ class Management(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to set auto-role: {e}")
             await ctx.send("❌ An error occurred while setting the auto-role")
-        finally:
-            if conn:
-                conn.close()
 
     @config.command(name="muterole")
     async def set_mute_role(self, ctx, role: discord.Role = None):
@@ -215,17 +134,12 @@ class Management(commands.Cog):
                     
         role_id = str(role.id) if role else None
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE server_settings
                 SET mute_role = ?
                 WHERE guild_id = ?
             """, (role_id, str(ctx.guild.id)))
-            conn.commit()
             
             if role:
                 await ctx.send(f"✅ Mute role set to {role.mention}")
@@ -235,26 +149,18 @@ class Management(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to set mute role: {e}")
             await ctx.send("❌ An error occurred while setting the mute role")
-        finally:
-            if conn:
-                conn.close()
 
     @config.command(name="modrole")
     async def set_mod_role(self, ctx, role: discord.Role = None):
         """Set moderator role"""
         role_id = str(role.id) if role else None
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE server_settings
                 SET mod_role = ?
                 WHERE guild_id = ?
             """, (role_id, str(ctx.guild.id)))
-            conn.commit()
             
             if role:
                 await ctx.send(f"✅ Moderator role set to {role.mention}")
@@ -264,26 +170,18 @@ class Management(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to set mod role: {e}")
             await ctx.send("❌ An error occurred while setting the moderator role")
-        finally:
-            if conn:
-                conn.close()
 
     @config.command(name="adminrole")
     async def set_admin_role(self, ctx, role: discord.Role = None):
         """Set administrator role"""
         role_id = str(role.id) if role else None
         
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE server_settings
                 SET admin_role = ?
                 WHERE guild_id = ?
             """, (role_id, str(ctx.guild.id)))
-            conn.commit()
             
             if role:
                 await ctx.send(f"✅ Administrator role set to {role.mention}")
@@ -293,9 +191,6 @@ class Management(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to set admin role: {e}")
             await ctx.send("❌ An error occurred while setting the administrator role")
-        finally:
-            if conn:
-                conn.close()
 
     @config.command(name="verification")
     async def toggle_verification(self, ctx, required: bool = None):
@@ -304,26 +199,18 @@ class Management(commands.Cog):
             settings = self.get_settings(ctx.guild.id)
             required = not settings['verification_required']
             
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE server_settings
                 SET verification_required = ?
                 WHERE guild_id = ?
             """, (required, str(ctx.guild.id)))
-            conn.commit()
             
             await ctx.send(f"✅ Verification requirement {'enabled' if required else 'disabled'}")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to toggle verification: {e}")
             await ctx.send("❌ An error occurred while updating verification settings")
-        finally:
-            if conn:
-                conn.close()
 
     @config.command(name="joinage")
     async def set_join_age(self, ctx, days: int):
@@ -331,17 +218,12 @@ class Management(commands.Cog):
         if days < 0:
             return await ctx.send("❌ Days must be 0 or positive!")
             
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await execute_write("""
                 UPDATE server_settings
                 SET join_age = ?
                 WHERE guild_id = ?
             """, (days, str(ctx.guild.id)))
-            conn.commit()
             
             if days > 0:
                 await ctx.send(f"✅ Minimum account age set to {days} days")
@@ -351,9 +233,6 @@ class Management(commands.Cog):
         except sqlite3.Error as e:
             logger.error(f"Failed to set join age: {e}")
             await ctx.send("❌ An error occurred while setting the join age")
-        finally:
-            if conn:
-                conn.close()
 
     @commands.group(name="channel")
     @commands.has_permissions(manage_channels=True)
@@ -516,5 +395,4 @@ class Management(commands.Cog):
 async def setup(bot):
     """Setup the Management cog"""
     cog = Management(bot)
-    cog.setup_tables()  # Not async anymore since using sqlite3
     await bot.add_cog(cog)
\ No newline at end of file
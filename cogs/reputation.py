@@ -6,7 +6,7 @@ import sqlite3
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 from .utils import Embed, event_dispatcher
-from database import get_connection
+from database import connection, execute_write, run_write
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,7 +22,6 @@ class Reputation(commands.Cog):
         self.cooldown_lock = Lock()  # For cooldown management
         self.role_lock = Lock()  # For role updates
         self.response_lock = Lock()  # For preventing multiple responses
-        self.setup_tables()
         self.register_handlers()
 
     async def acquire_lock(self, lock: Lock, timeout: float = 10.0) -> bool:
@@ -50,80 +49,6 @@ class Reputation(commands.Cog):
         finally:
             self.response_lock.release()
 
-    def setup_tables(self):
-        """Setup necessary database tables"""
-        conn = None
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Reputation settings
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS reputation_settings (
-                    guild_id TEXT PRIMARY KEY,
-                    cooldown INTEGER DEFAULT 43200,
-                    max_daily INTEGER DEFAULT 3,
-                    min_message_age INTEGER DEFAULT 1800,
-                    required_role TEXT,
-                    blacklisted_roles TEXT,
-                    log_channel TEXT,
-                    auto_roles TEXT,
-                    stack_roles BOOLEAN DEFAULT FALSE,
-                    decay_enabled BOOLEAN DEFAULT FALSE,
-                    decay_days INTEGER DEFAULT 30
-                )
-            """)
-            
-            # User reputation
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS user_reputation (
-                    user_id TEXT,
-                    guild_id TEXT,
-                    reputation INTEGER DEFAULT 0,
-                    total_given INTEGER DEFAULT 0,
-                    total_received INTEGER DEFAULT 0,
-                    last_given DATETIME,
-                    last_received DATETIME,
-                    PRIMARY KEY (user_id, guild_id)
-                )
-            """)
-            
-            # Reputation history
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS reputation_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id TEXT NOT NULL,
-                    giver_id TEXT NOT NULL,
-                    receiver_id TEXT NOT NULL,
-                    message_id TEXT,
-                    reason TEXT,
-                    amount INTEGER DEFAULT 1,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Reputation roles
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS reputation_roles (
-                    guild_id TEXT,
-                    reputation INTEGER,
-                    role_id TEXT,
-                    PRIMARY KEY (guild_id, reputation)
-                )
-            """)
-            
-            conn.commit()
-            logger.info("Reputation tables created successfully")
-            
-        except sqlite3.Error as e:
-            logger.error(f"Failed to setup reputation tables: {e}")
-            if conn:
-                conn.rollback()
-            raise
-        finally:
-            if conn:
-                conn.close()
-
     def register_handlers(self):
         """Register event handlers"""
         event_dispatcher.register('rep_give', self.log_reputation)
@@ -133,46 +58,41 @@ class Reputation(commands.Cog):
     async def get_settings(self, guild_id: int) -> Dict:
         """Get reputation settings for a guild"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    SELECT * FROM reputation_settings WHERE guild_id = ?
-                """, (str(guild_id),))
-                data = cursor.fetchone()
-                
-                if not data:
-                    default_settings = {
-                        'cooldown': 43200,  # 12 hours in seconds
-                        'max_daily': 3,
-                        'min_message_age': 1800,  # 30 minutes in seconds
-                        'required_role': None,
-                        'blacklisted_roles': '',
-                        'log_channel': None,
-                        'auto_roles': '',
-                        'stack_roles': False,
-                        'decay_enabled': False,
-                        'decay_days': 30
-                    }
-                    
+                with connection() as conn:
+                    cursor = conn.cursor()
+                
                     cursor.execute("""
-                        INSERT INTO reputation_settings
-                        (guild_id, cooldown, max_daily)
-                        VALUES (?, ?, ?)
-                    """, (str(guild_id), 43200, 3))
-                    conn.commit()
-                    return default_settings
+                        SELECT * FROM reputation_settings WHERE guild_id = ?
+                    """, (str(guild_id),))
+                    data = cursor.fetchone()
+                
+                    if not data:
+                        default_settings = {
+                            'cooldown': 43200,  # 12 hours in seconds
+                            'max_daily': 3,
+                            'min_message_age': 1800,  # 30 minutes in seconds
+                            'required_role': None,
+                            'blacklisted_roles': '',
+                            'log_channel': None,
+                            'auto_roles': '',
+                            'stack_roles': False,
+                            'decay_enabled': False,
+                            'decay_days': 30
+                        }
                     
-                return dict(data)
+                        await execute_write("""
+                            INSERT INTO reputation_settings
+                            (guild_id, cooldown, max_daily)
+                            VALUES (?, ?, ?)
+                        """, (str(guild_id), 43200, 3))
+                        return default_settings
+                    
+                    return dict(data)
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to get reputation settings: {e}")
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def check_reputation_roles(self, member: discord.Member, reputation: int):
         """Check and update reputation roles"""
@@ -183,48 +103,44 @@ class Reputation(commands.Cog):
             settings = await self.get_settings(member.guild.id)
             
             async with self.db_lock:
-                conn = None
                 try:
-                    conn = get_connection()
-                    cursor = conn.cursor()
+                    with connection() as conn:
+                        cursor = conn.cursor()
                     
-                    cursor.execute("""
-                        SELECT role_id, reputation FROM reputation_roles
-                        WHERE guild_id = ? AND reputation <= ?
-                        ORDER BY reputation DESC
-                    """, (str(member.guild.id), reputation))
-                    role_data = cursor.fetchall()
+                        cursor.execute("""
+                            SELECT role_id, reputation FROM reputation_roles
+                            WHERE guild_id = ? AND reputation <= ?
+                            ORDER BY reputation DESC
+                        """, (str(member.guild.id), reputation))
+                        role_data = cursor.fetchall()
                     
-                    if not role_data:
-                        return
+                        if not role_data:
+                            return
                         
-                    try:
-                        if settings['stack_roles']:
-                            # Add all roles up to current reputation
-                            for data in role_data:
-                                role = member.guild.get_role(int(data['role_id']))
-                                if role and role not in member.roles:
-                                    await member.add_roles(role)
-                        else:
-                            # Only add highest role
-                            highest_role = member.guild.get_role(int(role_data[0]['role_id']))
-                            if highest_role:
-                                # Remove other reputation roles
-                                for data in role_data[1:]:
+                        try:
+                            if settings['stack_roles']:
+                                # Add all roles up to current reputation
+                                for data in role_data:
                                     role = member.guild.get_role(int(data['role_id']))
-                                    if role and role in member.roles:
-                                        await member.remove_roles(role)
-                                # Add highest role
-                                if highest_role not in member.roles:
-                                    await member.add_roles(highest_role)
-                    except discord.Forbidden:
-                        logger.error(f"Failed to update roles for {member.id}: Missing permissions")
+                                    if role and role not in member.roles:
+                                        await member.add_roles(role)
+                            else:
+                                # Only add highest role
+                                highest_role = member.guild.get_role(int(role_data[0]['role_id']))
+                                if highest_role:
+                                    # Remove other reputation roles
+                                    for data in role_data[1:]:
+                                        role = member.guild.get_role(int(data['role_id']))
+                                        if role and role in member.roles:
+                                            await member.remove_roles(role)
+                                    # Add highest role
+                                    if highest_role not in member.roles:
+                                        await member.add_roles(highest_role)
+                        except discord.Forbidden:
+                            logger.error(f"Failed to update roles for {member.id}: Missing permissions")
                         
                 except sqlite3.Error as e:
                     logger.error(f"Failed to check reputation roles: {e}")
-                finally:
-                    if conn:
-                        conn.close()
         finally:
             self.role_lock.release()
 
@@ -307,67 +223,65 @@ class Reputation(commands.Cog):
                             f"❌ You must wait {int(remaining.total_seconds() // 60)} minutes before giving reputation again!"
                         )
                 
-                conn = None
                 try:
-                    conn = get_connection()
-                    cursor = conn.cursor()
+                    with connection() as conn:
+                        cursor = conn.cursor()
                     
-                    # Check daily limit
-                    cursor.execute("""
-                        SELECT COUNT(*) as count FROM reputation_history
-                        WHERE guild_id = ? AND giver_id = ? 
-                        AND timestamp > datetime('now', '-1 day')
-                    """, (str(ctx.guild.id), str(ctx.author.id)))
-                    data = cursor.fetchone()
+                        # Check daily limit
+                        cursor.execute("""
+                            SELECT COUNT(*) as count FROM reputation_history
+                            WHERE guild_id = ? AND giver_id = ? 
+                            AND timestamp > datetime('now', '-1 day')
+                        """, (str(ctx.guild.id), str(ctx.author.id)))
+                        data = cursor.fetchone()
                     
                     if data['count'] >= settings['max_daily']:
                         return await self.send_response_once(ctx, "❌ You've reached your daily reputation limit!")
                     
-                    # Update reputation
-                    cursor.execute("""
-                        INSERT INTO user_reputation (user_id, guild_id, reputation, total_received)
-                        VALUES (?, ?, 1, 1)
-                        ON CONFLICT(user_id, guild_id) DO UPDATE SET
-                        reputation = reputation + 1,
-                        total_received = total_received + 1,
-                        last_received = CURRENT_TIMESTAMP
-                    """, (str(member.id), str(ctx.guild.id)))
+                    def give(conn):
+                        # Update reputation
+                        conn.execute("""
+                            INSERT INTO user_reputation (user_id, guild_id, reputation, total_received)
+                            VALUES (?, ?, 1, 1)
+                            ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                            reputation = reputation + 1,
+                            total_received = total_received + 1,
+                            last_received = CURRENT_TIMESTAMP
+                        """, (str(member.id), str(ctx.guild.id)))
                     
-                    # Update giver stats
-                    cursor.execute("""
-                        INSERT INTO user_reputation (user_id, guild_id, total_given)
-                        VALUES (?, ?, 1)
-                        ON CONFLICT(user_id, guild_id) DO UPDATE SET
-                        total_given = total_given + 1,
-                        last_given = CURRENT_TIMESTAMP
-                    """, (str(ctx.author.id), str(ctx.guild.id)))
+                        # Update giver stats
+                        conn.execute("""
+                            INSERT INTO user_reputation (user_id, guild_id, total_given)
+                            VALUES (?, ?, 1)
+                            ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                            total_given = total_given + 1,
+                            last_given = CURRENT_TIMESTAMP
+                        """, (str(ctx.author.id), str(ctx.guild.id)))
                     
-                    # Record history
-                    cursor.execute("""
-                        INSERT INTO reputation_history
-                        (guild_id, giver_id, receiver_id, message_id, reason, amount)
-                        VALUES (?, ?, ?, ?, ?, 1)
-                    """, (
-                        str(ctx.guild.id),
-                        str(ctx.author.id),
-                        str(member.id),
-                        str(ctx.message.id),
-                        reason
-                    ))
+                        # Record history
+                        conn.execute("""
+                            INSERT INTO reputation_history
+                            (guild_id, giver_id, receiver_id, message_id, reason, amount)
+                            VALUES (?, ?, ?, ?, ?, 1)
+                        """, (
+                            str(ctx.guild.id),
+                            str(ctx.author.id),
+                            str(member.id),
+                            str(ctx.message.id),
+                            reason
+                        ))
                     
-                    conn.commit()
+                        # Get new reputation
+                        return conn.execute("""
+                            SELECT reputation FROM user_reputation
+                            WHERE user_id = ? AND guild_id = ?
+                        """, (str(member.id), str(ctx.guild.id))).fetchone()['reputation']
+                    
+                    new_rep = await run_write(give)
                     
                     # Set cooldown
                     self.cooldowns[cooldown_key] = datetime.utcnow() + timedelta(seconds=settings['cooldown'])
                     
-                    # Get new reputation
-                    cursor.execute("""
-                        SELECT reputation FROM user_reputation
-                        WHERE user_id = ? AND guild_id = ?
-                    """, (str(member.id), str(ctx.guild.id)))
-                    data = cursor.fetchone()
-                    new_rep = data['reputation']
-                    
                     await self.check_reputation_roles(member, new_rep)
                     await self.log_reputation(ctx.guild, ctx.author, member, "Give", 1, reason)
                     await self.send_response_once(
@@ -378,11 +292,6 @@ class Reputation(commands.Cog):
                 except sqlite3.Error as e:
                     logger.error(f"Failed to give reputation: {e}")
                     await self.send_response_once(ctx, "❌ An error occurred while giving reputation")
-                    if conn:
-                        conn.rollback()
-                finally:
-                    if conn:
-                        conn.close()
         finally:
             self.cooldown_lock.release()
 
@@ -394,39 +303,35 @@ class Reputation(commands.Cog):
             return await self.send_response_once(ctx, "❌ Amount must be positive!")
             
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    UPDATE user_reputation
-                    SET reputation = MAX(0, reputation - ?)
-                    WHERE user_id = ? AND guild_id = ?
-                """, (amount, str(member.id), str(ctx.guild.id)))
-                
-                # Record history
-                cursor.execute("""
-                    INSERT INTO reputation_history
-                    (guild_id, giver_id, receiver_id, reason, amount)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    str(ctx.guild.id),
-                    str(ctx.author.id),
-                    str(member.id),
-                    reason,
-                    -amount
-                ))
-                
-                conn.commit()
-                
-                # Get new reputation
-                cursor.execute("""
-                    SELECT reputation FROM user_reputation
-                    WHERE user_id = ? AND guild_id = ?
-                """, (str(member.id), str(ctx.guild.id)))
-                data = cursor.fetchone()
-                new_rep = data['reputation'] if data else 0
+                def remove(conn):
+                    conn.execute("""
+                        UPDATE user_reputation
+                        SET reputation = MAX(0, reputation - ?)
+                        WHERE user_id = ? AND guild_id = ?
+                    """, (amount, str(member.id), str(ctx.guild.id)))
+                
+                    # Record history
+                    conn.execute("""
+                        INSERT INTO reputation_history
+                        (guild_id, giver_id, receiver_id, reason, amount)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, (
+                        str(ctx.guild.id),
+                        str(ctx.author.id),
+                        str(member.id),
+                        reason,
+                        -amount
+                    ))
+                
+                    # Get new reputation
+                    data = conn.execute("""
+                        SELECT reputation FROM user_reputation
+                        WHERE user_id = ? AND guild_id = ?
+                    """, (str(member.id), str(ctx.guild.id))).fetchone()
+                    return data['reputation'] if data else 0
+                
+                new_rep = await run_write(remove)
                 
                 await self.check_reputation_roles(member, new_rep)
                 await self.log_reputation(ctx.guild, ctx.author, member, "Remove", amount, reason)
@@ -438,11 +343,6 @@ class Reputation(commands.Cog):
             except sqlite3.Error as e:
                 logger.error(f"Failed to remove reputation: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while removing reputation")
-                if conn:
-                    conn.rollback()
-            finally:
-                if conn:
-                    conn.close()
 
     @rep.command(name="check")
     async def check_rep(self, ctx, member: discord.Member = None):
@@ -450,97 +350,89 @@ class Reputation(commands.Cog):
         member = member or ctx.author
         
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
+                with connection() as conn:
+                    cursor = conn.cursor()
                 
-                cursor.execute("""
-                    SELECT * FROM user_reputation
-                    WHERE user_id = ? AND guild_id = ?
-                """, (str(member.id), str(ctx.guild.id)))
-                data = cursor.fetchone()
+                    cursor.execute("""
+                        SELECT * FROM user_reputation
+                        WHERE user_id = ? AND guild_id = ?
+                    """, (str(member.id), str(ctx.guild.id)))
+                    data = cursor.fetchone()
                 
-                if not data:
-                    return await self.send_response_once(ctx, "❌ This user has no reputation yet!")
+                    if not data:
+                        return await self.send_response_once(ctx, "❌ This user has no reputation yet!")
                     
-                # Get rank
-                cursor.execute("""
-                    SELECT COUNT(*) as rank
-                    FROM user_reputation
-                    WHERE guild_id = ? AND reputation > ?
-                """, (str(ctx.guild.id), data['reputation']))
-                rank_data = cursor.fetchone()
-                
-                rank = rank_data['rank'] + 1
-                
-                embed = Embed.create(
-                    title=f"⭐ Reputation - {member.display_name}",
-                    color=member.color,
-                    field_Reputation=str(data['reputation']),
-                    field_Rank=f"#{rank}",
-                    field_Given=str(data['total_given']),
-                    field_Received=str(data['total_received'])
-                )
-                
-                if data['last_received']:
-                    embed.add_field(
-                        name="Last Received",
-                        value=f"<t:{int(datetime.strptime(data['last_received'], '%Y-%m-%d %H:%M:%S').timestamp())}:R>"
+                    # Get rank
+                    cursor.execute("""
+                        SELECT COUNT(*) as rank
+                        FROM user_reputation
+                        WHERE guild_id = ? AND reputation > ?
+                    """, (str(ctx.guild.id), data['reputation']))
+                    rank_data = cursor.fetchone()
+                
+                    rank = rank_data['rank'] + 1
+                
+                    embed = Embed.create(
+                        title=f"⭐ Reputation - {member.display_name}",
+                        color=member.color,
+                        field_Reputation=str(data['reputation']),
+                        field_Rank=f"#{rank}",
+                        field_Given=str(data['total_given']),
+                        field_Received=str(data['total_received'])
                     )
+                
+                    if data['last_received']:
+                        embed.add_field(
+                            name="Last Received",
+                            value=f"<t:{int(datetime.strptime(data['last_received'], '%Y-%m-%d %H:%M:%S').timestamp())}:R>"
+                        )
                     
-                await self.send_response_once(ctx, embed=embed)
+                    await self.send_response_once(ctx, embed=embed)
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to check reputation: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while checking reputation")
-            finally:
-                if conn:
-                    conn.close()
 
     @rep.command(name="top")
     async def top_rep(self, ctx):
         """Show reputation leaderboard"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
+                with connection() as conn:
+                    cursor = conn.cursor()
                 
-                cursor.execute("""
-                    SELECT user_id, reputation
-                    FROM user_reputation
-                    WHERE guild_id = ?
-                    ORDER BY reputation DESC
-                    LIMIT 10
-                """, (str(ctx.guild.id),))
-                top_users = cursor.fetchall()
+                    cursor.execute("""
+                        SELECT user_id, reputation
+                        FROM user_reputation
+                        WHERE guild_id = ?
+                        ORDER BY reputation DESC
+                        LIMIT 10
+                    """, (str(ctx.guild.id),))
+                    top_users = cursor.fetchall()
                 
-                if not top_users:
-                    return await self.send_response_once(ctx, "❌ No one has any reputation yet!")
+                    if not top_users:
+                        return await self.send_response_once(ctx, "❌ No one has any reputation yet!")
                     
-                embed = Embed.create(
-                    title=f"⭐ {ctx.guild.name}'s Top Members",
-                    color=discord.Color.gold()
-                )
+                    embed = Embed.create(
+                        title=f"⭐ {ctx.guild.name}'s Top Members",
+                        color=discord.Color.gold()
+                    )
                 
-                for idx, user_data in enumerate(top_users, 1):
-                    member = ctx.guild.get_member(int(user_data['user_id']))
-                    if member:
-                        embed.add_field(
-                            name=f"#{idx} {member.display_name}",
-                            value=f"{user_data['reputation']} ⭐",
-                            inline=False
-                        )
+                    for idx, user_data in enumerate(top_users, 1):
+                        member = ctx.guild.get_member(int(user_data['user_id']))
+                        if member:
+                            embed.add_field(
+                                name=f"#{idx} {member.display_name}",
+                                value=f"{user_data['reputation']} ⭐",
+                                inline=False
+                            )
                         
-                await self.send_response_once(ctx, embed=embed)
+                    await self.send_response_once(ctx, embed=embed)
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to get reputation leaderboard: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while getting the leaderboard")
-            finally:
-                if conn:
-                    conn.close()
 
     @rep.command(name="history")
     async def rep_history(self, ctx, member: discord.Member = None):
@@ -548,50 +440,46 @@ class Reputation(commands.Cog):
         member = member or ctx.author
         
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    SELECT * FROM reputation_history
-                    WHERE (giver_id = ? OR receiver_id = ?) AND guild_id = ?
-                    ORDER BY timestamp DESC LIMIT 10
-                """, (str(member.id), str(member.id), str(ctx.guild.id)))
-                history = cursor.fetchall()
-                
-                if not history:
-                    return await self.send_response_once(ctx, "❌ No reputation history found!")
+                with connection() as conn:
+                    cursor = conn.cursor()
+                
+                    cursor.execute("""
+                        SELECT * FROM reputation_history
+                        WHERE (giver_id = ? OR receiver_id = ?) AND guild_id = ?
+                        ORDER BY timestamp DESC LIMIT 10
+                    """, (str(member.id), str(member.id), str(ctx.guild.id)))
+                    history = cursor.fetchall()
+                
+                    if not history:
+                        return await self.send_response_once(ctx, "❌ No reputation history found!")
                     
-                embed = Embed.create(
-                    title=f"⭐ Reputation History - {member.display_name}",
-                    color=member.color
-                )
+                    embed = Embed.create(
+                        title=f"⭐ Reputation History - {member.display_name}",
+                        color=member.color
+                    )
                 
-                for entry in history:
-                    giver = ctx.guild.get_member(int(entry['giver_id']))
-                    receiver = ctx.guild.get_member(int(entry['receiver_id']))
+                    for entry in history:
+                        giver = ctx.guild.get_member(int(entry['giver_id']))
+                        receiver = ctx.guild.get_member(int(entry['receiver_id']))
                     
-                    if giver and receiver:
-                        timestamp = datetime.strptime(entry['timestamp'], '%Y-%m-%d %H:%M:%S')
-                        action = "Received" if entry['receiver_id'] == str(member.id) else "Gave"
-                        target = giver if action == "Received" else receiver
+                        if giver and receiver:
+                            timestamp = datetime.strptime(entry['timestamp'], '%Y-%m-%d %H:%M:%S')
+                            action = "Received" if entry['receiver_id'] == str(member.id) else "Gave"
+                            target = giver if action == "Received" else receiver
                         
-                        embed.add_field(
-                            name=f"{action} {abs(entry['amount'])} ⭐ {discord.utils.format_dt(timestamp, 'R')}",
-                            value=f"{'From' if action == 'Received' else 'To'}: {target.mention}\n"
-                                  f"Reason: {entry['reason'] or 'No reason provided'}",
-                            inline=False
-                        )
+                            embed.add_field(
+                                name=f"{action} {abs(entry['amount'])} ⭐ {discord.utils.format_dt(timestamp, 'R')}",
+                                value=f"{'From' if action == 'Received' else 'To'}: {target.mention}\n"
+                                      f"Reason: {entry['reason'] or 'No reason provided'}",
+                                inline=False
+                            )
                         
-                await self.send_response_once(ctx, embed=embed)
+                    await self.send_response_once(ctx, embed=embed)
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to get reputation history: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while getting the history")
-            finally:
-                if conn:
-                    conn.close()
 
     @commands.group(name="repset")
     @commands.has_permissions(manage_guild=True)
@@ -622,28 +510,18 @@ class Reputation(commands.Cog):
             return await self.send_response_once(ctx, "❌ Cooldown must be at least 1 hour!")
             
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await execute_write("""
                     UPDATE reputation_settings
                     SET cooldown = ?
                     WHERE guild_id = ?
                 """, (hours * 3600, str(ctx.guild.id)))
-                conn.commit()
                 
                 await self.send_response_once(ctx, f"✅ Reputation cooldown set to {hours} hours")
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to set cooldown: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while setting the cooldown")
-                if conn:
-                    conn.rollback()
-            finally:
-                if conn:
-                    conn.close()
 
     @repset.command(name="maxdaily")
     async def set_max_daily(self, ctx, amount: int):
@@ -652,28 +530,18 @@ class Reputation(commands.Cog):
             return await self.send_response_once(ctx, "❌ Amount must be positive!")
             
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await execute_write("""
                     UPDATE reputation_settings
                     SET max_daily = ?
                     WHERE guild_id = ?
                 """, (amount, str(ctx.guild.id)))
-                conn.commit()
                 
                 await self.send_response_once(ctx, f"✅ Maximum daily reputation gives set to {amount}")
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to set max daily: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while setting the daily limit")
-                if conn:
-                    conn.rollback()
-            finally:
-                if conn:
-                    conn.close()
 
     @repset.command(name="addrole")
     async def add_rep_role(self, ctx, role: discord.Role, required_rep: int):
@@ -682,76 +550,53 @@ class Reputation(commands.Cog):
             return await self.send_response_once(ctx, "❌ Required reputation must be positive!")
             
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await execute_write("""
                     INSERT OR REPLACE INTO reputation_roles
                     (guild_id, reputation, role_id)
                     VALUES (?, ?, ?)
                 """, (str(ctx.guild.id), required_rep, str(role.id)))
-                conn.commit()
                 
                 await self.send_response_once(ctx, f"✅ {role.mention} will be given at {required_rep} reputation")
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to add reputation role: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while adding the role")
-                if conn:
-                    conn.rollback()
-            finally:
-                if conn:
-                    conn.close()
 
     @repset.command(name="removerole")
     async def remove_rep_role(self, ctx, role: discord.Role):
         """Remove a reputation role reward"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await execute_write("""
                     DELETE FROM reputation_roles
                     WHERE guild_id = ? AND role_id = ?
                 """, (str(ctx.guild.id), str(role.id)))
-                conn.commit()
                 
                 await self.send_response_once(ctx, f"✅ Removed {role.mention} from reputation rewards")
                 
             except sqlite3.Error as e:
                 logger.error(f"Failed to remove reputation role: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while removing the role")
-                if conn:
-                    conn.rollback()
-            finally:
-                if conn:
-                    conn.close()
 
     @repset.command(name="stackroles")
     async def toggle_stack_roles(self, ctx):
         """Toggle stacking of reputation roles"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
+                def toggle(conn):
+                    conn.execute("""
+                        UPDATE reputation_settings
+                        SET stack_roles = NOT stack_roles
+                        WHERE guild_id = ?
+                    """, (str(ctx.guild.id),))
                 
-                cursor.execute("""
-                    UPDATE reputation_settings
-                    SET stack_roles = NOT stack_roles
-                    WHERE guild_id = ?
-                """, (str(ctx.guild.id),))
-                conn.commit()
+                    return conn.execute("""
+                        SELECT stack_roles FROM reputation_settings
+                        WHERE guild_id = ?
+                    """, (str(ctx.guild.id),)).fetchone()
                 
-                cursor.execute("""
-                    SELECT stack_roles FROM reputation_settings
-                    WHERE guild_id = ?
-                """, (str(ctx.guild.id),))
-                data = cursor.fetchone()
+                data = await run_write(toggle)
                 
                 enabled = data['stack_roles']
                 await self.send_response_once(ctx, f"✅ Role stacking {'enabled' if enabled else 'disabled'}")
@@ -759,14 +604,8 @@ class Reputation(commands.Cog):
             except sqlite3.Error as e:
                 logger.error(f"Failed to toggle role stacking: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred while toggling role stacking")
-                if conn:
-                    conn.rollback()
-            finally:
-                if conn:
-                    conn.close()
 
 async def setup(bot):
     """Setup the Reputation cog"""
     cog = Reputation(bot)
-    cog.setup_tables()  # Not async anymore since using sqlite3
     await bot.add_cog(cog)
\ No newline at end of file
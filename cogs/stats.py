@@ -5,7 +5,8 @@ from collections import Counter
 import matplotlib.pyplot as plt
 import pandas as pd
 import io
-from .utils import Embed, get_connection, logger
+from .utils import Embed, connection, logger
+from database import enqueue_write
 
 class ServerStats(commands.Cog):
     """📊 Sistem Statistik Server"""
@@ -16,25 +17,14 @@ class ServerStats(commands.Cog):
         self.voice_time = {}
         
     def log_activity(self, guild_id: int, user_id: int, activity_type: str, details: str = None):
-        """Log any server activity"""
-        conn = None
+        """Log any server activity (di-commit bersama write lain oleh write queue)"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            enqueue_write("""
                 INSERT INTO activity_logs (guild_id, user_id, activity_type, details)
                 VALUES (?, ?, ?, ?)
             """, (str(guild_id), str(user_id), activity_type, details))
-            
-            conn.commit()
         except Exception as e:
             logger.error(f"Error logging activity: {e}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                conn.close()
 
     def log_message_activity(self, message):
         """Log message activity"""
@@ -151,119 +141,111 @@ class ServerStats(commands.Cog):
     @commands.command(name="activitystats")
     async def activity_statistics(self, ctx, days: int = 7):
         """📈 Tampilkan statistik aktivitas"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT activity_type, COUNT(*) as count, 
-                       strftime('%Y-%m-%d', timestamp) as date
-                FROM activity_logs
-                WHERE guild_id = ?
-                AND timestamp > datetime('now', ?)
-                GROUP BY activity_type, date
-                ORDER BY date
-            """, (str(ctx.guild.id), f'-{days} days'))
+                cursor.execute("""
+                    SELECT activity_type, COUNT(*) as count, 
+                           strftime('%Y-%m-%d', timestamp) as date
+                    FROM activity_logs
+                    WHERE guild_id = ?
+                    AND timestamp > datetime('now', ?)
+                    GROUP BY activity_type, date
+                    ORDER BY date
+                """, (str(ctx.guild.id), f'-{days} days'))
             
-            data = cursor.fetchall()
+                data = cursor.fetchall()
             
-            if not data:
-                return await ctx.send("❌ Tidak ada data aktivitas!")
+                if not data:
+                    return await ctx.send("❌ Tidak ada data aktivitas!")
                 
-            # Convert to DataFrame
-            df = pd.DataFrame(data, columns=['activity_type', 'count', 'date'])
-            pivot = df.pivot(index='date', columns='activity_type', values='count')
+                # Convert to DataFrame
+                df = pd.DataFrame(data, columns=['activity_type', 'count', 'date'])
+                pivot = df.pivot(index='date', columns='activity_type', values='count')
             
-            # Create plot
-            plt.figure(figsize=(10, 6))
-            pivot.plot(kind='line', marker='o')
-            plt.title(f'Server Activity (Last {days} days)')
-            plt.xlabel('Date')
-            plt.ylabel('Activity Count')
-            plt.legend(title='Activity Type')
-            plt.grid(True)
-            plt.tight_layout()
+                # Create plot
+                plt.figure(figsize=(10, 6))
+                pivot.plot(kind='line', marker='o')
+                plt.title(f'Server Activity (Last {days} days)')
+                plt.xlabel('Date')
+                plt.ylabel('Activity Count')
+                plt.legend(title='Activity Type')
+                plt.grid(True)
+                plt.tight_layout()
             
-            # Save plot
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png')
-            buf.seek(0)
-            plt.close()
+                # Save plot
+                buf = io.BytesIO()
+                plt.savefig(buf, format='png')
+                buf.seek(0)
+                plt.close()
             
-            # Send result
-            file = discord.File(buf, 'activity_stats.png')
-            embed = Embed(
-                title="📈 Activity Statistics",
-                description=f"Activity overview for the last {days} days"
-            )
-            embed.set_image(url="attachment://activity_stats.png")
+                # Send result
+                file = discord.File(buf, 'activity_stats.png')
+                embed = Embed(
+                    title="📈 Activity Statistics",
+                    description=f"Activity overview for the last {days} days"
+                )
+                embed.set_image(url="attachment://activity_stats.png")
             
-            await ctx.send(embed=embed, file=file)
+                await ctx.send(embed=embed, file=file)
             
         except Exception as e:
             logger.error(f"Error getting activity statistics: {e}")
             await ctx.send("❌ Terjadi kesalahan saat mengambil statistik aktivitas!")
-        finally:
-            if conn:
-                conn.close()
 
     @commands.command(name="memberhistory")
     async def member_history(self, ctx):
         """📈 Tampilkan history member"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT member_count, 
-                       strftime('%Y-%m-%d', timestamp) as date
-                FROM member_history
-                WHERE guild_id = ?
-                ORDER BY timestamp
-            """, (str(ctx.guild.id),))
+                cursor.execute("""
+                    SELECT member_count, 
+                           strftime('%Y-%m-%d', timestamp) as date
+                    FROM member_history
+                    WHERE guild_id = ?
+                    ORDER BY timestamp
+                """, (str(ctx.guild.id),))
             
-            data = cursor.fetchall()
+                data = cursor.fetchall()
             
-            if not data:
-                return await ctx.send("❌ Tidak ada data history member!")
+                if not data:
+                    return await ctx.send("❌ Tidak ada data history member!")
                 
-            # Create plot
-            dates = [row[1] for row in data]
-            counts = [row[0] for row in data]
+                # Create plot
+                dates = [row[1] for row in data]
+                counts = [row[0] for row in data]
             
-            plt.figure(figsize=(10, 6))
-            plt.plot(dates, counts, marker='o')
-            plt.title('Member Growth History')
-            plt.xlabel('Date')
-            plt.ylabel('Member Count')
-            plt.xticks(rotation=45)
-            plt.grid(True)
-            plt.tight_layout()
+                plt.figure(figsize=(10, 6))
+                plt.plot(dates, counts, marker='o')
+                plt.title('Member Growth History')
+                plt.xlabel('Date')
+                plt.ylabel('Member Count')
+                plt.xticks(rotation=45)
+                plt.grid(True)
+                plt.tight_layout()
             
-            # Save plot
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png')
-            buf.seek(0)
-            plt.close()
+                # Save plot
+                buf = io.BytesIO()
+                plt.savefig(buf, format='png')
+                buf.seek(0)
+                plt.close()
             
-            # Send result
-            file = discord.File(buf, 'member_history.png')
-            embed = Embed(
-                title="📈 Member History",
-                description="Server member count over time"
-            )
-            embed.set_image(url="attachment://member_history.png")
+                # Send result
+                file = discord.File(buf, 'member_history.png')
+                embed = Embed(
+                    title="📈 Member History",
+                    description="Server member count over time"
+                )
+                embed.set_image(url="attachment://member_history.png")
             
-            await ctx.send(embed=embed, file=file)
+                await ctx.send(embed=embed, file=file)
             
         except Exception as e:
             logger.error(f"Error getting member history: {e}")
             await ctx.send("❌ Terjadi kesalahan saat mengambil history member!")
-        finally:
-            if conn:
-                conn.close()
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -271,24 +253,13 @@ class ServerStats(commands.Cog):
         self.log_activity(member.guild.id, member.id, 'member_join')
         
         # Update member history
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            enqueue_write("""
                 INSERT INTO member_history (guild_id, member_count)
                 VALUES (?, ?)
             """, (str(member.guild.id), len(member.guild.members)))
-            
-            conn.commit()
         except Exception as e:
             logger.error(f"Error logging member join: {e}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                conn.close()
 
     @commands.Cog.listener()
     async def on_member_remove(self, member):
@@ -296,24 +267,13 @@ class ServerStats(commands.Cog):
         self.log_activity(member.guild.id, member.id, 'member_leave')
         
         # Update member history
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            enqueue_write("""
                 INSERT INTO member_history (guild_id, member_count)
                 VALUES (?, ?)
             """, (str(member.guild.id), len(member.guild.members)))
-            
-            conn.commit()
         except Exception as e:
             logger.error(f"Error logging member leave: {e}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                conn.close()
 
 async def setup(bot):
     """Setup the Stats cog"""
@@ -15,7 +15,7 @@ from typing import Optional, Dict, List
 
 from .utils import (
     Embed, 
-    get_connection,
+    connection,
     logger, 
     EventDispatcher,
     Permissions,
@@ -30,6 +30,7 @@ from ext.constants import (
 )
 from ext.base_handler import BaseLockHandler
 from ext.cache_manager import CacheManager
+from database import execute_write
 
 logger = logging.getLogger(__name__)
 
@@ -216,31 +217,28 @@ class TicketSystem(commands.Cog, BaseLockHandler):
         
         try:
             # Load active tickets first
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT id, channel_id FROM tickets 
-                WHERE status = 'open'
-            """)
+                cursor.execute("""
+                    SELECT id, channel_id FROM tickets 
+                    WHERE status = 'open'
+                """)
             
-            for row in cursor.fetchall():
-                self.active_tickets[int(row['channel_id'])] = row['id']
+                for row in cursor.fetchall():
+                    self.active_tickets[int(row['channel_id'])] = row['id']
                 
-            logger.info(f"Loaded {len(self.active_tickets)} active tickets")
+                logger.info(f"Loaded {len(self.active_tickets)} active tickets")
             
-            # Setup channels for each guild
-            for guild in self.bot.guilds:
-                if guild.id not in self.setup_tasks:
-                    self.setup_tasks[guild.id] = self.bot.loop.create_task(
-                        self.setup_guild_tickets(guild)
-                    )
+                # Setup channels for each guild
+                for guild in self.bot.guilds:
+                    if guild.id not in self.setup_tasks:
+                        self.setup_tasks[guild.id] = self.bot.loop.create_task(
+                            self.setup_guild_tickets(guild)
+                        )
             
         except Exception as e:
             logger.error(f"Error in ticket system setup: {e}")
-        finally:
-            if 'conn' in locals():
-                conn.close()
 
     async def setup_guild_tickets(self, guild):
         """Setup ticket channel for a specific guild"""
@@ -327,57 +325,51 @@ class TicketSystem(commands.Cog, BaseLockHandler):
         if settings:
             return settings
             
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM ticket_settings 
-                WHERE guild_id = ?
-            """, (str(guild_id),))
-            
-            data = cursor.fetchone()
-            
-            if not data:
-                # Use default settings
-                settings = {
-                    'category_id': None,
-                    'log_channel_id': None,
-                    'support_role_id': None,
-                    'max_tickets': 1,
-                    'ticket_format': 'ticket-{user}-{number}',
-                    'auto_close_hours': 48,
-                    'notification_channel': None,
-                    'allow_user_close': True,
-                    'ticket_welcome': "Support team will assist you shortly."
-                }
-                
-                # Save default settings
+            with connection() as conn:
+                cursor = conn.cursor()
+            
                 cursor.execute("""
-                    INSERT INTO ticket_settings (guild_id)
-                    VALUES (?)
+                    SELECT * FROM ticket_settings 
+                    WHERE guild_id = ?
                 """, (str(guild_id),))
+            
+                data = cursor.fetchone()
+            
+                if not data:
+                    # Use default settings
+                    settings = {
+                        'category_id': None,
+                        'log_channel_id': None,
+                        'support_role_id': None,
+                        'max_tickets': 1,
+                        'ticket_format': 'ticket-{user}-{number}',
+                        'auto_close_hours': 48,
+                        'notification_channel': None,
+                        'allow_user_close': True,
+                        'ticket_welcome': "Support team will assist you shortly."
+                    }
                 
-                conn.commit()
-            else:
-                settings = dict(data)
-            
-            # Cache settings
-            await self.cache_manager.set(
-                cache_key,
-                settings,
-                expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.MEDIUM)
-            )
+                    # Save default settings
+                    await execute_write("""
+                        INSERT INTO ticket_settings (guild_id)
+                        VALUES (?)
+                    """, (str(guild_id),))
+                else:
+                    settings = dict(data)
+            
+                # Cache settings
+                await self.cache_manager.set(
+                    cache_key,
+                    settings,
+                    expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.MEDIUM)
+                )
             
-            return settings
+                return settings
             
         except Exception as e:
             logger.error(f"Error getting guild settings: {e}")
             return {}
-        finally:
-            if conn:
-                conn.close()
 
     async def create_ticket(
         self,
@@ -398,260 +390,243 @@ class TicketSystem(commands.Cog, BaseLockHandler):
                     ephemeral=True
                 )
 
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Check max tickets
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM tickets 
-                WHERE guild_id = ? AND user_id = ? AND status = 'open'
-            """, (str(interaction.guild_id), user_id))
-            
-            count = cursor.fetchone()['count']
-            if count >= settings['max_tickets']:
-                return await interaction.followup.send(
-                    "You have reached the maximum number of open tickets!",
-                    ephemeral=True
-                )
-                
-            # Get or create category
-            category_id = settings.get('category_id')
-            category = interaction.guild.get_channel(int(category_id)) if category_id else None
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            if not category:
-                category = await interaction.guild.create_category("Tickets")
+                # Check max tickets
                 cursor.execute("""
-                    UPDATE ticket_settings 
-                    SET category_id = ? 
-                    WHERE guild_id = ?
-                """, (str(category.id), str(interaction.guild_id)))
-                conn.commit()
-            
-            # Set channel permissions
-            overwrites = {
-                interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-                interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            }
+                    SELECT COUNT(*) as count FROM tickets 
+                    WHERE guild_id = ? AND user_id = ? AND status = 'open'
+                """, (str(interaction.guild_id), user_id))
             
-            if settings['support_role_id']:
-                support_role = interaction.guild.get_role(int(settings['support_role_id']))
-                if support_role:
-                    overwrites[support_role] = discord.PermissionOverwrite(
-                        read_messages=True,
-                        send_messages=True,
-                        manage_messages=True
+                count = cursor.fetchone()['count']
+                if count >= settings['max_tickets']:
+                    return await interaction.followup.send(
+                        "You have reached the maximum number of open tickets!",
+                        ephemeral=True
                     )
-                    
-            # Create channel
-            channel_name = settings['ticket_format'].format(
-                user=interaction.user.name.lower(),
-                number=count + 1
-            )
+                
+                # Get or create category
+                category_id = settings.get('category_id')
+                category = interaction.guild.get_channel(int(category_id)) if category_id else None
+            
+                if not category:
+                    category = await interaction.guild.create_category("Tickets")
+                    await execute_write("""
+                        UPDATE ticket_settings 
+                        SET category_id = ? 
+                        WHERE guild_id = ?
+                    """, (str(category.id), str(interaction.guild_id)))
+            
+                # Set channel permissions
+                overwrites = {
+                    interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                    interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
+                    interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+                }
             
-            channel = await category.create_text_channel(
-                channel_name,
-                overwrites=overwrites
-            )
+                if settings['support_role_id']:
+                    support_role = interaction.guild.get_role(int(settings['support_role_id']))
+                    if support_role:
+                        overwrites[support_role] = discord.PermissionOverwrite(
+                            read_messages=True,
+                            send_messages=True,
+                            manage_messages=True
+                        )
+                    
+                # Create channel
+                channel_name = settings['ticket_format'].format(
+                    user=interaction.user.name.lower(),
+                    number=count + 1
+                )
             
-            # Save ticket to database
-            cursor.execute("""
-                INSERT INTO tickets (
-                    guild_id, channel_id, user_id,
-                    title, description, last_activity
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                str(interaction.guild_id),
-                str(channel.id),
-                user_id,
-                title,
-                description,
-                datetime.utcnow()
-            ))
-            
-            ticket_id = cursor.lastrowid
-            self.active_tickets[channel.id] = ticket_id
-            
-            # Create ticket embed
-            embed = Embed.create(
-                title=f"Ticket: {title}",
-                description=description,
-                color=COLORS.DEFAULT
-            )
-            embed.add_field(name="Created By", value=interaction.user.mention)
-            embed.add_field(name="Status", value="🟢 Open")
-            embed.add_field(name="Priority", value="🟢 Low")
-            embed.set_footer(text=f"Ticket ID: {ticket_id}")
-            
-            # Add ticket controls
-            control_view = TicketControlView(self.bot, ticket_id)
-            
-            # Send welcome message
-            welcome_msg = settings.get('ticket_welcome', "Support team will assist you shortly.")
-            await channel.send(
-                f"{interaction.user.mention} {welcome_msg}",
-                embed=embed,
-                view=control_view
-            )
+                channel = await category.create_text_channel(
+                    channel_name,
+                    overwrites=overwrites
+                )
             
-            # Send notification
-            if settings.get('notification_channel'):
-                notif_channel = interaction.guild.get_channel(
-                    int(settings['notification_channel'])
+                # Save ticket to database
+                result = await execute_write("""
+                    INSERT INTO tickets (
+                        guild_id, channel_id, user_id,
+                        title, description, last_activity
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    str(interaction.guild_id),
+                    str(channel.id),
+                    user_id,
+                    title,
+                    description,
+                    datetime.utcnow()
+                ))
+            
+                ticket_id = result.lastrowid
+                self.active_tickets[channel.id] = ticket_id
+            
+                # Create ticket embed
+                embed = Embed.create(
+                    title=f"Ticket: {title}",
+                    description=description,
+                    color=COLORS.DEFAULT
+                )
+                embed.add_field(name="Created By", value=interaction.user.mention)
+                embed.add_field(name="Status", value="🟢 Open")
+                embed.add_field(name="Priority", value="🟢 Low")
+                embed.set_footer(text=f"Ticket ID: {ticket_id}")
+            
+                # Add ticket controls
+                control_view = TicketControlView(self.bot, ticket_id)
+            
+                # Send welcome message
+                welcome_msg = settings.get('ticket_welcome', "Support team will assist you shortly.")
+                await channel.send(
+                    f"{interaction.user.mention} {welcome_msg}",
+                    embed=embed,
+                    view=control_view
                 )
-                if notif_channel:
-                    await notif_channel.send(
-                        f"New ticket created by {interaction.user.mention}: {title}"
-                    )
             
-            # Set cooldown
-            self.ticket_cooldowns[user_id] = datetime.utcnow() + timedelta(minutes=5)
+                # Send notification
+                if settings.get('notification_channel'):
+                    notif_channel = interaction.guild.get_channel(
+                        int(settings['notification_channel'])
+                    )
+                    if notif_channel:
+                        await notif_channel.send(
+                            f"New ticket created by {interaction.user.mention}: {title}"
+                        )
             
-            await interaction.followup.send(
-                f"Ticket created! Head to {channel.mention}",
-                ephemeral=True
-            )
+                # Set cooldown
+                self.ticket_cooldowns[user_id] = datetime.utcnow() + timedelta(minutes=5)
             
-            conn.commit()
+                await interaction.followup.send(
+                    f"Ticket created! Head to {channel.mention}",
+                    ephemeral=True
+                )
             
         except Exception as e:
             logger.error(f"Error creating ticket: {e}")
-            if conn:
-                conn.rollback()
             await interaction.followup.send(
                 "An error occurred while creating the ticket",
                 ephemeral=True
             )
-        finally:
-            if conn:
-                conn.close()
 
     async def close_ticket(self, interaction: discord.Interaction, ticket_id: int):
         """Close a ticket"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
+            with connection() as conn:
+                cursor = conn.cursor()
             
-            # Get ticket info
-            cursor.execute("""
-                SELECT * FROM tickets WHERE id = ?
-            """, (ticket_id,))
+                # Get ticket info
+                cursor.execute("""
+                    SELECT * FROM tickets WHERE id = ?
+                """, (ticket_id,))
             
-            ticket = cursor.fetchone()
-            if not ticket:
-                return await interaction.followup.send(
-                    "Ticket not found!",
-                    ephemeral=True
-                )
+                ticket = cursor.fetchone()
+                if not ticket:
+                    return await interaction.followup.send(
+                        "Ticket not found!",
+                        ephemeral=True
+                    )
                 
-            # Check permissions
-            settings = await self.get_guild_settings(interaction.guild_id)
-            is_support = False
-            if settings['support_role_id']:
-                support_role = interaction.guild.get_role(int(settings['support_role_id']))
-                if support_role in interaction.user.roles:
-                    is_support = True
+                # Check permissions
+                settings = await self.get_guild_settings(interaction.guild_id)
+                is_support = False
+                if settings['support_role_id']:
+                    support_role = interaction.guild.get_role(int(settings['support_role_id']))
+                    if support_role in interaction.user.roles:
+                        is_support = True
                     
-            if not (is_support or str(interaction.user.id) == ticket['user_id']):
-                return await interaction.followup.send(
-                    "You don't have permission to close this ticket!",
-                    ephemeral=True
-                )
+                if not (is_support or str(interaction.user.id) == ticket['user_id']):
+                    return await interaction.followup.send(
+                        "You don't have permission to close this ticket!",
+                        ephemeral=True
+                    )
             
-            # Ask for feedback
-            embed = Embed.create(
-                title="Ticket Feedback",
-                description="Please rate your support experience:",
-                color=COLORS.DEFAULT
-            )
+                # Ask for feedback
+                embed = Embed.create(
+                    title="Ticket Feedback",
+                    description="Please rate your support experience:",
+                    color=COLORS.DEFAULT
+                )
             
-            view = View()
-            options = [
-                discord.SelectOption(label="Excellent", value="5", emoji="⭐⭐⭐⭐⭐"),
-                discord.SelectOption(label="Good", value="4", emoji="⭐⭐⭐⭐"),
-                discord.SelectOption(label="Okay", value="3", emoji="⭐⭐⭐"),
-                discord.SelectOption(label="Poor", value="2", emoji="⭐⭐"),
-                discord.SelectOption(label="Very Poor", value="1", emoji="⭐")
-            ]
-            
-            select = discord.ui.Select(
-                placeholder="Select rating",
-                options=options,
-                custom_id=f"feedback_select_{ticket_id}"
-            )
+                view = View()
+                options = [
+                    discord.SelectOption(label="Excellent", value="5", emoji="⭐⭐⭐⭐⭐"),
+                    discord.SelectOption(label="Good", value="4", emoji="⭐⭐⭐⭐"),
+                    discord.SelectOption(label="Okay", value="3", emoji="⭐⭐⭐"),
+                    discord.SelectOption(label="Poor", value="2", emoji="⭐⭐"),
+                    discord.SelectOption(label="Very Poor", value="1", emoji="⭐")
+                ]
+            
+                select = discord.ui.Select(
+                    placeholder="Select rating",
+                    options=options,
+                    custom_id=f"feedback_select_{ticket_id}"
+                )
             
-            async def feedback_callback(interaction: discord.Interaction):
-                if hasattr(interaction, 'feedback_submitted'):
-                    return
-                setattr(interaction, 'feedback_submitted', True)
+                async def feedback_callback(interaction: discord.Interaction):
+                    if hasattr(interaction, 'feedback_submitted'):
+                        return
+                    setattr(interaction, 'feedback_submitted', True)
                 
-                rating = int(select.values[0])
+                    rating = int(select.values[0])
                 
-                # Update ticket
-                cursor.execute("""
-                    UPDATE tickets 
-                    SET feedback_score = ?,
-                        status = 'closed',
-                        closed_at = CURRENT_TIMESTAMP,
-                        closed_by = ?
-                    WHERE id = ?
-                """, (rating, str(interaction.user.id), ticket_id))
+                    # Update ticket
+                    await execute_write("""
+                        UPDATE tickets 
+                        SET feedback_score = ?,
+                            status = 'closed',
+                            closed_at = CURRENT_TIMESTAMP,
+                            closed_by = ?
+                        WHERE id = ?
+                    """, (rating, str(interaction.user.id), ticket_id))
                 
-                # Create transcript
-                transcript = await self.create_transcript(interaction.channel)
+                    # Create transcript
+                    transcript = await self.create_transcript(interaction.channel)
                 
-                # Log closure
-                if settings['log_channel_id']:
-                    log_channel = interaction.guild.get_channel(
-                        int(settings['log_channel_id'])
-                    )
-                    if log_channel:
-                        log_embed = Embed.create(
-                            title="Ticket Closed",
-                            color=COLORS.ERROR
+                    # Log closure
+                    if settings['log_channel_id']:
+                        log_channel = interaction.guild.get_channel(
+                            int(settings['log_channel_id'])
                         )
-                        log_embed.add_field(name="Ticket ID", value=str(ticket_id))
-                        log_embed.add_field(name="Closed By", value=interaction.user.mention)
-                        log_embed.add_field(name="Rating", value=f"{rating} ⭐")
-                        
-                        if transcript:
-                            log_embed.add_field(
-                                name="Transcript",
-                                value=transcript[:1000] + "..." if len(transcript) > 1000 else transcript,
-                                inline=False
+                        if log_channel:
+                            log_embed = Embed.create(
+                                title="Ticket Closed",
+                                color=COLORS.ERROR
                             )
+                            log_embed.add_field(name="Ticket ID", value=str(ticket_id))
+                            log_embed.add_field(name="Closed By", value=interaction.user.mention)
+                            log_embed.add_field(name="Rating", value=f"{rating} ⭐")
+                        
+                            if transcript:
+                                log_embed.add_field(
+                                    name="Transcript",
+                                    value=transcript[:1000] + "..." if len(transcript) > 1000 else transcript,
+                                    inline=False
+                                )
                             
-                        await log_channel.send(embed=log_embed)
-                
-                # Delete channel after delay
-                await interaction.response.send_message("Closing ticket in 5 seconds...")
-                await asyncio.sleep(5)
-                await interaction.channel.delete()
+                            await log_channel.send(embed=log_embed)
                 
-                # Remove from active tickets
-                if interaction.channel.id in self.active_tickets:
-                    del self.active_tickets[interaction.channel.id]
+                    # Delete channel after delay
+                    await interaction.response.send_message("Closing ticket in 5 seconds...")
+                    await asyncio.sleep(5)
+                    await interaction.channel.delete()
                 
-                conn.commit()
+                    # Remove from active tickets
+                    if interaction.channel.id in self.active_tickets:
+                        del self.active_tickets[interaction.channel.id]
             
-            select.callback = feedback_callback
-            view.add_item(select)
-            await interaction.followup.send(embed=embed, view=view)
+                select.callback = feedback_callback
+                view.add_item(select)
+                await interaction.followup.send(embed=embed, view=view)
             
         except Exception as e:
             logger.error(f"Error closing ticket: {e}")
-            if conn:
-                conn.rollback()
             await interaction.followup.send(
                 "An error occurred while closing the ticket",
                 ephemeral=True
             )
-        finally:
-            if conn:
-                conn.close()
 
     async def set_ticket_priority(
         self,
@@ -660,11 +635,7 @@ class TicketSystem(commands.Cog, BaseLockHandler):
         priority: str
     ):
         """Set ticket priority"""
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
             # Check permissions
             settings = await self.get_guild_settings(interaction.guild_id)
             if settings['support_role_id']:
@@ -674,20 +645,20 @@ class TicketSystem(commands.Cog, BaseLockHandler):
                         "You don't have permission to set ticket priority!",
                         ephemeral=True
                     )
-            
+        
             # Update priority
-            cursor.execute("""
+            await execute_write("""
                 UPDATE tickets 
                 SET priority = ?,
                     updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             """, (priority, ticket_id))
-            
+        
             # Update embed
             async for message in interaction.channel.history(limit=1):
                 if message.author == self.bot.user and message.embeds:
                     embed = message.embeds[0]
-                    
+                
                     # Set color based on priority
                     colors = {
                         'low': COLORS.SUCCESS,
@@ -696,28 +667,28 @@ class TicketSystem(commands.Cog, BaseLockHandler):
                         'urgent': discord.Color.dark_red()
                     }
                     embed.color = colors.get(priority, COLORS.DEFAULT)
-                    
+                
                     # Update priority field
                     for i, field in enumerate(embed.fields):
                         if field.name == "Priority":
                             embed.remove_field(i)
                             break
-                            
+                        
                     emoji = {
                         'low': '🟢',
                         'medium': '🟡',
                         'high': '🔴',
                         'urgent': '⚡'
                     }
-                    
+                
                     embed.add_field(
                         name="Priority",
                         value=f"{emoji.get(priority, '❓')} {priority.title()}",
                         inline=True
                     )
-                    
+                
                     await message.edit(embed=embed)
-            
+        
             # Send notification for high/urgent priority
             if priority in ['high', 'urgent'] and settings.get('notification_channel'):
                 notif_channel = interaction.guild.get_channel(
@@ -728,24 +699,18 @@ class TicketSystem(commands.Cog, BaseLockHandler):
                         f"⚠️ Ticket {ticket_id} priority set to {priority.upper()}\n"
                         f"Channel: {interaction.channel.mention}"
                     )
-            
-            conn.commit()
+        
             await interaction.followup.send(
                 f"Ticket priority set to {priority}",
                 ephemeral=True
             )
-            
+        
         except Exception as e:
             logger.error(f"Error setting priority: {e}")
-            if conn:
-                conn.rollback()
             await interaction.followup.send(
                 "An error occurred while setting priority",
                 ephemeral=True
             )
-        finally:
-            if conn:
-                conn.close()
 
     async def check_inactive_tickets(self):
         """Auto-close inactive tickets"""
@@ -753,80 +718,75 @@ class TicketSystem(commands.Cog, BaseLockHandler):
             try:
                 await asyncio.sleep(3600)  # Check every hour
                 
-                conn = get_connection()
-                cursor = conn.cursor()
+                with connection() as conn:
+                    cursor = conn.cursor()
                 
-                # Get all guilds' settings
-                cursor.execute("SELECT * FROM ticket_settings")
-                guild_settings = cursor.fetchall()
+                    # Get all guilds' settings
+                    cursor.execute("SELECT * FROM ticket_settings")
+                    guild_settings = cursor.fetchall()
                 
-                for settings in guild_settings:
-                    auto_close_hours = settings['auto_close_hours']
-                    guild_id = settings['guild_id']
+                    for settings in guild_settings:
+                        auto_close_hours = settings['auto_close_hours']
+                        guild_id = settings['guild_id']
                     
-                    # Find inactive tickets
-                    cursor.execute("""
-                        SELECT id, channel_id 
-                        FROM tickets 
-                        WHERE guild_id = ? 
-                          AND status = 'open'
-                          AND last_activity < ?
-                    """, (
-                        guild_id,
-                        datetime.utcnow() - timedelta(hours=auto_close_hours)
-                    ))
+                        # Find inactive tickets
+                        cursor.execute("""
+                            SELECT id, channel_id 
+                            FROM tickets 
+                            WHERE guild_id = ? 
+                              AND status = 'open'
+                              AND last_activity < ?
+                        """, (
+                            guild_id,
+                            datetime.utcnow() - timedelta(hours=auto_close_hours)
+                        ))
                     
-                    inactive_tickets = cursor.fetchall()
+                        inactive_tickets = cursor.fetchall()
                     
-                    for ticket in inactive_tickets:
-                        try:
-                            channel = self.bot.get_channel(int(ticket['channel_id']))
-                            if channel:
-                                await channel.send(
-                                    "⚠️ This ticket has been inactive for "
-                                    f"{auto_close_hours} hours and will be closed automatically."
-                                )
-                                await asyncio.sleep(5)
-                                await channel.delete()
+                        for ticket in inactive_tickets:
+                            try:
+                                channel = self.bot.get_channel(int(ticket['channel_id']))
+                                if channel:
+                                    await channel.send(
+                                        "⚠️ This ticket has been inactive for "
+                                        f"{auto_close_hours} hours and will be closed automatically."
+                                    )
+                                    await asyncio.sleep(5)
+                                    await channel.delete()
                                 
-                                # Update database
-                                cursor.execute("""
-                                    UPDATE tickets 
-                                    SET status = 'closed',
-                                        closed_at = CURRENT_TIMESTAMP,
-                                        closed_by = ?,
-                                        resolution = 'Auto-closed due to inactivity'
-                                    WHERE id = ?
-                                """, (str(self.bot.user.id), ticket['id']))
+                                    # Update database
+                                    await execute_write("""
+                                        UPDATE tickets 
+                                        SET status = 'closed',
+                                            closed_at = CURRENT_TIMESTAMP,
+                                            closed_by = ?,
+                                            resolution = 'Auto-closed due to inactivity'
+                                        WHERE id = ?
+                                    """, (str(self.bot.user.id), ticket['id']))
                                 
-                                # Remove from active tickets
-                                if int(ticket['channel_id']) in self.active_tickets:
-                                    del self.active_tickets[int(ticket['channel_id'])]
+                                    # Remove from active tickets
+                                    if int(ticket['channel_id']) in self.active_tickets:
+                                        del self.active_tickets[int(ticket['channel_id'])]
                                 
-                                # Log auto-close
-                                if settings['log_channel_id']:
-                                    log_channel = self.bot.get_channel(
-                                        int(settings['log_channel_id'])
-                                    )
-                                    if log_channel:
-                                        embed = Embed.create(
-                                            title="Ticket Auto-Closed",
-                                            description=f"Ticket {ticket['id']} was closed due to inactivity",
-                                            color=COLORS.WARNING
+                                    # Log auto-close
+                                    if settings['log_channel_id']:
+                                        log_channel = self.bot.get_channel(
+                                            int(settings['log_channel_id'])
                                         )
-                                        await log_channel.send(embed=embed)
+                                        if log_channel:
+                                            embed = Embed.create(
+                                                title="Ticket Auto-Closed",
+                                                description=f"Ticket {ticket['id']} was closed due to inactivity",
+                                                color=COLORS.WARNING
+                                            )
+                                            await log_channel.send(embed=embed)
                                         
-                        except Exception as e:
-                            logger.error(f"Error auto-closing ticket {ticket['id']}: {e}")
-                            continue
-                            
-                conn.commit()
+                            except Exception as e:
+                                logger.error(f"Error auto-closing ticket {ticket['id']}: {e}")
+                                continue
                 
             except Exception as e:
                 logger.error(f"Error in inactive ticket check: {e}")
-            finally:
-                if conn:
-                    conn.close()
 
     async def create_transcript(self, channel: discord.TextChannel) -> str:
         """Create a transcript of the ticket"""
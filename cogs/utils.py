@@ -8,7 +8,7 @@ from pathlib import Path
 
 # Add parent directory to path to import database
 sys.path.append(str(Path(__file__).parent.parent))
-from database import get_connection
+from database import get_connection, connection
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -129,45 +129,33 @@ class Embed:
 
 def execute_query(query: str, params: tuple = (), fetch: bool = False):
     """Execute a database query with proper connection management"""
-    conn = None
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        
-        if fetch:
-            result = cursor.fetchall()
-        else:
-            conn.commit()
-            result = None
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
             
-        return result
+            if fetch:
+                result = cursor.fetchall()
+            else:
+                conn.commit()
+                result = None
+                
+            return result
     except Exception as e:
         logger.error(f"Database error: {e}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
 def transaction(func):
     """Decorator for handling database transactions"""
     def wrapper(*args, **kwargs):
-        conn = None
         try:
-            conn = get_connection()
-            result = func(conn, *args, **kwargs)
-            conn.commit()
-            return result
+            with connection() as conn:
+                result = func(conn, *args, **kwargs)
+                conn.commit()
+                return result
         except Exception as e:
             logger.error(f"Transaction error: {e}")
-            if conn:
-                conn.rollback()
             raise
-        finally:
-            if conn:
-                conn.close()
     return wrapper
 
 # Initialize global instances
@@ -206,6 +194,7 @@ __all__ = [
     'EventDispatcher',
     'Permissions',
     'get_connection',
+    'connection',
     'execute_query',
     'transaction',
     'get_user',
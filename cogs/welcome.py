@@ -6,7 +6,7 @@ import aiohttp
 from datetime import datetime
 from typing import Optional
 from .utils import Embed, event_dispatcher
-from database import get_connection
+from database import connection, enqueue_write, execute_write
 import sqlite3
 import asyncio
 from asyncio import Lock
@@ -66,34 +66,30 @@ class Welcome(commands.Cog):
     async def get_guild_settings(self, guild_id: int) -> dict:
         """Get welcome settings for a guild"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
+                with connection() as conn:
+                    cursor = conn.cursor()
                 
-                cursor.execute("""
-                    SELECT * FROM welcome_settings WHERE guild_id = ?
-                """, (str(guild_id),))
-                data = cursor.fetchone()
+                    cursor.execute("""
+                        SELECT * FROM welcome_settings WHERE guild_id = ?
+                    """, (str(guild_id),))
+                    data = cursor.fetchone()
                 
-                if not data:
-                    return {
-                        'channel_id': None,
-                        'message': 'Welcome {user} to {server}!',
-                        'embed_color': 3447003,
-                        'auto_role_id': None,
-                        'verification_required': False,
-                        'custom_background': None,
-                        'custom_font': None
-                    }
+                    if not data:
+                        return {
+                            'channel_id': None,
+                            'message': 'Welcome {user} to {server}!',
+                            'embed_color': 3447003,
+                            'auto_role_id': None,
+                            'verification_required': False,
+                            'custom_background': None,
+                            'custom_font': None
+                        }
                     
-                return dict(data)
+                    return dict(data)
             except sqlite3.Error as e:
                 logger.error(f"Failed to get guild settings: {e}")
                 raise
-            finally:
-                if conn:
-                    conn.close()
 
     async def create_welcome_card(self, member: discord.Member, settings: dict) -> io.BytesIO:
         """Create a customized welcome card"""
@@ -325,21 +321,14 @@ class Welcome(commands.Cog):
     async def log_welcome(self, guild_id: int, user_id: int, action_type: str):
         """Log welcome events"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                # Di-commit bersama write lain oleh write queue
+                enqueue_write("""
                     INSERT INTO welcome_logs (guild_id, user_id, action_type)
                     VALUES (?, ?, ?)
                 """, (str(guild_id), str(user_id), action_type))
-                conn.commit()
             except sqlite3.Error as e:
                 logger.error(f"Failed to log welcome event: {e}")
-            finally:
-                if conn:
-                    conn.close()
 
     @commands.group(name="welcome")
     @commands.has_permissions(administrator=True)
@@ -352,70 +341,46 @@ class Welcome(commands.Cog):
     async def set_welcome_channel(self, ctx, channel: discord.TextChannel):
         """Set welcome channel"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await execute_write("""
                     INSERT OR REPLACE INTO welcome_settings 
                     (guild_id, channel_id) VALUES (?, ?)
                 """, (str(ctx.guild.id), str(channel.id)))
-                conn.commit()
                 
                 await self.send_response_once(ctx, f"✅ Welcome channel set to {channel.mention}")
             except sqlite3.Error as e:
                 logger.error(f"Failed to set welcome channel: {e}")
                 await self.send_response_once(ctx, "❌ Failed to set welcome channel")
-            finally:
-                if conn:
-                    conn.close()
 
     @welcome.command(name="setmessage")
     async def set_welcome_message(self, ctx, *, message: str):
         """Set custom welcome message"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await execute_write("""
                     INSERT OR REPLACE INTO welcome_settings 
                     (guild_id, message) VALUES (?, ?)
                 """, (str(ctx.guild.id), message))
-                conn.commit()
                 
                 await self.send_response_once(ctx, "✅ Welcome message updated!")
             except sqlite3.Error as e:
                 logger.error(f"Failed to set welcome message: {e}")
                 await self.send_response_once(ctx, "❌ Failed to set welcome message")
-            finally:
-                if conn:
-                    conn.close()
 
     @welcome.command(name="setrole")
     async def set_auto_role(self, ctx, role: discord.Role):
         """Set auto-role for new members"""
         async with self.db_lock:
-            conn = None
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
+                await execute_write("""
                     INSERT OR REPLACE INTO welcome_settings 
                     (guild_id, auto_role_id) VALUES (?, ?)
                 """, (str(ctx.guild.id), str(role.id)))
-                conn.commit()
                 
                 await self.send_response_once(ctx, f"✅ Auto-role set to {role.mention}")
             except sqlite3.Error as e:
                 logger.error(f"Failed to set auto-role: {e}")
                 await self.send_response_once(ctx, "❌ Failed to set auto-role")
-            finally:
-                if conn:
-                    conn.close()
 
     @welcome.command(name="toggleverify")
     async def toggle_verification(self, ctx):
@@ -425,16 +390,11 @@ class Welcome(commands.Cog):
                 settings = await self.get_guild_settings(ctx.guild.id)
                 new_state = not settings['verification_required']
                 
-                conn = None
                 try:
-                    conn = get_connection()
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
+                    await execute_write("""
                         INSERT OR REPLACE INTO welcome_settings 
                         (guild_id, verification_required) VALUES (?, ?)
                     """, (str(ctx.guild.id), new_state))
-                    conn.commit()
                     
                     await self.send_response_once(
                         ctx, 
@@ -443,9 +403,6 @@ class Welcome(commands.Cog):
                 except sqlite3.Error as e:
                     logger.error(f"Failed to toggle verification: {e}")
                     await self.send_response_once(ctx, "❌ Failed to toggle verification")
-                finally:
-                    if conn:
-                        conn.close()
             except Exception as e:
                 logger.error(f"Error toggling verification: {e}")
                 await self.send_response_once(ctx, "❌ An error occurred")
@@ -0,0 +1,355 @@
+"""
+SQLite Connection Pool
+Author: fdyytu
+Created at: 2026-10-18 04:20:00 UTC
+
+Pool koneksi SQLite yang dipakai ulang oleh database.get_connection().
+Setiap koneksi dibuat sekali (PRAGMA hanya dijalankan saat koneksi dibuat),
+di-checkout oleh caller lalu dikembalikan ke pool saat close().
+"""
+
+import sqlite3
+import logging
+import threading
+import time
+import sys
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no connection becomes available before the checkout timeout"""
+    pass
+
+class _Checkout:
+    """Informasi satu koneksi yang sedang dipinjam"""
+    __slots__ = ('conn', 'caller', 'checked_out_at', 'finalizer')
+
+    def __init__(self, conn: sqlite3.Connection, caller: str):
+        self.conn = conn
+        self.caller = caller
+        self.checked_out_at = time.monotonic()
+        self.finalizer = None
+
+    @property
+    def held_for(self) -> float:
+        return time.monotonic() - self.checked_out_at
+
+class PooledConnection:
+    """
+    Proxy untuk sqlite3.Connection yang berasal dari pool.
+    Semua atribut diteruskan ke koneksi asli, kecuali close()
+    yang mengembalikan koneksi ke pool alih-alih menutupnya.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection, key: int):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_key', key)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a connection returned to the pool.")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a connection returned to the pool.")
+        setattr(conn, name, value)
+
+    def __repr__(self):
+        state = "closed" if self._conn is None else "checked out"
+        return f"<PooledConnection key={self._key} {state}>"
+
+    @property
+    def closed(self) -> bool:
+        return object.__getattribute__(self, '_conn') is None
+
+    def close(self):
+        """Kembalikan koneksi ke pool (aman dipanggil lebih dari sekali)"""
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            return
+        object.__setattr__(self, '_conn', None)
+        self._pool._checkin(self._key, conn)
+
+class ConnectionPool:
+    """
+    Bounded pool untuk koneksi SQLite.
+
+    - `size` koneksi idle disimpan untuk dipakai ulang
+    - sampai `max_overflow` koneksi tambahan boleh dibuat saat pool penuh,
+      koneksi overflow ditutup saat dikembalikan
+    - koneksi yang di-garbage-collect tanpa close() dicatat sebagai leak
+      dan otomatis dikembalikan ke pool
+    """
+
+    def __init__(
+        self,
+        database: str,
+        size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 5.0,
+        leak_threshold: float = 30.0,
+        max_retries: int = 3,
+        cached_statements: int = 128,
+        factory: Type[sqlite3.Connection] = sqlite3.Connection,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None
+    ):
+        self.database = database
+        self.size = max(1, size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.leak_threshold = leak_threshold
+        self.max_retries = max_retries
+        self.cached_statements = cached_statements
+        self.factory = factory
+        self.on_connect = on_connect
+
+        self._idle: deque = deque()
+        self._in_use: Dict[int, _Checkout] = {}
+        self._total = 0
+        self._next_key = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'leaks_reclaimed': 0,
+            'discarded': 0
+        }
+
+    @property
+    def max_size(self) -> int:
+        return self.size + self.max_overflow
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Buat koneksi baru dan jalankan PRAGMA satu kali"""
+        for attempt in range(self.max_retries):
+            try:
+                conn = sqlite3.connect(
+                    self.database,
+                    timeout=self.timeout,
+                    check_same_thread=False,
+                    cached_statements=self.cached_statements,
+                    factory=self.factory
+                )
+                conn.row_factory = sqlite3.Row
+
+                cursor = conn.cursor()
+
+                # Tingkatkan busy timeout untuk mencegah database locked errors
+                cursor.execute("PRAGMA busy_timeout = 5000")
+
+                # Gunakan WAL mode untuk concurrent access yang lebih baik
+                cursor.execute("PRAGMA journal_mode = WAL")
+
+                # Balance antara performance dan safety
+                cursor.execute("PRAGMA synchronous = NORMAL")
+
+                # Enforce foreign key constraints
+                cursor.execute("PRAGMA foreign_keys = ON")
+
+                cursor.close()
+
+                if self.on_connect:
+                    self.on_connect(conn)
+
+                self._stats['created'] += 1
+                return conn
+
+            except sqlite3.Error as e:
+                if attempt == self.max_retries - 1:
+                    logger.error(f"Failed to connect to database after {self.max_retries} attempts: {e}")
+                    raise
+                logger.warning(f"Database connection attempt {attempt + 1} failed: {e}")
+                time.sleep(0.1 * (attempt + 1))
+
+    def connect(self) -> sqlite3.Connection:
+        """Buat koneksi terpisah (tidak dikelola pool) dengan PRAGMA yang sama"""
+        return self._create_connection()
+
+    @staticmethod
+    def _get_caller() -> str:
+        """Cari frame pemanggil di luar modul pool/database untuk leak report"""
+        frame = sys._getframe(1)
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '')
+            if module not in (__name__, 'database', 'db_executor', 'query_profiler', 'contextlib'):
+                return f"{module}:{frame.f_code.co_name}:{frame.f_lineno}"
+            frame = frame.f_back
+        return "unknown"
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Checkout koneksi dari pool"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        conn = None
+        create = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._total < self.max_size:
+                    self._total += 1
+                    create = True
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    leaked = self._report_long_checkouts()
+                    raise PoolTimeoutError(
+                        f"Connection pool exhausted ({self.max_size} in use, "
+                        f"{leaked} held longer than {self.leak_threshold}s)"
+                    )
+                self._stats['waits'] += 1
+                self._cond.wait(remaining)
+
+        if create:
+            try:
+                conn = self._create_connection()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+
+        return self._wrap(conn)
+
+    def _wrap(self, conn: sqlite3.Connection) -> PooledConnection:
+        with self._cond:
+            key = self._next_key
+            self._next_key += 1
+            checkout = _Checkout(conn, self._get_caller())
+            self._in_use[key] = checkout
+            self._stats['checkouts'] += 1
+
+        proxy = PooledConnection(self, conn, key)
+        # Jika proxy di-GC tanpa close(), kembalikan koneksi ke pool
+        checkout.finalizer = weakref.finalize(proxy, self._reclaim, key)
+        return proxy
+
+    def _reclaim(self, key: int):
+        """Dipanggil oleh finalizer untuk koneksi yang tidak pernah di-close"""
+        with self._cond:
+            checkout = self._in_use.get(key)
+        if checkout is None:
+            return
+        self._stats['leaks_reclaimed'] += 1
+        logger.warning(
+            f"Connection leak: checked out by {checkout.caller} "
+            f"and never closed (held {checkout.held_for:.1f}s)"
+        )
+        self._checkin(key, checkout.conn)
+
+    def _checkin(self, key: int, conn: sqlite3.Connection):
+        """Kembalikan koneksi ke pool, reset state-nya dulu"""
+        with self._cond:
+            checkout = self._in_use.pop(key, None)
+        if checkout is None:
+            return
+        if checkout.finalizer is not None:
+            checkout.finalizer.detach()
+
+        reusable = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            reusable = False
+
+        with self._cond:
+            if reusable and not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                conn = None
+            else:
+                self._total -= 1
+                self._stats['discarded'] += 1
+            self._cond.notify()
+
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.error(f"Error closing pooled connection: {e}")
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[PooledConnection]:
+        """Context manager: checkout koneksi dan pastikan selalu dikembalikan"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            try:
+                if not conn.closed and conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error as e:
+                logger.error(f"Error rolling back pooled connection: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def _report_long_checkouts(self) -> int:
+        """Log koneksi yang dipinjam lebih lama dari leak_threshold"""
+        suspects = [c for c in self._in_use.values() if c.held_for >= self.leak_threshold]
+        for checkout in suspects:
+            logger.warning(
+                f"Possible connection leak: held {checkout.held_for:.1f}s by {checkout.caller}"
+            )
+        return len(suspects)
+
+    def check_leaks(self) -> List[Dict]:
+        """Get daftar koneksi yang dipinjam lebih lama dari leak_threshold"""
+        with self._cond:
+            self._report_long_checkouts()
+            return [
+                {'caller': c.caller, 'held_for': round(c.held_for, 2)}
+                for c in self._in_use.values()
+                if c.held_for >= self.leak_threshold
+            ]
+
+    def get_stats(self) -> Dict:
+        """Statistik pool untuk monitoring"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                **self._stats
+            }
+
+    def close_all(self):
+        """Tutup semua koneksi idle dan tolak checkout baru"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            in_use = len(self._in_use)
+            self._cond.notify_all()
+
+        for conn in idle:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.error(f"Error closing pooled connection: {e}")
+
+        if in_use:
+            logger.warning(f"Connection pool closed with {in_use} connection(s) still checked out")
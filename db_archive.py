@@ -0,0 +1,288 @@
+"""
+Database Archive
+Author: fdyytu
+Created at: 2026-10-18 07:40:00 UTC
+
+Retention untuk tabel log yang terus bertambah (activity_logs, transactions,
+admin_logs, user_activity, welcome_logs). Row yang lebih tua dari
+Database.RETENTION_DAYS dipindahkan per batch ke file arsip JSON Lines
+terkompresi gzip, satu file per tabel per bulan, lalu dihapus dari shop.db.
+Arsip tetap bisa dicari lewat search_archive untuk command history admin.
+Setiap file arsip punya index kecil (.idx.json) berisi nilai unik kolom
+lookup (mis. growid) sehingga pencarian hanya membuka file yang relevan.
+
+Semua fungsi di sini blocking; panggil lewat run_in_executor dari event loop.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import database
+from ext.constants import Database as DatabaseSettings, PATHS
+
+logger = logging.getLogger(__name__)
+
+# Tabel yang diarsip -> kolom timestamp-nya
+ARCHIVE_TABLES: Dict[str, str] = {
+    'activity_logs': 'timestamp',
+    'transactions': 'created_at',
+    'admin_logs': 'created_at',
+    'user_activity': 'created_at',
+    'welcome_logs': 'timestamp'
+}
+
+# Kolom yang nilai uniknya dicatat di index per file arsip
+ARCHIVE_INDEX_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'activity_logs': ('guild_id', 'user_id'),
+    'transactions': ('growid',),
+    'admin_logs': ('admin_id',),
+    'user_activity': ('discord_id',),
+    'welcome_logs': ('guild_id', 'user_id')
+}
+
+ARCHIVE_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx.json'
+
+# path index -> (mtime_ns, {kolom: set nilai})
+_index_cache: Dict[str, Tuple[int, Dict[str, Set[str]]]] = {}
+_index_lock = threading.Lock()
+
+class ArchiveError(Exception):
+    """Raised when rows cannot be archived or archives cannot be read"""
+    pass
+
+def _check_table(table: str) -> str:
+    if table not in ARCHIVE_TABLES:
+        raise ArchiveError(f"Table {table} is not archived (use: {', '.join(ARCHIVE_TABLES)})")
+    return ARCHIVE_TABLES[table]
+
+def get_archive_dir(table: str) -> Path:
+    archive_dir = Path(PATHS.ARCHIVE) / table
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    return archive_dir
+
+def _archive_path(table: str, month: str) -> Path:
+    return get_archive_dir(table) / f"{table}-{month}{ARCHIVE_SUFFIX}"
+
+def list_archives(table: Optional[str] = None) -> List[Dict]:
+    """Daftar file arsip, bulan terbaru dulu"""
+    tables = [table] if table else list(ARCHIVE_TABLES)
+    archives = []
+    for name in tables:
+        _check_table(name)
+        for path in get_archive_dir(name).glob(f"{name}-*{ARCHIVE_SUFFIX}"):
+            archives.append({
+                'table': name,
+                'month': path.name[len(name) + 1:-len(ARCHIVE_SUFFIX)],
+                'name': path.name,
+                'path': str(path),
+                'size': path.stat().st_size
+            })
+    archives.sort(key=lambda a: (a['month'], a['table']), reverse=True)
+    return archives
+
+def _index_path(path: Path) -> Path:
+    return path.with_name(path.name[:-len(ARCHIVE_SUFFIX)] + INDEX_SUFFIX)
+
+def _read_index(path: Path) -> Optional[Dict[str, Set[str]]]:
+    """Index file arsip, None jika belum ada (arsip lama) atau rusak"""
+    index_path = _index_path(path)
+    try:
+        mtime = index_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _index_lock:
+        cached = _index_cache.get(str(index_path))
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = {column: set(values) for column, values in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable archive index {index_path}: {e}")
+        return None
+    with _index_lock:
+        _index_cache[str(index_path)] = (mtime, index)
+    return index
+
+def _write_index(path: Path, index: Dict[str, Set[str]]):
+    index_path = _index_path(path)
+    tmp_path = index_path.with_name(index_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({column: sorted(values) for column, values in index.items()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+
+def _index_rows(table: str, rows: List[Dict], index: Dict[str, Set[str]]):
+    for column in ARCHIVE_INDEX_COLUMNS.get(table, ()):
+        values = index.setdefault(column, set())
+        values.update(str(row.get(column)) for row in rows)
+
+def _append_rows(path: Path, rows: List[Dict]):
+    """Tambahkan rows sebagai member gzip baru lalu fsync sebelum row dihapus"""
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as gz:
+            for row in rows:
+                gz.write(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'))
+                gz.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+def archive_table(table: str, days: int, batch_size: Optional[int] = None) -> Dict:
+    """
+    Pindahkan row yang lebih tua dari `days` hari ke arsip bulanan.
+
+    Row diambil urut id (row paling tua ada di awal B-tree), ditulis ke
+    arsip, lalu dihapus lewat write queue dengan rentang id dan cutoff
+    yang sama persis dengan SELECT-nya. Kolom timestamp tidak selalu
+    ber-index, jadi sebelum tiap batch row dengan id terkecil dicek dulu:
+    jika belum melewati cutoff tidak ada yang diarsip dan SELECT batch
+    (yang akan menelusuri seluruh tabel tanpa hasil) tidak dijalankan.
+    Jika proses mati di antara keduanya row bisa tertulis dua kali;
+    search_archive membuang duplikat berdasarkan id.
+
+    Returns:
+        Dict berisi jumlah row, batch, bulan yang tersentuh dan durasi
+    """
+    column = _check_table(table)
+    batch_size = batch_size or DatabaseSettings.ARCHIVE_BATCH_SIZE
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    oldest_sql = f"SELECT {column} < ? AS expired FROM {table} ORDER BY id LIMIT 1"
+    select_sql = f"SELECT * FROM {table} WHERE {column} < ? ORDER BY id LIMIT ?"
+    delete_sql = f"DELETE FROM {table} WHERE id BETWEEN ? AND ? AND {column} < ?"
+    write_queue = database.get_write_queue()
+
+    started = time.perf_counter()
+    archived = 0
+    batches = 0
+    months = set()
+    while True:
+        with database.connection() as conn:
+            oldest = conn.execute(oldest_sql, (cutoff,)).fetchone()
+            if not oldest or not oldest['expired']:
+                break
+            rows = [dict(row) for row in conn.execute(select_sql, (cutoff, batch_size))]
+        if not rows:
+            break
+
+        by_month: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_month.setdefault(str(row[column])[:7], []).append(row)
+
+        try:
+            for month, month_rows in by_month.items():
+                path = _archive_path(table, month)
+                # Index ditulis dulu: jika proses mati di tengah, index
+                # berisi nilai lebih banyak (aman), bukan lebih sedikit
+                if path.exists():
+                    index = _read_index(path)
+                    if index is None:
+                        index = _build_index(table, path)
+                else:
+                    index = {}
+                _index_rows(table, month_rows, index)
+                _write_index(path, index)
+                _append_rows(path, month_rows)
+        except OSError as e:
+            raise ArchiveError(f"Failed to write {table} archive: {e}") from e
+
+        write_queue.execute(delete_sql, (rows[0]['id'], rows[-1]['id'], cutoff)).result()
+
+        archived += len(rows)
+        batches += 1
+        months.update(by_month)
+        if len(rows) < batch_size:
+            break
+
+    result = {
+        'table': table,
+        'rows': archived,
+        'batches': batches,
+        'months': sorted(months),
+        'cutoff': cutoff,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    if archived:
+        logger.info(
+            f"Archived {archived} {table} rows older than {cutoff} "
+            f"into {len(months)} month(s) in {result['seconds']:.2f}s"
+        )
+    return result
+
+def archive_all(retention: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """Jalankan archive_table untuk setiap tabel dengan retention-nya"""
+    retention = retention or DatabaseSettings.RETENTION_DAYS
+    results = []
+    for table, days in retention.items():
+        if days and days > 0:
+            results.append(archive_table(table, days))
+    return results
+
+def _build_index(table: str, path: Path) -> Dict[str, Set[str]]:
+    """Bangun index untuk arsip yang dibuat sebelum ada index"""
+    index: Dict[str, Set[str]] = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        _index_rows(table, [json.loads(line) for line in f], index)
+    return index
+
+def search_archive(table: str, filters: Optional[Dict[str, Any]] = None,
+                   limit: int = 50, month: Optional[str] = None,
+                   max_files: Optional[int] = None) -> List[Dict]:
+    """
+    Cari row di arsip, terbaru dulu. `filters` dicocokkan persis
+    (dibandingkan sebagai string), `month` (YYYY-MM) membatasi ke satu file.
+
+    File yang index-nya tidak memuat nilai filter kolom ter-index dilewati
+    tanpa dibuka. Paling banyak `max_files` file (default
+    Database.ARCHIVE_SEARCH_MAX_FILES) yang dibaca, dari bulan terbaru,
+    dan pencarian berhenti setelah `limit` terpenuhi.
+    """
+    column = _check_table(table)
+    filters = {k: str(v) for k, v in (filters or {}).items()}
+    indexed = {k: v for k, v in filters.items() if k in ARCHIVE_INDEX_COLUMNS.get(table, ())}
+    max_files = max_files or DatabaseSettings.ARCHIVE_SEARCH_MAX_FILES
+    archives = list_archives(table)
+    if month:
+        archives = [a for a in archives if a['month'] == month]
+
+    found: Dict[int, Dict] = {}
+    scanned = 0
+    try:
+        for archive in archives:
+            path = Path(archive['path'])
+            index = _read_index(path)
+            if index is not None and any(v not in index.get(k, ()) for k, v in indexed.items()):
+                continue
+            if scanned >= max_files:
+                break
+            scanned += 1
+
+            rows = []
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    if index is None:
+                        rows.append(row)
+                    if all(str(row.get(k)) == v for k, v in filters.items()):
+                        found[row['id']] = row
+            if index is None:
+                # Arsip lama: file sudah dibaca penuh, simpan index-nya sekalian
+                index = {}
+                _index_rows(table, rows, index)
+                _write_index(path, index)
+            if len(found) >= limit:
+                break
+    except (OSError, EOFError, ValueError) as e:
+        raise ArchiveError(f"Failed to read {table} archive: {e}") from e
+
+    rows = sorted(found.values(), key=lambda row: (str(row[column]), row['id']), reverse=True)
+    return rows[:limit]
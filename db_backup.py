@@ -0,0 +1,237 @@
+"""
+Database Backup
+Author: fdyytu
+Created at: 2026-10-18 06:50:00 UTC
+
+Snapshot online untuk shop.db memakai sqlite3.Connection.backup.
+Halaman disalin bertahap (Database.BACKUP_PAGES per step) sehingga writer
+tidak pernah tertahan lama, hasilnya dikompres gzip dengan nama bertimestamp
+dan snapshot lama dibuang sesuai Database.BACKUP_RETENTION.
+
+Semua fungsi di sini blocking; panggil lewat run_in_executor dari event loop.
+"""
+
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import database
+from ext.constants import Database as DatabaseSettings, PATHS
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = 'shop-'
+SNAPSHOT_SUFFIX = '.db.gz'
+
+# progress(copied_pages, total_pages)
+ProgressCallback = Callable[[int, int], None]
+
+class BackupError(Exception):
+    """Raised when a snapshot cannot be created or restored"""
+    pass
+
+class _BackupRestarted(Exception):
+    """Source berubah terlalu sering selama backup bertahap"""
+    pass
+
+def get_backup_dir() -> Path:
+    backup_dir = Path(PATHS.BACKUP)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    return backup_dir
+
+def list_snapshots() -> List[Dict]:
+    """Daftar snapshot, terbaru dulu"""
+    snapshots = []
+    for path in get_backup_dir().glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"):
+        stat = path.stat()
+        snapshots.append({
+            'name': path.name,
+            'path': str(path),
+            'size': stat.st_size,
+            'created_at': datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        })
+    snapshots.sort(key=lambda s: s['name'], reverse=True)
+    return snapshots
+
+def prune_snapshots(keep: Optional[int] = None) -> List[str]:
+    """Hapus snapshot terlama di luar retention; return nama yang dihapus"""
+    keep = DatabaseSettings.BACKUP_RETENTION if keep is None else keep
+    removed = []
+    for snapshot in list_snapshots()[max(keep, 1):]:
+        try:
+            os.remove(snapshot['path'])
+            removed.append(snapshot['name'])
+        except OSError as e:
+            logger.warning(f"Failed to remove old snapshot {snapshot['name']}: {e}")
+    if removed:
+        logger.info(f"Pruned {len(removed)} old snapshot(s)")
+    return removed
+
+def _copy_pages(source: sqlite3.Connection, target: sqlite3.Connection,
+                pages: int, progress: Optional[ProgressCallback]) -> int:
+    """
+    Salin database bertahap. Jika source ditulis koneksi lain, SQLite
+    mengulang backup dari awal; setelah BACKUP_MAX_RESTARTS kali ulang
+    salinan dilakukan dalam satu step.
+
+    Returns:
+        Jumlah halaman yang disalin
+    """
+    state = {'total': 0, 'last_remaining': None, 'restarts': 0}
+
+    def on_step(status: int, remaining: int, total: int):
+        state['total'] = total
+        last = state['last_remaining']
+        if last is not None and remaining > last:
+            state['restarts'] += 1
+            if state['restarts'] > DatabaseSettings.BACKUP_MAX_RESTARTS:
+                raise _BackupRestarted()
+        state['last_remaining'] = remaining
+        if progress:
+            progress(total - remaining, total)
+
+    try:
+        source.backup(target, pages=pages, progress=on_step, sleep=0.05)
+    except _BackupRestarted:
+        logger.warning(
+            f"Backup restarted {state['restarts']} times by concurrent writes, "
+            f"copying remaining database in a single step"
+        )
+        source.backup(target, pages=-1, sleep=0.05)
+        if progress:
+            progress(state['total'], state['total'])
+    return state['total']
+
+def create_snapshot(progress: Optional[ProgressCallback] = None,
+                    pages: Optional[int] = None, label: str = '') -> Dict:
+    """
+    Buat snapshot terkompresi dari database yang sedang dipakai.
+
+    Returns:
+        Dict berisi nama file, ukuran, jumlah halaman, durasi dan throughput
+    """
+    pages = DatabaseSettings.BACKUP_PAGES if pages is None else pages
+    backup_dir = get_backup_dir()
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+    name = f"{SNAPSHOT_PREFIX}{stamp}{'-' + label if label else ''}{SNAPSHOT_SUFFIX}"
+    raw_path = backup_dir / f".{name}.db"
+    tmp_path = backup_dir / f".{name}.tmp"
+    final_path = backup_dir / name
+
+    started = time.perf_counter()
+    source = None
+    target = None
+    try:
+        source = database.get_pool().connect()
+        target = sqlite3.connect(str(raw_path))
+        total_pages = _copy_pages(source, target, pages, progress)
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+        if check != 'ok':
+            raise BackupError(f"Snapshot failed quick_check: {check}")
+        target.close()
+        target = None
+        copy_seconds = time.perf_counter() - started
+
+        with open(raw_path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp_path, final_path)
+
+    except (sqlite3.Error, OSError) as e:
+        raise BackupError(f"Failed to create snapshot: {e}") from e
+    finally:
+        if target is not None:
+            target.close()
+        if source is not None:
+            source.close()
+        for path in (raw_path, tmp_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    elapsed = time.perf_counter() - started
+    db_bytes = total_pages * page_size
+    result = {
+        'name': name,
+        'path': str(final_path),
+        'pages': total_pages,
+        'db_size': db_bytes,
+        'size': final_path.stat().st_size,
+        'copy_seconds': round(copy_seconds, 3),
+        'seconds': round(elapsed, 3),
+        'throughput_mb_s': round(db_bytes / 1024 / 1024 / copy_seconds, 2) if copy_seconds else 0.0
+    }
+    logger.info(
+        f"Snapshot {name} created: {total_pages} pages, "
+        f"{db_bytes / 1024:.0f}KB -> {result['size'] / 1024:.0f}KB in {elapsed:.2f}s "
+        f"({result['throughput_mb_s']}MB/s)"
+    )
+    return result
+
+def restore_snapshot(name: str, progress: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Restore database dari snapshot. Database saat ini disimpan dulu sebagai
+    snapshot 'pre-restore', lalu isi snapshot disalin ke database live dalam
+    satu step memakai backup API sehingga koneksi pool lain tetap valid.
+    """
+    snapshot_path = get_backup_dir() / Path(name).name
+    if not snapshot_path.is_file():
+        raise BackupError(f"Snapshot not found: {name}")
+
+    safety = create_snapshot(label='pre-restore')
+
+    raw_path = snapshot_path.with_name(f".{snapshot_path.name}.restore")
+    started = time.perf_counter()
+    source = None
+    target = None
+    try:
+        with gzip.open(snapshot_path, 'rb') as src, open(raw_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+        source = sqlite3.connect(str(raw_path))
+        check = source.execute("PRAGMA quick_check").fetchone()[0]
+        if check != 'ok':
+            raise BackupError(f"Snapshot failed quick_check: {check}")
+
+        target = database.get_pool().connect()
+        total = {'pages': 0}
+
+        def on_step(status: int, remaining: int, pages: int):
+            total['pages'] = pages
+            if progress:
+                progress(pages - remaining, pages)
+
+        # Satu step: database live tidak pernah terlihat setengah ter-restore
+        source.backup(target, pages=-1, progress=on_step, sleep=0.05)
+
+    except (sqlite3.Error, OSError, EOFError, gzip.BadGzipFile) as e:
+        raise BackupError(f"Failed to restore snapshot: {e}") from e
+    finally:
+        if source is not None:
+            source.close()
+        if target is not None:
+            target.close()
+        try:
+            raw_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    # Snapshot lama bisa punya versi skema lebih rendah
+    database.setup_database()
+
+    elapsed = time.perf_counter() - started
+    logger.warning(f"Database restored from {snapshot_path.name} in {elapsed:.2f}s (previous state saved as {safety['name']})")
+    return {
+        'name': snapshot_path.name,
+        'pages': total['pages'],
+        'seconds': round(elapsed, 3),
+        'safety_snapshot': safety['name']
+    }
@@ -0,0 +1,113 @@
+"""
+Async Database Executor
+Author: fdyytu
+Created at: 2026-10-18 04:40:00 UTC
+
+Menjalankan query SQLite di luar event loop discord.py:
+- write diteruskan ke database.WriteQueue (satu writer thread, group commit)
+- thread pool untuk read, masing-masing memakai koneksi dari pool
+Semua method bisa di-await sehingga heartbeat gateway tidak ikut
+tertahan saat ada write yang menunggu lock SQLite.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from database import SQL, ExecuteResult, connection, get_write_queue
+from queries import track
+from query_profiler import profiler
+from ext.constants import Database as DatabaseSettings
+
+logger = logging.getLogger(__name__)
+
+def _fetchone(conn: sqlite3.Connection, sql: SQL, params: Sequence) -> Optional[sqlite3.Row]:
+    with track(sql):
+        return conn.execute(str(sql), params).fetchone()
+
+def _fetchall(conn: sqlite3.Connection, sql: SQL, params: Sequence) -> List[sqlite3.Row]:
+    with track(sql):
+        return conn.execute(str(sql), params).fetchall()
+
+class DatabaseExecutor:
+    """Async facade untuk SQLite: write queue tunggal + reader thread pool"""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.logger = logging.getLogger('DatabaseExecutor')
+            self._start_lock = threading.Lock()
+            self._readers: Optional[ThreadPoolExecutor] = None
+            self.initialized = True
+
+    def start(self):
+        """Start reader pool (dipanggil otomatis saat pertama dipakai)"""
+        with self._start_lock:
+            if self._readers is None:
+                self._readers = ThreadPoolExecutor(
+                    max_workers=DatabaseSettings.READER_THREADS,
+                    thread_name_prefix='db-reader'
+                )
+
+    def shutdown(self):
+        """Hentikan reader pool; write queue di-flush oleh database.close_pool()"""
+        with self._start_lock:
+            readers, self._readers = self._readers, None
+        if readers is not None:
+            readers.shutdown(wait=True)
+
+    # Writer side
+
+    @staticmethod
+    def _submit_write(func: Callable, *args: Any) -> asyncio.Future:
+        return asyncio.wrap_future(get_write_queue().submit(func, *args))
+
+    async def transaction(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Jalankan func(conn, *args) di writer thread dalam satu transaksi.
+        Perubahan func di-rollback jika func raise; jika tidak, ditunggu
+        sampai batch-nya di-commit. func tidak boleh commit sendiri.
+
+        Returns:
+            Nilai return dari func
+        """
+        return await self._submit_write(func, *args)
+
+    async def execute(self, sql: SQL, params: Sequence = ()) -> ExecuteResult:
+        """Execute satu write statement dan tunggu sampai di-commit"""
+        return await asyncio.wrap_future(get_write_queue().execute(sql, params))
+
+    async def executemany(self, sql: SQL, seq_of_params: Iterable[Sequence]) -> ExecuteResult:
+        """Execute statement yang sama untuk banyak parameter dalam satu commit"""
+        return await asyncio.wrap_future(get_write_queue().executemany(sql, seq_of_params))
+
+    # Reader side
+
+    @staticmethod
+    def _run_read(func: Callable, args: tuple, module: Optional[str]) -> Any:
+        with connection() as conn, profiler.attribute(module):
+            return func(conn, *args)
+
+    async def read(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Jalankan func(conn, *args) di reader thread dengan koneksi dari pool"""
+        if self._readers is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        module = profiler.get_caller() if profiler.enabled else None
+        return await loop.run_in_executor(self._readers, self._run_read, func, args, module)
+
+    async def fetchone(self, sql: SQL, params: Sequence = ()) -> Optional[sqlite3.Row]:
+        """Fetch satu row"""
+        return await self.read(_fetchone, sql, params)
+
+    async def fetchall(self, sql: SQL, params: Sequence = ()) -> List[sqlite3.Row]:
+        """Fetch semua row"""
+        return await self.read(_fetchall, sql, params)
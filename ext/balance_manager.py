@@ -5,7 +5,7 @@ Created at: 2025-03-07 18:04:56 UTC
 Last Modified: 2025-03-08 14:38:44 UTC
 
 Dependencies:
-- database.py: For database connections
+- db_executor.py: For async database access
 - base_handler.py: For lock management
 - cache_manager.py: For caching functionality
 - constants.py: For configuration and responses
@@ -30,9 +30,11 @@ from .constants import (
     NOTIFICATION_CHANNELS,
     EVENTS
 )
-from database import get_connection
+from db_executor import DatabaseExecutor
+import db_archive
+import queries
 from .base_handler import BaseLockHandler
-from .cache_manager import CacheManager
+from .cache_manager import CacheManager, NEGATIVE
 
 class BalanceCallbackManager:
     """Manager untuk mengelola callbacks balance service"""
@@ -101,6 +103,7 @@ class BalanceManagerService(BaseLockHandler):
             self.bot = bot
             self.logger = logging.getLogger("BalanceManagerService")
             self.cache_manager = CacheManager()
+            self.db = DatabaseExecutor()
             self.callback_manager = BalanceCallbackManager()
             self.setup_default_callbacks()
             self.initialized = True
@@ -141,16 +144,8 @@ class BalanceManagerService(BaseLockHandler):
         """Verify all required dependencies are available"""
         try:
             # Verifikasi koneksi database
-            conn = None
-            try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1")  # Simple test query
-                cursor.fetchone()
-                return True
-            finally:
-                if conn:
-                    conn.close()
+            await self.db.fetchone("SELECT 1")  # Simple test query
+            return True
         except Exception as e:
             self.logger.error(f"Failed to verify dependencies: {e}")
             return False
@@ -189,6 +184,8 @@ class BalanceManagerService(BaseLockHandler):
         """Get GrowID for Discord user with proper locking and caching"""
         cache_key = f"growid_{discord_id}"
         cached = await self.cache_manager.get(cache_key)
+        if cached is NEGATIVE:
+            return BalanceResponse.error(MESSAGES.ERROR['NOT_REGISTERED'])
         if cached:
             return BalanceResponse.success(cached)
 
@@ -197,14 +194,7 @@ class BalanceManagerService(BaseLockHandler):
             return BalanceResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "SELECT growid FROM user_growid WHERE discord_id = ? COLLATE binary",
-                (str(discord_id),)
-            )
-            result = cursor.fetchone()
+            result = await self.db.fetchone(queries.GET_GROWID, (str(discord_id),))
             
             if result:
                 growid = result['growid']
@@ -214,6 +204,9 @@ class BalanceManagerService(BaseLockHandler):
                     expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.LONG)
                 )
                 return BalanceResponse.success(growid)
+
+            # User belum register: spam tombol tidak perlu ke database lagi
+            await self.cache_manager.set_negative(cache_key)
             return BalanceResponse.error(MESSAGES.ERROR['NOT_REGISTERED'])
 
         except Exception as e:
@@ -221,8 +214,6 @@ class BalanceManagerService(BaseLockHandler):
             await self.callback_manager.trigger('error', 'get_growid', str(e))
             return BalanceResponse.error(MESSAGES.ERROR['DATABASE_ERROR'])
         finally:
-            if conn:
-                conn.close()
             self.release_lock(cache_key)
 
     async def register_user(self, discord_id: str, growid: str) -> BalanceResponse:
@@ -234,41 +225,19 @@ class BalanceManagerService(BaseLockHandler):
         if not lock:
             return BalanceResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
 
-        conn = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
             # Check for existing GrowID - make case insensitive
-            cursor.execute(
-                "SELECT growid FROM users WHERE LOWER(growid) = LOWER(?) COLLATE NOCASE",
-                (growid,)
-            )
-            existing = cursor.fetchone()
+            existing = await self.db.fetchone(queries.FIND_GROWID_NOCASE, (growid,))
             if existing and existing['growid'] != growid:
                 return BalanceResponse.error(MESSAGES.ERROR['GROWID_EXISTS'])
             
-            conn.execute("BEGIN TRANSACTION")
-            
-            cursor.execute(
-                """
-                INSERT OR IGNORE INTO users (growid, balance_wl, balance_dl, balance_bgl) 
-                VALUES (?, 0, 0, 0)
-                """,
-                (growid,)
-            )
-            
-            cursor.execute(
-                """
-                INSERT OR REPLACE INTO user_growid (discord_id, growid) 
-                VALUES (?, ?)
-                """,
-                (str(discord_id), growid)
-            )
+            def register(conn):
+                queries.execute(conn, queries.INSERT_USER, (growid,))
+                queries.execute(conn, queries.LINK_GROWID, (str(discord_id), growid))
             
-            conn.commit()
+            await self.db.transaction(register)
             
-            # Update caches
+            # Update caches (menggantikan negative cache get_growid)
             await self.cache_manager.set(
                 f"growid_{discord_id}", 
                 growid,
@@ -291,70 +260,73 @@ class BalanceManagerService(BaseLockHandler):
 
         except Exception as e:
             self.logger.error(f"Error registering user: {e}")
-            if conn:
-                conn.rollback()
             await self.callback_manager.trigger('error', 'register_user', str(e))
             return BalanceResponse.error(MESSAGES.ERROR['REGISTRATION_FAILED'])
         finally:
-            if conn:
-                conn.close()
             self.release_lock(f"register_{discord_id}")
 
-    async def get_balance(self, growid: str) -> BalanceResponse:
-        """Get user balance with proper locking and caching"""
-        cache_key = f"balance_{growid}"
-        cached = await self.cache_manager.get(cache_key)
-        if cached:
-            if isinstance(cached, dict):
-                balance = Balance(cached['wl'], cached['dl'], cached['bgl'])
-            else:
-                balance = cached
-            return BalanceResponse.success(balance)
-
-        lock = await self.acquire_lock(cache_key)
-        if not lock:
-            return BalanceResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
-
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                """
-                SELECT balance_wl, balance_dl, balance_bgl 
-                FROM users 
-                WHERE growid = ? COLLATE binary
-                """,
-                (growid,)
-            )
-            result = cursor.fetchone()
-            
-            if result:
-                balance = Balance(
-                    result['balance_wl'],
-                    result['balance_dl'],
-                    result['balance_bgl']
+    async def warm_cache(self, limit: int) -> Dict[str, int]:
+        """
+        Muat pasangan GrowID/balance user yang terakhir aktif ke cache
+        dengan satu query, untuk warm-up saat startup.
+
+        Returns:
+            Jumlah growid dan balance yang dimuat
+        """
+        rows = await self.db.fetchall(queries.RECENT_ACTIVE_USERS, (limit,))
+        balances = set()
+        growids = 0
+        for row in rows:
+            growid = row['growid']
+            if row['discord_id']:
+                await self.cache_manager.set(
+                    f"growid_{row['discord_id']}",
+                    growid,
+                    expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.LONG)
                 )
+                growids += 1
+            if growid not in balances:
                 await self.cache_manager.set(
-                    cache_key, 
-                    balance,
+                    f"balance_{growid}",
+                    Balance(row['balance_wl'], row['balance_dl'], row['balance_bgl']),
                     expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
                 )
-                
-                # Trigger callback
-                await self.callback_manager.trigger('balance_checked', growid, balance)
-                
-                return BalanceResponse.success(balance)
-            return BalanceResponse.error(MESSAGES.ERROR['BALANCE_NOT_FOUND'])
+                balances.add(growid)
+        return {'growids': growids, 'balances': len(balances)}
+
+    async def get_balance(self, growid: str) -> BalanceResponse:
+        """Get user balance with request coalescing and caching"""
+        async def load() -> Optional[Balance]:
+            result = await self.db.fetchone(queries.GET_BALANCE, (growid,))
+            if not result:
+                return None
+            balance = Balance(
+                result['balance_wl'],
+                result['balance_dl'],
+                result['balance_bgl']
+            )
+            # Trigger callback
+            await self.callback_manager.trigger('balance_checked', growid, balance)
+            return balance
+
+        try:
+            # Balance dipakai untuk keputusan pembelian: tanpa nilai basi
+            cached = await self.cache_manager.get_or_load(
+                f"balance_{growid}",
+                load,
+                ttl=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT),
+                stale_for=0
+            )
+            if cached is None:
+                return BalanceResponse.error(MESSAGES.ERROR['BALANCE_NOT_FOUND'])
+            if isinstance(cached, dict):
+                cached = Balance(cached['wl'], cached['dl'], cached['bgl'])
+            return BalanceResponse.success(cached)
 
         except Exception as e:
             self.logger.error(f"Error getting balance: {e}")
             await self.callback_manager.trigger('error', 'get_balance', str(e))
             return BalanceResponse.error(MESSAGES.ERROR['BALANCE_FAILED'])
-        finally:
-            if conn:
-                conn.close()
-            self.release_lock(cache_key)
 
     async def update_balance(
         self, 
@@ -365,60 +337,38 @@ class BalanceManagerService(BaseLockHandler):
         details: str = "", 
         transaction_type: str = ""
     ) -> BalanceResponse:
-        """Update balance with proper locking and validation"""
+        """
+        Update balance secara relatif (balance + delta) dengan guard saldo
+        di database, jadi debit pembelian yang commit bersamaan tidak hilang
+        """
         lock = await self.acquire_lock(f"balance_update_{growid}")
         if not lock:
             return BalanceResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
 
-        conn = None
         try:
-            # Get current balance
-            balance_response = await self.get_balance(growid)
-            if not balance_response.success:
-                return balance_response
-            
-            current_balance = balance_response.data
-            
-            # Calculate new balance
-            new_wl = max(0, current_balance.wl + wl)
-            new_dl = max(0, current_balance.dl + dl)
-            new_bgl = max(0, current_balance.bgl + bgl)
-            
-            new_balance = Balance(new_wl, new_dl, new_bgl)
-            
-            if not new_balance.validate():
-                return BalanceResponse.error(MESSAGES.ERROR['INVALID_AMOUNT'])
-
-            # Validate withdrawals
-            if wl < 0 and abs(wl) > current_balance.wl:
-                return BalanceResponse.error(MESSAGES.ERROR['INSUFFICIENT_BALANCE'])
-            if dl < 0 and abs(dl) > current_balance.dl:
-                return BalanceResponse.error(MESSAGES.ERROR['INSUFFICIENT_BALANCE'])
-            if bgl < 0 and abs(bgl) > current_balance.bgl:
-                return BalanceResponse.error(MESSAGES.ERROR['INSUFFICIENT_BALANCE'])
-
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            try:
-                conn.execute("BEGIN TRANSACTION")
-                
-                cursor.execute(
-                    """
-                    UPDATE users 
-                    SET balance_wl = ?, balance_dl = ?, balance_bgl = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE growid = ? COLLATE binary
-                    """,
-                    (new_wl, new_dl, new_bgl, growid)
-                )
-                
-                cursor.execute(
-                    """
-                    INSERT INTO transactions 
-                    (growid, type, details, old_balance, new_balance, created_at)
-                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                    """,
+            def apply_update(conn):
+                # RETURNING dibaca habis agar statement selesai sebelum commit
+                rows = queries.execute(
+                    conn,
+                    queries.ADJUST_BALANCE,
+                    (wl, dl, bgl, growid, wl, dl, bgl)
+                ).fetchall()
+                if not rows:
+                    exists = queries.execute(conn, queries.GET_BALANCE, (growid,)).fetchone()
+                    raise TransactionError(
+                        MESSAGES.ERROR['INSUFFICIENT_BALANCE'] if exists
+                        else MESSAGES.ERROR['BALANCE_NOT_FOUND']
+                    )
+
+                row = rows[0]
+                new_balance = Balance(row['balance_wl'], row['balance_dl'], row['balance_bgl'])
+                if not new_balance.validate():
+                    raise TransactionError(MESSAGES.ERROR['INVALID_AMOUNT'])
+                current_balance = Balance(new_balance.wl - wl, new_balance.dl - dl, new_balance.bgl - bgl)
+
+                queries.execute(
+                    conn,
+                    queries.INSERT_TRANSACTION,
                     (
                         growid,
                         transaction_type,
@@ -427,41 +377,33 @@ class BalanceManagerService(BaseLockHandler):
                         new_balance.format()
                     )
                 )
-                
-                conn.commit()
-                
-                # Update cache
-                await self.cache_manager.set(
-                    f"balance_{growid}", 
-                    new_balance,
-                    expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
-                )
-                
-                # Invalidate transaction history cache
-                await self.cache_manager.delete(f"trx_history_{growid}")
-                
-                # Trigger callbacks
-                await self.callback_manager.trigger(
-                    'balance_updated', 
-                    growid, 
-                    current_balance, 
-                    new_balance
-                )
-                await self.callback_manager.trigger(
-                    'transaction_added',
-                    growid,
-                    transaction_type,
-                    details
-                )
-                
-                return BalanceResponse.success(
-                    new_balance,
-                    MESSAGES.SUCCESS['BALANCE_UPDATE']
-                )
+                return current_balance, new_balance
+
+            current_balance, new_balance = await self.db.transaction(apply_update)
 
-            except Exception as e:
-                conn.rollback()
-                raise TransactionError(str(e))
+            # Cache dihapus, bukan di-set: commit lain bisa selesai lebih dulu
+            # dan set yang datang belakangan akan menulis balance lama
+            await self.cache_manager.delete(f"balance_{growid}")
+            await self.cache_manager.delete(f"trx_history_{growid}")
+
+            # Trigger callbacks
+            await self.callback_manager.trigger(
+                'balance_updated',
+                growid,
+                current_balance,
+                new_balance
+            )
+            await self.callback_manager.trigger(
+                'transaction_added',
+                growid,
+                transaction_type,
+                details
+            )
+
+            return BalanceResponse.success(
+                new_balance,
+                MESSAGES.SUCCESS['BALANCE_UPDATE']
+            )
 
         except TransactionError as e:
             return BalanceResponse.error(str(e))
@@ -470,8 +412,6 @@ class BalanceManagerService(BaseLockHandler):
             await self.callback_manager.trigger('error', 'update_balance', str(e))
             return BalanceResponse.error(MESSAGES.ERROR['TRANSACTION_FAILED'])
         finally:
-            if conn:
-                conn.close()
             self.release_lock(f"balance_update_{growid}")
 
     async def get_transaction_history(self, growid: str, limit: int = 10) -> BalanceResponse:
@@ -482,17 +422,23 @@ class BalanceManagerService(BaseLockHandler):
             return BalanceResponse.success(cached[:limit])
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM transactions 
-                WHERE growid = ? COLLATE binary
-                ORDER BY created_at DESC
-                LIMIT ?
-            """, (growid, limit))
+            rows = await self.db.fetchall(queries.TRANSACTION_HISTORY, (growid, limit))
             
-            transactions = [dict(row) for row in cursor.fetchall()]
+            transactions = [dict(row) for row in rows]
+
+            # Transaksi di luar retention sudah dipindah ke arsip bulanan
+            if len(transactions) < limit:
+                try:
+                    archived = await asyncio.get_running_loop().run_in_executor(
+                        None,
+                        db_archive.search_archive,
+                        'transactions',
+                        {'growid': growid},
+                        limit - len(transactions)
+                    )
+                    transactions.extend(archived)
+                except db_archive.ArchiveError as e:
+                    self.logger.warning(f"Could not read archived transactions: {e}")
             
             await self.cache_manager.set(
                 cache_key, 
@@ -509,9 +455,6 @@ class BalanceManagerService(BaseLockHandler):
             self.logger.error(f"Error getting transaction history: {e}")
             await self.callback_manager.trigger('error', 'get_transaction_history', str(e))
             return BalanceResponse.error(MESSAGES.ERROR['DATABASE_ERROR'])
-        finally:
-            if conn:
-                conn.close()
 
 class BalanceManagerCog(commands.Cog):
     def __init__(self, bot):
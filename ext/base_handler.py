@@ -1,36 +1,298 @@
 import asyncio
+import time
+import weakref
 from asyncio import Lock
+from collections import deque
+from contextlib import asynccontextmanager
 import logging
-from typing import Optional, Dict, Tuple
+from typing import AsyncIterator, Optional, Dict, Tuple
 from discord.ext import commands
 import discord
 from ext.cache_manager import CacheManager
 
+class LockTimeout(asyncio.TimeoutError):
+    """Lock tidak berhasil didapat dalam batas waktu"""
+    pass
+
+# Batas atas bucket histogram waktu tunggu/tahan lock (ms); bucket terakhir tanpa batas
+LOCK_HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# Prefix key lock yang dikenal; key lain dikelompokkan per segmen pertama
+LOCK_PREFIXES = (
+    'purchase_', 'balance_update_', 'stock_get_', 'stock_add_', 'stock_update_', 'stock_refill_',
+    'withdrawal_', 'product_create_', 'register_', 'world_info_', 'growid_'
+)
+
+_registries: 'weakref.WeakSet[LockRegistry]' = weakref.WeakSet()
+
+def lock_prefix(key: str) -> str:
+    """Kelompok metrics untuk sebuah key lock, mis. purchase_123_A -> purchase_"""
+    for prefix in LOCK_PREFIXES:
+        if key.startswith(prefix):
+            return prefix
+    head, sep, _ = key.partition('_')
+    return head + sep
+
+def _percentile(ordered: list, p: float) -> float:
+    if not ordered:
+        return 0.0
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+def _histogram(samples) -> Dict[str, int]:
+    buckets = {f"<={bound}ms": 0 for bound in LOCK_HISTOGRAM_BUCKETS_MS}
+    buckets[f">{LOCK_HISTOGRAM_BUCKETS_MS[-1]}ms"] = 0
+    for sample in samples:
+        ms = sample * 1000
+        for bound in LOCK_HISTOGRAM_BUCKETS_MS:
+            if ms <= bound:
+                buckets[f"<={bound}ms"] += 1
+                break
+        else:
+            buckets[f">{LOCK_HISTOGRAM_BUCKETS_MS[-1]}ms"] += 1
+    return buckets
+
+class _LockEntry:
+    __slots__ = ('lock', 'users', 'acquired_at')
+
+    def __init__(self):
+        self.lock = Lock()
+        # Task yang sedang memegang atau menunggu lock ini
+        self.users = 0
+        self.acquired_at = 0.0
+
+class _PrefixStats:
+    """Counter dan sampel waktu untuk satu prefix key lock"""
+    __slots__ = ('acquired', 'contended', 'timeouts', 'waiters', 'waits', 'holds')
+
+    SAMPLES = 512  # Sampel terakhir yang disimpan untuk persentil dan histogram
+
+    def __init__(self):
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.waiters = 0
+        self.waits: deque = deque(maxlen=self.SAMPLES)
+        self.holds: deque = deque(maxlen=self.SAMPLES)
+
+    def merge_into(self, target: Dict):
+        target['acquired'] += self.acquired
+        target['contended'] += self.contended
+        target['timeouts'] += self.timeouts
+        target['waiters'] += self.waiters
+        target['waits'].extend(self.waits)
+        target['holds'].extend(self.holds)
+
+def _summarize(raw: Dict) -> Dict:
+    waits = sorted(raw['waits'])
+    holds = sorted(raw['holds'])
+    return {
+        'acquired': raw['acquired'],
+        'contended': raw['contended'],
+        'timeouts': raw['timeouts'],
+        'waiters': raw['waiters'],
+        'wait_p50_ms': _percentile(waits, 0.50),
+        'wait_p95_ms': _percentile(waits, 0.95),
+        'wait_p99_ms': _percentile(waits, 0.99),
+        'wait_max_ms': round(waits[-1] * 1000, 3) if waits else 0.0,
+        'hold_p50_ms': _percentile(holds, 0.50),
+        'hold_p95_ms': _percentile(holds, 0.95),
+        'hold_p99_ms': _percentile(holds, 0.99),
+        'hold_max_ms': round(holds[-1] * 1000, 3) if holds else 0.0,
+        'wait_histogram': _histogram(waits),
+        'hold_histogram': _histogram(holds)
+    }
+
+def _empty_raw() -> Dict:
+    return {'acquired': 0, 'contended': 0, 'timeouts': 0, 'waiters': 0, 'waits': [], 'holds': []}
+
+class LockRegistry:
+    """
+    Tabel asyncio.Lock per key dengan reference count. Entry dibuat saat
+    acquire pertama dan dibuang begitu tidak ada lagi task yang memegang
+    atau menunggunya, sehingga ukuran tabel mengikuti jumlah key yang
+    sedang dipakai, bukan jumlah key yang pernah dipakai.
+
+    Waktu tunggu, waktu tahan, timeout dan waiter dicatat per prefix key
+    (lock_prefix) untuk mencari lock yang panas.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._entries: Dict[str, _LockEntry] = {}
+        self._prefixes: Dict[str, _PrefixStats] = {}
+        self.peak = 0
+        self.reaped = 0
+        self.logger = logging.getLogger(f"LockRegistry.{name}")
+        _registries.add(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def is_locked(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def _stats_for(self, key: str) -> _PrefixStats:
+        prefix = lock_prefix(key)
+        stats = self._prefixes.get(prefix)
+        if stats is None:
+            stats = self._prefixes[prefix] = _PrefixStats()
+        return stats
+
+    def _reap(self, key: str, entry: _LockEntry):
+        if entry.users <= 0 and not entry.lock.locked() and self._entries.get(key) is entry:
+            del self._entries[key]
+            self.reaped += 1
+
+    async def acquire(self, key: str, timeout: Optional[float] = None) -> bool:
+        """
+        Returns:
+            True jika lock didapat, False jika timeout
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _LockEntry()
+            self.peak = max(self.peak, len(self._entries))
+        entry.users += 1
+
+        stats = self._stats_for(key)
+        # Ada task lain yang memegang atau menunggu key yang sama
+        if entry.users > 1:
+            stats.contended += 1
+        stats.waiters += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(entry.lock.acquire(), timeout=timeout)
+        except BaseException as e:
+            entry.users -= 1
+            self._reap(key, entry)
+            if isinstance(e, asyncio.TimeoutError):
+                stats.timeouts += 1
+                return False
+            raise
+        finally:
+            stats.waiters -= 1
+
+        entry.acquired_at = time.perf_counter()
+        stats.waits.append(entry.acquired_at - started)
+        stats.acquired += 1
+        return True
+
+    def release(self, key: str) -> bool:
+        """
+        Returns:
+            False jika key tidak sedang di-lock
+        """
+        entry = self._entries.get(key)
+        if entry is None or not entry.lock.locked():
+            return False
+        self._stats_for(key).holds.append(time.perf_counter() - entry.acquired_at)
+        entry.lock.release()
+        entry.users -= 1
+        self._reap(key, entry)
+        return True
+
+    def clear(self):
+        self._entries.clear()
+
+    def reset_stats(self):
+        self._prefixes.clear()
+        self.peak = len(self._entries)
+        self.reaped = 0
+
+    def get_prefix_stats(self) -> Dict[str, Dict]:
+        result = {}
+        for prefix, stats in self._prefixes.items():
+            raw = _empty_raw()
+            stats.merge_into(raw)
+            result[prefix] = _summarize(raw)
+        return result
+
+    def get_stats(self) -> Dict:
+        total = _empty_raw()
+        for stats in self._prefixes.values():
+            stats.merge_into(total)
+        summary = _summarize(total)
+        return {
+            'live': len(self._entries),
+            'held': sum(1 for entry in self._entries.values() if entry.lock.locked()),
+            'peak': self.peak,
+            'reaped': self.reaped,
+            **{k: v for k, v in summary.items() if not k.endswith('_histogram')}
+        }
+
+def get_lock_metrics() -> Dict:
+    """
+    Gabungan metrics semua LockRegistry yang hidup: per registry dan per
+    prefix key (prefix yang sama dari beberapa handler dijumlahkan).
+    """
+    registries = {}
+    prefixes: Dict[str, Dict] = {}
+    for registry in list(_registries):
+        name = registry.name
+        # Beberapa instance handler yang sama punya nama registry yang sama
+        while name in registries:
+            name = f"{registry.name}#{len(registries)}"
+        registries[name] = registry.get_stats()
+        for prefix, stats in registry._prefixes.items():
+            stats.merge_into(prefixes.setdefault(prefix, _empty_raw()))
+    return {
+        'registries': registries,
+        'prefixes': {prefix: _summarize(raw) for prefix, raw in prefixes.items()}
+    }
+
+def reset_lock_metrics():
+    for registry in list(_registries):
+        registry.reset_stats()
+
 class BaseLockHandler:
     """Handler untuk sistem locking"""
     
     def __init__(self):
-        self._locks: Dict[str, Lock] = {}
-        self._response_locks: Dict[str, Lock] = {}
+        self._locks = LockRegistry(f"{self.__class__.__name__}.locks")
+        self._response_locks = LockRegistry(f"{self.__class__.__name__}.responses")
         self.logger = logging.getLogger(self.__class__.__name__)
         
-    async def acquire_lock(self, key: str, timeout: float = 10.0) -> Optional[Lock]:
-        if key not in self._locks:
-            self._locks[key] = Lock()
-            
+    async def acquire_lock(self, key: str, timeout: float = 10.0) -> Optional[bool]:
+        # Kurangi timeout untuk mencegah deadlock
+        actual_timeout = min(timeout, 5.0)
         try:
-            # Kurangi timeout untuk mencegah deadlock
-            actual_timeout = min(timeout, 5.0)
-            await asyncio.wait_for(self._locks[key].acquire(), timeout=actual_timeout)
-            self.logger.debug(f"Lock acquired for {key}")
-            return self._locks[key]
-        except asyncio.TimeoutError:
-            self.logger.warning(f"Lock acquisition timeout for {key} after {actual_timeout}s")
+            if await self._locks.acquire(key, timeout=actual_timeout):
+                self.logger.debug(f"Lock acquired for {key}")
+                return True
+            capped = f", capped from {timeout}s" if actual_timeout < timeout else ""
+            self.logger.warning(f"Lock acquisition timeout for {key} after {actual_timeout}s{capped}")
             return None
         except Exception as e:
             self.logger.error(f"Error acquiring lock for {key}: {e}")
             return None
 
+    @asynccontextmanager
+    async def locked(self, key: str, timeout: float = 10.0) -> AsyncIterator[None]:
+        """
+        async with handler.locked(key): ...
+
+        Raises:
+            LockTimeout: lock tidak didapat dalam batas waktu
+        """
+        actual_timeout = min(timeout, 5.0)
+        if not await self._locks.acquire(key, timeout=actual_timeout):
+            raise LockTimeout(f"Lock acquisition timeout for {key} after {actual_timeout}s")
+        try:
+            yield
+        finally:
+            self._locks.release(key)
+
+    def get_lock_stats(self) -> Dict[str, Dict]:
+        """Metrics lock: jumlah lock hidup, yang dipegang dan waktu tunggu"""
+        return {
+            'locks': self._locks.get_stats(),
+            'response_locks': self._response_locks.get_stats()
+        }
+
     async def acquire_response_lock(self, ctx_or_interaction, timeout: float = 5.0) -> bool:
         """
         Acquire lock untuk response context/interaction
@@ -44,34 +306,23 @@ class BaseLockHandler:
         """
         try:
             key = self._get_response_key(ctx_or_interaction)
-                
-            if key not in self._response_locks:
-                self._response_locks[key] = Lock()
-                
-            await asyncio.wait_for(self._response_locks[key].acquire(), timeout=timeout)
-            return True
+            if await self._response_locks.acquire(key, timeout=timeout):
+                return True
+            self.logger.error(f"Response lock acquisition timeout for {key} after {timeout}s")
+            return False
         except Exception as e:
             self.logger.error(f"Error acquiring response lock: {e}")
             return False
 
     def release_lock(self, key: str):
-        """Release lock untuk key tertentu"""
-        if key in self._locks and self._locks[key].locked():
-            try:
-                self._locks[key].release()
-            except RuntimeError:
-                self.logger.warning(f"Attempted to release an unlocked lock for {key}")
+        """Release lock untuk key tertentu; lock yang tidak lagi dipakai dibuang"""
+        self._locks.release(key)
 
     def release_response_lock(self, ctx_or_interaction):
         """Release response lock untuk context/interaction"""
         try:
             key = self._get_response_key(ctx_or_interaction)
-                
-            if key in self._response_locks and self._response_locks[key].locked():
-                try:
-                    self._response_locks[key].release()
-                except RuntimeError:
-                    self.logger.warning(f"Attempted to release an unlocked response lock for {key}")
+            self._response_locks.release(key)
         except Exception as e:
             self.logger.error(f"Error releasing response lock: {e}")
 
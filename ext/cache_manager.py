@@ -5,23 +5,48 @@ Created at: 2025-03-07 18:04:56 UTC
 Last Modified: 2025-03-08 08:46:47 UTC
 """
 
+import copy
+import heapq
 import logging
+import re
 import time
 import json
-from typing import Optional, Any, Dict
+from collections import OrderedDict, deque
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, List, Tuple
 from datetime import datetime, timedelta
 from sqlite3 import Connection, Error as SQLiteError
-from database import get_connection
+from db_executor import DatabaseExecutor
+import queries
 import asyncio
+import sys
+from enum import Enum
 from functools import wraps
 
 from .constants import CACHE_TIMEOUT, Balance
 
 logger = logging.getLogger(__name__)
 
+class _Negative:
+    """
+    Penanda negative cache: data yang dicari memang tidak ada.
+    Falsy sehingga caller yang hanya memeriksa `if cached:` tetap
+    menganggapnya miss.
+    """
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return 'NEGATIVE'
+
+NEGATIVE = _Negative()
+
 class CustomJSONEncoder(json.JSONEncoder):
     """Custom JSON Encoder untuk menangani object khusus"""
     def default(self, obj):
+        if obj is NEGATIVE:
+            return {'__negative__': True}
         if isinstance(obj, Balance):
             return {
                 '__class__': 'Balance',
@@ -41,6 +66,8 @@ class CustomJSONDecoder(json.JSONDecoder):
         super().__init__(object_hook=self.object_hook, *args, **kwargs)
     
     def object_hook(self, obj):
+        if '__negative__' in obj:
+            return NEGATIVE
         if '__class__' in obj:
             if obj['__class__'] == 'Balance':
                 return Balance(obj['wl'], obj['dl'], obj['bgl'])
@@ -50,12 +77,349 @@ class CustomJSONDecoder(json.JSONDecoder):
             return timedelta(seconds=obj['__timedelta__'])
         return obj
 
+# Tipe yang tidak bisa diubah; dikembalikan apa adanya tanpa copy
+_IMMUTABLE_TYPES = frozenset({str, int, float, bool, type(None), bytes, datetime, timedelta, _Negative})
+
+def _copy_value(value: Any) -> Any:
+    """
+    Copy struktural untuk nilai cache: dict/list/tuple disalin rekursif,
+    tipe immutable dipakai ulang. Jauh lebih murah dari json round-trip
+    dan deepcopy untuk bentuk data yang disimpan di cache.
+    """
+    cls = value.__class__
+    if cls in _IMMUTABLE_TYPES:
+        return value
+    if cls is dict:
+        # Dict datar (row database) cukup disalin di level C
+        for v in value.values():
+            if v.__class__ not in _IMMUTABLE_TYPES:
+                return {k: _copy_value(v) for k, v in value.items()}
+        return value.copy()
+    if cls is list:
+        for v in value:
+            if v.__class__ not in _IMMUTABLE_TYPES:
+                return [_copy_value(v) for v in value]
+        return value.copy()
+    if cls is tuple:
+        return tuple(_copy_value(v) for v in value)
+    if cls is Balance:
+        return Balance(value.wl, value.dl, value.bgl)
+    return copy.deepcopy(value)
+
+def _estimate_size(value: Any) -> int:
+    """Perkiraan ukuran object (bytes) untuk budget memory tanpa serialisasi"""
+    cls = value.__class__
+    if cls is dict:
+        return sys.getsizeof(value) + sum(
+            _estimate_size(k) + _estimate_size(v) for k, v in value.items()
+        )
+    if cls is list or cls is tuple:
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+_NAMESPACE_SEPARATOR = re.compile(r'[_:]')
+
+def _namespace(key: str) -> str:
+    """Namespace key = bagian sampai separator pertama ('stock_', 'rate_limit:')"""
+    match = _NAMESPACE_SEPARATOR.search(key)
+    return key[:match.end()] if match else key
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Batas atas eksklusif untuk range `key >= prefix AND key < upper`"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+class _CacheEntry:
+    """Satu item di memory cache"""
+    __slots__ = ('value', 'expires_at', 'size', 'tags', 'stale_until')
+
+    def __init__(self, value: Any, expires_at: Optional[float], size: int, tags: tuple = (),
+                 stale_until: Optional[float] = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+        # Setelah expires_at entry masih boleh disajikan basi sampai waktu ini
+        self.stale_until = stale_until
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+    def is_dead(self, now: float) -> bool:
+        """Expired dan sudah lewat jendela stale"""
+        if not self.is_expired(now):
+            return False
+        return self.stale_until is None or self.stale_until <= now
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """Waktu entry boleh dibuang dari memory"""
+        return self.stale_until if self.stale_until is not None else self.expires_at
+
+class MemoryCache:
+    """
+    LRU in-memory di atas OrderedDict: get, set dan evict semuanya O(1).
+    Item paling lama tidak diakses ada di depan dan dibuang lebih dulu
+    saat jumlah item melebihi max_items atau total ukuran melebihi
+    max_bytes (None = tanpa batas).
+
+    Key juga diindeks per namespace dan per tag sehingga invalidasi
+    berdasarkan prefix atau tag hanya menyentuh key yang cocok.
+    Deadline expiry disimpan di min-heap sehingga pop_expired hanya
+    menyentuh entry yang memang sudah lewat waktunya.
+    """
+
+    # Heap dibangun ulang jika entry usang (key di-set ulang/dihapus) menumpuk
+    HEAP_COMPACT_FACTOR = 2
+    HEAP_COMPACT_MIN = 1024
+
+    def __init__(self, max_items: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._data: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        self._namespaces: Dict[str, set] = {}
+        self._tags: Dict[str, set] = {}
+        # (deadline, key); entry usang dibuang malas saat sampai di puncak heap
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # namespace -> jumlah evict / expire, untuk CacheManager.get_stats
+        self.namespace_evictions: Dict[str, int] = {}
+        self.namespace_expirations: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def keys(self) -> List[str]:
+        return list(self._data)
+
+    def _index(self, key: str, entry: _CacheEntry):
+        self._namespaces.setdefault(_namespace(key), set()).add(key)
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+    def _unindex(self, key: str, entry: _CacheEntry):
+        self.bytes -= entry.size
+        namespace = _namespace(key)
+        keys = self._namespaces.get(namespace)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._namespaces[namespace]
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def keys_with_prefix(self, prefix: str) -> List[str]:
+        """Key yang diawali prefix; hanya namespace terkait yang diperiksa"""
+        if _NAMESPACE_SEPARATOR.search(prefix):
+            candidates = self._namespaces.get(_namespace(prefix), ())
+        else:
+            # Prefix tanpa separator bisa mencakup beberapa namespace
+            candidates = [
+                key
+                for name, keys in self._namespaces.items() if name.startswith(prefix)
+                for key in keys
+            ]
+        return [key for key in candidates if key.startswith(prefix)]
+
+    def keys_with_tag(self, tag: str) -> List[str]:
+        return list(self._tags.get(tag, ()))
+
+    def get(self, key: str, now: Optional[float] = None, allow_stale: bool = False) -> Optional[_CacheEntry]:
+        """
+        Ambil entry yang masih valid dan tandai sebagai paling baru dipakai.
+        Dengan allow_stale, entry expired yang masih dalam jendela stale
+        ikut dikembalikan; caller memeriksa is_expired sendiri.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if now is None:
+            now = time.time()
+        if entry.is_expired(now):
+            if entry.is_dead(now):
+                self.expire(key)
+                self.misses += 1
+                return None
+            if not allow_stale:
+                # Dibiarkan untuk get_or_load yang boleh memakai nilai basi
+                self.misses += 1
+                return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, value: Any, expires_at: Optional[float], size: int, tags: tuple = (),
+            stale_until: Optional[float] = None) -> int:
+        """
+        Simpan entry sebagai paling baru dipakai.
+
+        Returns:
+            Jumlah entry yang di-evict
+        """
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._unindex(key, old)
+        entry = self._data[key] = _CacheEntry(value, expires_at, size, tags, stale_until)
+        self.bytes += size
+        self._index(key, entry)
+        deadline = entry.deadline
+        if deadline is not None:
+            heapq.heappush(self._expiry_heap, (deadline, key))
+            if len(self._expiry_heap) > max(self.HEAP_COMPACT_MIN, len(self._data) * self.HEAP_COMPACT_FACTOR):
+                self._compact_heap()
+        return self._evict()
+
+    def pop(self, key: str) -> Optional[_CacheEntry]:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._unindex(key, entry)
+        return entry
+
+    def _remove(self, key: str):
+        self._unindex(key, self._data.pop(key))
+
+    def _evict(self) -> int:
+        evicted = 0
+        # Entry terbaru tidak pernah di-evict walau melebihi max_bytes sendirian
+        while len(self._data) > 1 and (
+            (self.max_items is not None and len(self._data) > self.max_items)
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            key, entry = self._data.popitem(last=False)
+            self._unindex(key, entry)
+            namespace = _namespace(key)
+            self.namespace_evictions[namespace] = self.namespace_evictions.get(namespace, 0) + 1
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def expire(self, key: str):
+        """Buang entry yang sudah expired dan catat per namespace"""
+        if self.pop(key) is not None:
+            namespace = _namespace(key)
+            self.namespace_expirations[namespace] = self.namespace_expirations.get(namespace, 0) + 1
+            self.expirations += 1
+
+    def _compact_heap(self):
+        self._expiry_heap = [
+            (entry.deadline, key) for key, entry in self._data.items() if entry.deadline is not None
+        ]
+        heapq.heapify(self._expiry_heap)
+
+    def next_deadline(self) -> Optional[float]:
+        return self._expiry_heap[0][0] if self._expiry_heap else None
+
+    def pop_expired(self, now: float) -> List[str]:
+        """
+        Buang semua entry yang deadline-nya sudah lewat, O(log n) per entry.
+
+        Returns:
+            Key yang dibuang
+        """
+        heap = self._expiry_heap
+        expired = []
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            # Item heap usang: key sudah dihapus atau di-set ulang dengan deadline lain
+            if entry is None or entry.deadline != deadline:
+                continue
+            self.expire(key)
+            expired.append(key)
+        return expired
+
+    def clear(self):
+        self._data.clear()
+        self._expiry_heap.clear()
+        self._namespaces.clear()
+        self._tags.clear()
+        self.bytes = 0
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'items': len(self._data),
+            'bytes': self.bytes,
+            'max_items': self.max_items,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+class _NamespaceStats:
+    """Counter lookup dan ukuran untuk satu namespace key"""
+    __slots__ = ('l1_hits', 'l2_hits', 'misses', 'stored', 'stored_bytes', 'load_times')
+
+    LOAD_SAMPLES = 512  # Durasi loader terakhir yang disimpan untuk persentil
+
+    def __init__(self):
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.stored_bytes = 0
+        self.load_times: deque = deque(maxlen=self.LOAD_SAMPLES)
+
+def _percentiles(samples: Iterable[float]) -> Dict:
+    """p50/p95/p99 dalam milidetik (nearest-rank)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+    return {
+        'count': len(ordered),
+        'p50_ms': rank(0.50),
+        'p95_ms': rank(0.95),
+        'p99_ms': rank(0.99),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
+
+class CachePolicy(Enum):
+    """Cara sebuah namespace cache dipersist ke tabel cache (L2)"""
+    MEMORY_ONLY = "memory_only"      # Tidak pernah menyentuh disk
+    WRITE_BEHIND = "write_behind"    # Dikumpulkan lalu di-flush per batch
+    WRITE_THROUGH = "write_through"  # Ditulis ke database sebelum set() selesai
+
+# Penanda delete yang menunggu flush write-behind
+_DELETED = object()
+
 class CacheManager:
     """Enhanced Cache Manager dengan Database Integration"""
     _instance = None
-    _lock = asyncio.Lock()
     
     MAX_MEMORY_ITEMS = 10000  # Batasan item di memory
+    MAX_MEMORY_BYTES: Optional[int] = None  # Batasan ukuran memory cache (bytes), None = hanya jumlah item
+    WRITE_BEHIND_INTERVAL = 1.0   # Detik antar flush write-behind
+    WRITE_BEHIND_MAX_PENDING = 500  # Flush segera jika pending melebihi ini
+    STALE_WHILE_REVALIDATE = 30  # Detik default get_or_load boleh menyajikan nilai basi
+    EXPIRY_MAX_SLEEP = 5.0  # Detik maksimum worker expiry tidur antar pemeriksaan heap
+    EXPIRY_SWEEP_INTERVAL = 60.0  # Detik antar sweep row expired di tabel cache
+
+    DEFAULT_POLICY = CachePolicy.WRITE_BEHIND
+    # Prefix key -> policy; prefix terpanjang yang cocok dipakai
+    NAMESPACE_POLICIES: Dict[str, CachePolicy] = {
+        'rate_limit:': CachePolicy.MEMORY_ONLY,
+        'cooldown:': CachePolicy.MEMORY_ONLY,
+        'response:': CachePolicy.MEMORY_ONLY,
+        'perms:': CachePolicy.MEMORY_ONLY,
+        'cmdlog:': CachePolicy.MEMORY_ONLY,
+        'maintenance_mode': CachePolicy.WRITE_THROUGH
+    }
     
     def __new__(cls):
         if cls._instance is None:
@@ -64,122 +428,540 @@ class CacheManager:
 
     def __init__(self):
         if not hasattr(self, 'initialized'):
-            self.memory_cache: Dict[str, Dict] = {}
+            self.memory_cache = MemoryCache(self.MAX_MEMORY_ITEMS, self.MAX_MEMORY_BYTES)
+            self.db = DatabaseExecutor()
             self.logger = logging.getLogger('CacheManager')
+            self._policies = dict(self.NAMESPACE_POLICIES)
+            self._prefixes = self._sorted_prefixes()
+            self._pending: Dict[str, tuple] = {}
+            self._flush_event: Optional[asyncio.Event] = None
+            self._flusher: Optional[asyncio.Task] = None
+            self._expirer: Optional[asyncio.Task] = None
+            self.write_stats = {
+                'flushes': 0,
+                'flushed_keys': 0,
+                'coalesced': 0,
+                'flush_errors': 0,
+                'serialize_errors': 0,
+                'generation_bumps': 0,
+                'orphans_collected': 0,
+                'expired_rows': 0
+            }
+            # Generasi per nama key; seed dari waktu start sehingga key versi
+            # proses sebelumnya yang masih ada di database tidak terbaca lagi
+            self._generations: Dict[str, int] = {}
+            self._generation_seed = time.time_ns() // 1000
+            # Prefix key generasi lama yang belum dihapus dari database
+            self._orphans: List[str] = []
+            self._namespace_stats: Dict[str, _NamespaceStats] = {}
+            # Hasil warm-up terakhir (diisi StoreBot.warm_cache)
+            self.last_warmup: Optional[Dict] = None
+            # key -> (task loader yang sedang berjalan, tags)
+            self._inflight: Dict[str, Tuple[asyncio.Task, tuple]] = {}
+            # key -> [epoch, jumlah read/load yang berjalan]; set/delete/
+            # invalidasi menaikkan epoch sehingga hasil read yang dimulai
+            # sebelumnya tidak disimpan menimpa nilai yang lebih baru
+            self._reads: Dict[str, List[int]] = {}
+            self.load_stats = {
+                'loads': 0,
+                'coalesced': 0,
+                'stale_served': 0,
+                'refreshes': 0,
+                'load_errors': 0
+            }
             self.initialized = True
-            
-    async def _enforce_memory_limit(self):
-        """Enforces memory cache limit by removing oldest items"""
-        if len(self.memory_cache) > self.MAX_MEMORY_ITEMS:
-            # Sort by last access time and remove oldest
-            sorted_items = sorted(
-                self.memory_cache.items(),
-                key=lambda x: x[1].get('last_accessed', 0)
-            )
-            # Remove oldest items until we're under limit
-            items_to_remove = len(sorted_items) - self.MAX_MEMORY_ITEMS
-            for key, _ in sorted_items[:items_to_remove]:
-                del self.memory_cache[key]
 
+    # Policy
+
+    def _sorted_prefixes(self) -> List[str]:
+        return sorted(self._policies, key=len, reverse=True)
+
+    def set_policy(self, prefix: str, policy: CachePolicy):
+        """Atur policy persistence untuk semua key dengan prefix ini"""
+        self._policies[prefix] = policy
+        self._prefixes = self._sorted_prefixes()
+
+    def get_policy(self, key: str) -> CachePolicy:
+        for prefix in self._prefixes:
+            if key.startswith(prefix):
+                return self._policies[prefix]
+        return self.DEFAULT_POLICY
+
+    # Statistics
+
+    def _stats_for(self, key: str) -> _NamespaceStats:
+        namespace = _namespace(key)
+        stats = self._namespace_stats.get(namespace)
+        if stats is None:
+            stats = self._namespace_stats[namespace] = _NamespaceStats()
+        return stats
+
+    def _record_stored(self, sizes: Dict[str, int]):
+        """Catat ukuran serialisasi value yang ditulis ke database, per key"""
+        for key, size in sizes.items():
+            stats = self._stats_for(key)
+            stats.stored += 1
+            stats.stored_bytes += size
+
+    # Generations
+
+    def generation(self, name: str) -> int:
+        return self._generations.get(name, self._generation_seed)
+
+    def _generation_prefix(self, name: str, generation: int) -> str:
+        return f"{name}:g{generation}:"
+
+    def versioned_key(self, name: str, key: str) -> str:
+        """Key di bawah generasi `name` saat ini, mis. stock_P1:g42:q5"""
+        return f"{self._generation_prefix(name, self.generation(name))}{key}"
+
+    def bump_generation(self, name: str) -> int:
+        """
+        Invalidasi semua versioned_key milik `name` dalam O(1): key generasi
+        lama tidak pernah dibaca lagi. Entry lama dibuang dari memory saat
+        ini juga dan dari database pada flush write-behind berikutnya.
+
+        Returns:
+            Generasi baru
+        """
+        old = self.generation(name)
+        self._generations[name] = old + 1
+        self.write_stats['generation_bumps'] += 1
+
+        prefix = self._generation_prefix(name, old)
+        for key in self.memory_cache.keys_with_prefix(prefix):
+            self.memory_cache.pop(key)
+        for key in [key for key in self._pending if key.startswith(prefix)]:
+            del self._pending[key]
+        for key in [key for key in self._inflight if key.startswith(prefix)]:
+            del self._inflight[key]
+        self._touch_prefix(prefix)
+
+        self._orphans.append(prefix)
+        self._ensure_flusher()
+        return old + 1
+
+    # Read epoch
+
+    def _read_begin(self, key: str) -> int:
+        state = self._reads.get(key)
+        if state is None:
+            state = self._reads[key] = [0, 0]
+        state[1] += 1
+        return state[0]
+
+    def _read_end(self, key: str, epoch: int) -> bool:
+        """True jika key tidak ditulis atau diinvalidasi sejak _read_begin"""
+        state = self._reads[key]
+        state[1] -= 1
+        if not state[1]:
+            del self._reads[key]
+        return state[0] == epoch
+
+    def _touch(self, key: str):
+        state = self._reads.get(key)
+        if state is not None:
+            state[0] += 1
+
+    def _touch_prefix(self, prefix: str):
+        for key, state in self._reads.items():
+            if key.startswith(prefix):
+                state[0] += 1
+
+    def _touch_all(self):
+        # Tag key yang sedang dibaca belum diketahui; anggap semua tersentuh
+        for state in self._reads.values():
+            state[0] += 1
+
+    # Write-behind
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flush_event = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    def _queue_write(self, key: str, value: Any, expires_at: Optional[float], tags: tuple = ()):
+        """Catat perubahan untuk flush berikutnya; perubahan lama key yang sama digantikan"""
+        if key in self._pending:
+            self.write_stats['coalesced'] += 1
+        self._pending[key] = (value, expires_at, tags)
+        self._ensure_flusher()
+        if len(self._pending) >= self.WRITE_BEHIND_MAX_PENDING:
+            self._flush_event.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.WRITE_BEHIND_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    @staticmethod
+    def _write_rows(conn: Connection, upserts: List[tuple], deletes: List[tuple], tags: List[tuple]):
+        """Tulis row cache beserta tag-nya; tag lama setiap key selalu diganti"""
+        changed = [(row[0],) for row in upserts] + deletes
+        if changed:
+            with queries.track(queries.CACHE_TAGS_CLEAR_KEY):
+                conn.executemany(str(queries.CACHE_TAGS_CLEAR_KEY), changed)
+        if deletes:
+            with queries.track(queries.CACHE_DELETE):
+                conn.executemany(str(queries.CACHE_DELETE), deletes)
+        if upserts:
+            with queries.track(queries.CACHE_UPSERT):
+                conn.executemany(str(queries.CACHE_UPSERT), upserts)
+        if tags:
+            with queries.track(queries.CACHE_TAG_INSERT):
+                conn.executemany(str(queries.CACHE_TAG_INSERT), tags)
+
+    @staticmethod
+    def _delete_prefixes(conn: Connection, prefixes: List[str]) -> int:
+        bounds = [(prefix, _prefix_upper_bound(prefix)) for prefix in prefixes]
+        with queries.track(queries.CACHE_TAGS_CLEAR_RANGE):
+            conn.executemany(str(queries.CACHE_TAGS_CLEAR_RANGE), bounds)
+        with queries.track(queries.CACHE_DELETE_RANGE):
+            return conn.executemany(str(queries.CACHE_DELETE_RANGE), bounds).rowcount
+
+    @classmethod
+    def _apply_pending(cls, conn: Connection, pending: Dict[str, tuple], orphans: List[str] = ()) -> Dict:
+        """Tulis satu batch write-behind; jalan di writer thread"""
+        upserts = []
+        deletes = []
+        tags = []
+        failed = []
+        sizes = {}
+        for key, (value, expires_at, key_tags) in pending.items():
+            if value is _DELETED:
+                deletes.append((key,))
+                continue
+            try:
+                serialized = json.dumps(value, cls=CustomJSONEncoder)
+                upserts.append((key, serialized, expires_at))
+                sizes[key] = len(serialized)
+            except (TypeError, ValueError):
+                # Tetap tersedia di memory, hanya tidak dipersist
+                failed.append(key)
+                continue
+            tags.extend((tag, key) for tag in key_tags)
+        cls._write_rows(conn, upserts, deletes, tags)
+        # Setelah upsert: write terlambat ke key generasi lama ikut terhapus
+        collected = cls._delete_prefixes(conn, orphans) if orphans else 0
+        return {
+            'written': len(upserts) + len(deletes),
+            'failed': failed,
+            'collected': collected,
+            'sizes': sizes
+        }
+
+    async def flush(self) -> int:
+        """
+        Tulis semua perubahan write-behind dalam satu transaksi.
+
+        Returns:
+            Jumlah key yang ditulis atau dihapus
+        """
+        if not self._pending and not self._orphans:
+            return 0
+
+        # Snapshot diambil dan di-submit tanpa await di antaranya sehingga
+        # urutannya di write queue tetap sama dengan delete/write-through berikutnya
+        pending, self._pending = self._pending, {}
+        orphans, self._orphans = self._orphans, []
+        try:
+            result = await self.db.transaction(self._apply_pending, pending, orphans)
+        except Exception as e:
+            self.write_stats['flush_errors'] += 1
+            self.logger.error(f"Error flushing {len(pending)} cache writes: {e}")
+            # Kembalikan ke antrian kecuali key sudah diubah lagi sejak snapshot
+            for key, change in pending.items():
+                self._pending.setdefault(key, change)
+            self._orphans.extend(orphans)
+            return 0
+
+        self.write_stats['flushes'] += 1
+        self.write_stats['flushed_keys'] += result['written']
+        self.write_stats['orphans_collected'] += result['collected']
+        self._record_stored(result['sizes'])
+        if result['failed']:
+            self.write_stats['serialize_errors'] += len(result['failed'])
+            self.logger.warning(f"Cache values not serializable, kept in memory only: {result['failed'][:5]}")
+        return result['written']
+
+    async def close(self):
+        """Hentikan flusher dan worker expiry lalu tulis sisa perubahan"""
+        if self._expirer is not None:
+            self._expirer.cancel()
+            self._expirer = None
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    # Expiry
+
+    def _ensure_expirer(self):
+        if self._expirer is None or self._expirer.done():
+            self._expirer = asyncio.create_task(self._expiry_loop())
+
+    async def _expiry_loop(self):
+        """
+        Tidur sampai deadline terdekat di heap memory cache (maksimal
+        EXPIRY_MAX_SLEEP), buang entry yang lewat waktunya, dan sweep
+        tabel cache lewat idx_cache_expiry setiap EXPIRY_SWEEP_INTERVAL.
+        """
+        next_sweep = time.time() + self.EXPIRY_SWEEP_INTERVAL
+        while True:
+            now = time.time()
+            deadline = self.memory_cache.next_deadline()
+            delay = self.EXPIRY_MAX_SLEEP if deadline is None else deadline - now
+            await asyncio.sleep(min(max(delay, 0.05), self.EXPIRY_MAX_SLEEP, max(next_sweep - now, 0.05)))
+
+            now = time.time()
+            try:
+                self._expire_memory(now)
+                if now >= next_sweep:
+                    next_sweep = now + self.EXPIRY_SWEEP_INTERVAL
+                    await self._sweep_expired_rows(now)
+            except Exception as e:
+                self.logger.error(f"Error in cache expiry worker: {e}")
+
+    def _expire_memory(self, now: float) -> int:
+        expired = self.memory_cache.pop_expired(now)
+        # Write-behind yang sudah expired cukup ditulis sebagai delete
+        for key, (value, expires_at, _) in list(self._pending.items()):
+            if value is not _DELETED and expires_at is not None and expires_at <= now:
+                self._pending[key] = (_DELETED, None, ())
+        return len(expired)
+
+    async def _sweep_expired_rows(self, now: float) -> int:
+        def sweep(conn: Connection):
+            with queries.track(queries.CACHE_TAGS_CLEAR_EXPIRED):
+                conn.execute(str(queries.CACHE_TAGS_CLEAR_EXPIRED), (now,))
+            with queries.track(queries.CACHE_DELETE_EXPIRED):
+                return conn.execute(str(queries.CACHE_DELETE_EXPIRED), (now,)).rowcount
+
+        deleted = await self.db.transaction(sweep)
+        self.write_stats['expired_rows'] += deleted
+        return deleted
+
+    # Public API
+            
     async def get(self, key: str) -> Optional[Any]:
         """
         Get value from cache
         Returns None if key not found or value expired
         """
         try:
-            # Check memory cache first
-            if key in self.memory_cache:
-                cache_data = self.memory_cache[key]
-                now = time.time()
-                
-                # Check expiry
-                if 'expires_at' in cache_data and cache_data['expires_at'] <= now:
-                    del self.memory_cache[key]
+            # Memory cache menyimpan object hidup; caller dapat salinannya
+            # sehingga mutasi tidak bocor ke cache
+            entry = self.memory_cache.get(key)
+            if entry is not None:
+                self._stats_for(key).l1_hits += 1
+                return _copy_value(entry.value)
+            return await self._get_stored(key)
+
+        except Exception as e:
+            self.logger.error(f"Error retrieving from cache: {e}")
+            return None
+
+    async def _get_stored(self, key: str) -> Optional[Any]:
+        """Cari key yang tidak ada di memory di write-behind lalu database"""
+        stats = self._stats_for(key)
+        try:
+            policy = self.get_policy(key)
+            if policy is CachePolicy.MEMORY_ONLY:
+                stats.misses += 1
+                return None
+
+            now = time.time()
+            pending = self._pending.get(key)
+            if pending is not None:
+                # Entry sudah di-evict dari memory tapi belum di-flush
+                value, expires_at, tags = pending
+                if value is _DELETED or (expires_at is not None and expires_at <= now):
+                    stats.misses += 1
                     return None
-                
-                # Update last accessed time
-                cache_data['last_accessed'] = now
-                return json.loads(cache_data['value'], cls=CustomJSONDecoder)
+                self.memory_cache.set(key, value, expires_at, _estimate_size(value), tags)
+                stats.l2_hits += 1
+                return _copy_value(value)
             
             # Try database
-            async with self._lock:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT value, expires_at FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
-                    (key, time.time())
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    value, expires_at = result
-                    # Store in memory cache
-                    self.memory_cache[key] = {
-                        'value': value,
-                        'expires_at': expires_at,
-                        'last_accessed': time.time()
-                    }
-                    await self._enforce_memory_limit()
-                    return json.loads(value, cls=CustomJSONDecoder)
-                
+            epoch = self._read_begin(key)
+            try:
+                result = await self.db.fetchone(queries.CACHE_GET, (key, now))
+            finally:
+                fresh = self._read_end(key, epoch)
+            if result:
+                value, expires_at, tags = result
+                # Decode sekali saat naik dari database ke memory cache
+                decoded = json.loads(value, cls=CustomJSONDecoder)
+                tags = tuple(tags.split('\x1f')) if tags else ()
+                # Key di-set/di-delete selama query: jangan timpa memory cache
+                if fresh:
+                    self.memory_cache.set(key, decoded, expires_at, len(value), tags)
+                stats.l2_hits += 1
+                return _copy_value(decoded)
+
+            stats.misses += 1
             return None
 
         except Exception as e:
             self.logger.error(f"Error retrieving from cache: {e}")
             return None
 
-    async def set(self, key: str, value: Any, expires_in: Optional[int] = None):
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          ttl: Optional[int] = None, tags: Optional[Iterable[str]] = None,
+                          stale_for: Optional[float] = None) -> Optional[Any]:
+        """
+        Get value from cache, jika tidak ada jalankan loader dan simpan hasilnya.
+
+        Hanya satu loader per key yang berjalan; pemanggil lain yang miss
+        bersamaan menunggu hasil yang sama. Setelah ttl habis nilai lama
+        masih disajikan selama stale_for detik (default STALE_WHILE_REVALIDATE,
+        0 = nonaktif) sementara satu refresh berjalan di background.
+        Hasil loader None tidak di-cache; exception loader diteruskan ke
+        semua pemanggil yang menunggu.
+        """
+        stale_for = self.STALE_WHILE_REVALIDATE if stale_for is None else stale_for
+        tags = tuple(tags) if tags else ()
+
+        now = time.time()
+        entry = self.memory_cache.get(key, now, allow_stale=True)
+        if entry is not None:
+            self._stats_for(key).l1_hits += 1
+            if entry.is_expired(now):
+                self.load_stats['stale_served'] += 1
+                if key not in self._inflight:
+                    self.load_stats['refreshes'] += 1
+                    self._start_load(key, loader, ttl, tags, stale_for, check_stored=False)
+            return _copy_value(entry.value)
+
+        if key in self._inflight:
+            self.load_stats['coalesced'] += 1
+            task = self._inflight[key][0]
+        else:
+            task = self._start_load(key, loader, ttl, tags, stale_for, check_stored=True)
+        # Waiter yang dibatalkan (mis. interaction timeout) tidak ikut membatalkan loader
+        return _copy_value(await asyncio.shield(task))
+
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int],
+                    tags: tuple, stale_for: float, check_stored: bool) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, loader, ttl, tags, stale_for, check_stored))
+        self._inflight[key] = (task, tags)
+        task.add_done_callback(lambda done: self._load_done(key, done))
+        return task
+
+    def _load_done(self, key: str, task: asyncio.Task):
+        flight = self._inflight.get(key)
+        if flight is not None and flight[0] is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.load_stats['load_errors'] += 1
+            self.logger.error(f"Error loading cache key {key}: {task.exception()}")
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int],
+                    tags: tuple, stale_for: float, check_stored: bool) -> Optional[Any]:
+        if check_stored:
+            value = await self._get_stored(key)
+            if value is not None:
+                return value
+
+        self.load_stats['loads'] += 1
+        started = time.perf_counter()
+        epoch = self._read_begin(key)
+        try:
+            value = await loader()
+        finally:
+            self._stats_for(key).load_times.append(time.perf_counter() - started)
+            fresh = self._read_end(key, epoch)
+
+        # Key di-set atau diinvalidasi selama loader berjalan: hasilnya tetap
+        # diberikan ke yang menunggu tapi tidak disimpan karena bisa sudah basi
+        flight = self._inflight.get(key)
+        if (value is not None and fresh and flight is not None
+                and flight[0] is asyncio.current_task()):
+            try:
+                await self.set(key, value, expires_in=ttl, tags=tags, stale_for=stale_for)
+            except Exception:
+                pass  # Sudah di-log oleh set; nilai tetap dikembalikan
+        return value
+
+    async def set(self, key: str, value: Any, expires_in: Optional[int] = None,
+                  tags: Optional[Iterable[str]] = None, stale_for: Optional[float] = None):
         """
         Set value in cache
         expires_in: Optional expiry time in seconds
+        tags: Optional tag untuk invalidasi berkelompok lewat invalidate_tag
+        stale_for: Detik setelah expiry nilai masih disimpan di memory untuk
+            disajikan basi oleh get_or_load selama refresh berjalan
         """
         try:
             expires_at = None
+            stale_until = None
             if expires_in is not None:
                 expires_at = time.time() + expires_in
+                if stale_for:
+                    stale_until = expires_at + stale_for
+            tags = tuple(tags) if tags else ()
 
-            # Serialize value
-            serialized_value = json.dumps(value, cls=CustomJSONEncoder)
-            
-            # Update memory cache
-            self.memory_cache[key] = {
-                'value': serialized_value,
-                'expires_at': expires_at,
-                'last_accessed': time.time()
-            }
-            
-            await self._enforce_memory_limit()
-            
-            # Update database
-            async with self._lock:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    INSERT OR REPLACE INTO cache (key, value, expires_at)
-                    VALUES (?, ?, ?)
-                    """,
-                    (key, serialized_value, expires_at)
+            policy = self.get_policy(key)
+            if policy is CachePolicy.WRITE_THROUGH:
+                # Serialisasi hanya untuk database; ukurannya dipakai budget memory
+                serialized_value = json.dumps(value, cls=CustomJSONEncoder)
+                size = len(serialized_value)
+            else:
+                size = _estimate_size(value)
+
+            # Load/read yang sudah berjalan membawa nilai lebih lama
+            self._touch(key)
+
+            # Simpan salinan agar mutasi caller setelah set tidak mengubah cache
+            stored = _copy_value(value)
+            self.memory_cache.set(key, stored, expires_at, size, tags, stale_until)
+            if expires_at is not None:
+                self._ensure_expirer()
+
+            if policy is CachePolicy.WRITE_BEHIND:
+                self._queue_write(key, stored, expires_at, tags)
+            elif policy is CachePolicy.WRITE_THROUGH:
+                self._pending.pop(key, None)
+                await self.db.transaction(
+                    self._write_rows,
+                    [(key, serialized_value, expires_at)],
+                    [],
+                    [(tag, key) for tag in tags]
                 )
-                conn.commit()
+                self._record_stored({key: size})
 
         except Exception as e:
             self.logger.error(f"Error setting cache: {e}")
             raise
 
+    async def set_negative(self, key: str, expires_in: Optional[int] = None):
+        """
+        Catat bahwa data untuk key ini tidak ada, dengan TTL pendek
+        (default CACHE_TIMEOUT.NEGATIVE). get() mengembalikan NEGATIVE
+        sampai expired atau key di-set/di-delete saat data dibuat.
+        """
+        if expires_in is None:
+            expires_in = CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.NEGATIVE)
+        await self.set(key, NEGATIVE, expires_in=expires_in)
+
     async def delete(self, key: str):
         """Delete value from cache"""
         try:
             # Remove from memory cache
-            if key in self.memory_cache:
-                del self.memory_cache[key]
-            
-            # Remove from database
-            async with self._lock:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM cache WHERE key = ?", (key,))
-                conn.commit()
+            self.memory_cache.pop(key)
+            self._inflight.pop(key, None)
+            self._touch(key)
+
+            policy = self.get_policy(key)
+            if policy is CachePolicy.WRITE_BEHIND:
+                self._queue_write(key, _DELETED, None)
+            elif policy is CachePolicy.WRITE_THROUGH:
+                self._pending.pop(key, None)
+                await self.db.transaction(self._write_rows, [], [(key,)], [])
 
         except Exception as e:
             self.logger.error(f"Error deleting from cache: {e}")
@@ -190,71 +972,181 @@ class CacheManager:
         try:
             # Clear memory cache
             self.memory_cache.clear()
+            self._pending.clear()
+            self._orphans.clear()
+            self._inflight.clear()
+            self._touch_all()
             
             # Clear database cache
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM cache")
-            conn.commit()
+            def clear(conn: Connection):
+                conn.execute("DELETE FROM cache_tags")
+                conn.execute("DELETE FROM cache")
+
+            await self.db.transaction(clear)
             
             self.logger.info("Cache cleared successfully")
         except Exception as e:
             self.logger.error(f"Error clearing cache: {e}")
             raise
-        finally:
-            if 'conn' in locals():
-                conn.close()
 
     async def cleanup_expired(self):
         """Remove expired items from cache"""
         try:
             now = time.time()
-            
-            # Cleanup memory cache
-            expired_keys = [
-                key for key, data in self.memory_cache.items()
-                if 'expires_at' in data and data['expires_at'] <= now
-            ]
-            for key in expired_keys:
-                del self.memory_cache[key]
-            
-            # Cleanup database
-            async with self._lock:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
-                    (now,)
-                )
-                conn.commit()
+            self._expire_memory(now)
+            await self._sweep_expired_rows(now)
+            self._ensure_expirer()
 
         except Exception as e:
             self.logger.error(f"Error cleaning up expired cache: {e}")
-# Tambahkan method baru setelah method cleanup_expired (setelah line 232)
-# Line 233-249 (Method Baru):
+
     async def delete_pattern(self, pattern: str):
-        """Delete all cache keys matching the pattern"""
+        """
+        Delete all cache keys starting with `pattern`.
+        Tanda '*' di akhir pattern boleh dipakai ('stock_*' sama dengan 'stock_').
+        Di memory hanya namespace terkait yang diperiksa; di database
+        dipakai rentang key pada primary key, bukan LIKE '%...%'.
+        """
         try:
+            prefix = pattern.rstrip('*')
+            if not prefix:
+                await self.clear_all()
+                return
+
             # Hapus dari memory cache
-            keys_to_delete = [
-                key for key in self.memory_cache.keys()
-                if pattern in key
-            ]
+            keys_to_delete = self.memory_cache.keys_with_prefix(prefix)
             for key in keys_to_delete:
-                del self.memory_cache[key]
+                self.memory_cache.pop(key)
+
+            # Write-behind yang belum di-flush ikut terhapus oleh range di bawah
+            for key in [key for key in self._pending if key.startswith(prefix)]:
+                del self._pending[key]
+            for key in [key for key in self._inflight if key.startswith(prefix)]:
+                del self._inflight[key]
+            self._touch_prefix(prefix)
                 
             # Hapus dari database
-            async with self._lock:
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "DELETE FROM cache WHERE key LIKE ?",
-                    (f"%{pattern}%",)
-                )
-                conn.commit()
+            bounds = (prefix, _prefix_upper_bound(prefix))
+
+            def delete_range(conn: Connection):
+                with queries.track(queries.CACHE_TAGS_CLEAR_RANGE):
+                    conn.execute(str(queries.CACHE_TAGS_CLEAR_RANGE), bounds)
+                with queries.track(queries.CACHE_DELETE_RANGE):
+                    return conn.execute(str(queries.CACHE_DELETE_RANGE), bounds).rowcount
+
+            deleted = await self.db.transaction(delete_range)
                 
-            self.logger.info(f"Deleted {len(keys_to_delete)} cache entries matching pattern: {pattern}")
+            self.logger.info(
+                f"Deleted {len(keys_to_delete)} memory / {deleted} stored cache entries "
+                f"matching prefix: {prefix}"
+            )
                 
         except Exception as e:
             self.logger.error(f"Error deleting cache pattern {pattern}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """
+        Hapus semua key yang di-set dengan tag ini.
+
+        Returns:
+            Jumlah key yang dihapus dari memory cache
+        """
+        try:
+            keys = self.memory_cache.keys_with_tag(tag)
+            for key in keys:
+                self.memory_cache.pop(key)
+
+            # Versi lama key di database belum tentu punya tag ini,
+            # jadi write yang belum di-flush diganti menjadi delete
+            for key, (_, _, key_tags) in list(self._pending.items()):
+                if tag in key_tags:
+                    self._pending[key] = (_DELETED, None, ())
+            for key, (_, key_tags) in list(self._inflight.items()):
+                if tag in key_tags:
+                    del self._inflight[key]
+            self._touch_all()
+
+            def delete_tag(conn: Connection):
+                with queries.track(queries.CACHE_DELETE_TAG):
+                    conn.execute(str(queries.CACHE_DELETE_TAG), (tag,))
+                with queries.track(queries.CACHE_TAG_DELETE):
+                    conn.execute(str(queries.CACHE_TAG_DELETE), (tag,))
+
+            await self.db.transaction(delete_tag)
+            return len(keys)
+
+        except Exception as e:
+            self.logger.error(f"Error invalidating cache tag {tag}: {e}")
+            raise
+
+    async def get_stats(self) -> Dict:
+        """
+        Statistik cache untuk admin: hit L1 (memory) vs L2 (database) per
+        namespace, evict/expire, rata-rata ukuran serialisasi, persentil
+        latency loader get_or_load dan footprint memory.
+        """
+        memory = self.memory_cache.get_stats()
+
+        namespaces = {}
+        all_load_times = []
+        names = (
+            set(self._namespace_stats)
+            | set(self.memory_cache.namespace_evictions)
+            | set(self.memory_cache.namespace_expirations)
+        )
+        for name in names:
+            stats = self._namespace_stats.get(name) or _NamespaceStats()
+            lookups = stats.l1_hits + stats.l2_hits + stats.misses
+            all_load_times.extend(stats.load_times)
+            namespaces[name] = {
+                'lookups': lookups,
+                'l1_hits': stats.l1_hits,
+                'l2_hits': stats.l2_hits,
+                'misses': stats.misses,
+                'hit_rate': round((stats.l1_hits + stats.l2_hits) / lookups * 100, 2) if lookups else 0.0,
+                'evictions': self.memory_cache.namespace_evictions.get(name, 0),
+                'expirations': self.memory_cache.namespace_expirations.get(name, 0),
+                'avg_size': round(stats.stored_bytes / stats.stored) if stats.stored else 0,
+                'loader': _percentiles(stats.load_times)
+            }
+
+        l1_hits = sum(ns['l1_hits'] for ns in namespaces.values())
+        l2_hits = sum(ns['l2_hits'] for ns in namespaces.values())
+        misses = sum(ns['misses'] for ns in namespaces.values())
+        lookups = l1_hits + l2_hits + misses
+        stored = sum(stats.stored for stats in self._namespace_stats.values())
+        stored_bytes = sum(stats.stored_bytes for stats in self._namespace_stats.values())
+
+        try:
+            row = await self.db.fetchone(queries.CACHE_STATS)
+            database = {'items': row['items'], 'bytes': row['bytes']}
+        except Exception as e:
+            self.logger.error(f"Error reading cache table stats: {e}")
+            database = {'items': 0, 'bytes': 0}
+
+        return {
+            'items': memory['items'],
+            'hit_rate': round((l1_hits + l2_hits) / lookups * 100, 2) if lookups else 0.0,
+            'l1_hit_rate': round(l1_hits / lookups * 100, 2) if lookups else 0.0,
+            'l2_hit_rate': round(l2_hits / lookups * 100, 2) if lookups else 0.0,
+            'lookups': lookups,
+            'l1_hits': l1_hits,
+            'l2_hits': l2_hits,
+            'misses': misses,
+            'evictions': memory['evictions'],
+            'expirations': memory['expirations'],
+            'memory_bytes': memory['bytes'],
+            'memory_usage': memory['bytes'] / 1024 / 1024,
+            'max_items': memory['max_items'],
+            'max_bytes': memory['max_bytes'],
+            'avg_size': round(stored_bytes / stored) if stored else 0,
+            'pending_writes': len(self._pending),
+            'inflight_loads': len(self._inflight),
+            'database': database,
+            'loader': _percentiles(all_load_times),
+            'loads': dict(self.load_stats),
+            'writes': dict(self.write_stats),
+            'warmup': self.last_warmup,
+            'namespaces': namespaces
+        }
@@ -63,7 +63,8 @@ COG_LOADED = {
     'TRANSACTION': 'transaction_manager_loaded',
     'LIVE_STOCK': 'live_stock_loaded', 
     'LIVE_BUTTONS': 'live_buttons_loaded',
-    'ADMIN': 'admin_service_loaded'
+    'ADMIN': 'admin_service_loaded',
+    'DB_MAINTENANCE': 'db_maintenance_loaded'
 }
 
 # File Size Settings
@@ -172,7 +173,8 @@ class EXTENSIONS:
     # Core features yang bergantung pada services
     FEATURES: List[str] = [
         'ext.live_stock',      # Load after services
-        'ext.live_buttons'     # Load last, depends on live_stock
+        'ext.live_buttons',    # Load last, depends on live_stock
+        'ext.db_maintenance'   # Backup & maintenance database
     ]
     
     # Optional cogs - load terakhir
@@ -274,6 +276,8 @@ class Stock:
     MIN_STOCK = 0
     MIN_PRICE = 1
     MAX_PRICE = 999999999  # atau sesuai
+    RESERVE_BATCH_SIZE = 100    # Id stock yang dimuat per refill antrian reservasi
+    RESERVATION_TIMEOUT = 60    # Detik sebelum reservasi yang tidak di-commit dikembalikan
     
 # Discord Colors
 class COLORS:
@@ -323,6 +327,7 @@ class MESSAGES:
         'INVALID_GROWID': "❌ GrowID tidak valid!",
         'PRODUCT_NOT_FOUND': "❌ Produk tidak ditemukan!",
         'INSUFFICIENT_STOCK': "❌ Stock tidak mencukupi!",
+        'STOCK_NOT_FOUND': "❌ Stock tidak ditemukan!",
         'INVALID_PRODUCT_CODE': "❌ Invalid product code format.",
         'PRODUCT_EXISTS': "❌ Product with this code already exists.",
         'CACHE_ERROR': "❌ Error accessing cache. Please try again.",
@@ -447,6 +452,7 @@ class CACHE_TIMEOUT:
     MEDIUM = timedelta(hours=1)       # 1 jam
     LONG = timedelta(days=1)          # 24 jam
     PERMANENT = timedelta(days=3650)  # 10 tahun (effectively permanent)
+    NEGATIVE = timedelta(minutes=1)   # Entry "tidak ditemukan" (negative cache)
 
     @classmethod
     def get_seconds(cls, timeout: timedelta) -> int:
@@ -463,10 +469,41 @@ class CommandCooldown:
 # Database Settings (Existing)
 class Database:
     TIMEOUT = 5
-    MAX_CONNECTIONS = 5
+    CACHE_WARMUP_USERS = 200  # GrowID/balance aktif terakhir yang dimuat ke cache saat startup
+    MAX_CONNECTIONS = 5      # Koneksi idle yang disimpan di pool
+    MAX_OVERFLOW = 10        # Koneksi tambahan saat pool penuh
+    LEAK_THRESHOLD = 30      # Detik sebelum checkout dianggap leak
+    READER_THREADS = 4       # Thread pool untuk query read-only
+    CACHED_STATEMENTS = 256  # Statement cache sqlite3 per koneksi
+    PROFILE_QUERIES = False  # Aktifkan query profiler saat startup
+    SLOW_QUERY_MS = 100      # Threshold slow query (EXPLAIN QUERY PLAN diambil)
+    PROFILER_TOP_N = 20      # Jumlah statement paling lambat yang disimpan
+    WRITE_BATCH_SIZE = 100   # Maksimal job per group commit
+    WRITE_BATCH_WINDOW = 0.005  # Detik menunggu job lain sebelum commit
     RETRY_ATTEMPTS = 3
     RETRY_DELAY = 1
     BACKUP_INTERVAL = 86400  # 24 hours
+    BACKUP_RETENTION = 7     # Jumlah snapshot yang disimpan
+    BACKUP_PAGES = 256       # Halaman per step backup online
+    BACKUP_MAX_RESTARTS = 3  # Restart karena write sebelum salin sekaligus
+    WAL_CHECK_INTERVAL = 60  # Detik antar pengecekan ukuran WAL
+    WAL_PASSIVE_MB = 4       # WAL di atas ini -> checkpoint PASSIVE
+    WAL_TRUNCATE_MB = 64     # WAL di atas ini (atau saat sepi) -> checkpoint TRUNCATE
+    VACUUM_INTERVAL = 900    # Detik antar incremental vacuum
+    VACUUM_PAGES = 1024      # Halaman freelist yang dilepas per run
+    VACUUM_MIN_FREE_PAGES = 256  # Freelist minimal sebelum vacuum dijalankan
+    QUIET_WRITES_PER_MIN = 30    # Write queue di bawah ini dianggap sepi
+    OPTIMIZE_INTERVAL = 3600 # Detik antar PRAGMA optimize
+    ARCHIVE_INTERVAL = 3600  # Detik antar run retention/arsip
+    ARCHIVE_BATCH_SIZE = 2000    # Row per batch arsip
+    ARCHIVE_SEARCH_MAX_FILES = 24    # File arsip maksimal yang dibuka per pencarian
+    RETENTION_DAYS = {       # Umur row (hari) sebelum dipindah ke arsip; 0 = simpan
+        'activity_logs': 30,
+        'transactions': 365,
+        'admin_logs': 180,
+        'user_activity': 90,
+        'welcome_logs': 30
+    }
 
 # Paths Configuration (Existing)
 class PATHS:
@@ -474,6 +511,7 @@ class PATHS:
     LOGS = "logs/"
     DATABASE = "database.db"
     BACKUP = "backups/"
+    ARCHIVE = "archives/"
     TEMP = "temp/"
 
 # Logging Configuration (Existing)
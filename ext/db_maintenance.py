@@ -0,0 +1,394 @@
+"""
+Database Maintenance
+Author: fdyytu
+Created at: 2026-10-18 07:05:00 UTC
+
+Background task untuk shop.db:
+- snapshot online terkompresi setiap Database.BACKUP_INTERVAL
+- wal_checkpoint PASSIVE/TRUNCATE berdasarkan ukuran file WAL
+- incremental vacuum saat write queue sepi
+- PRAGMA optimize periodik
+- retention: row log lama dipindah ke arsip bulanan (db_archive)
+Pekerjaan blocking dijalankan di thread terpisah agar event loop tetap jalan.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from discord.ext import commands, tasks
+
+import database
+import db_archive
+import db_backup
+from .constants import Database as DatabaseSettings, COG_LOADED
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+MB = 1024 * 1024
+
+def get_wal_size() -> int:
+    try:
+        return os.path.getsize(f"{database.DB_FILE}-wal")
+    except OSError:
+        return 0
+
+def get_database_stats() -> Dict:
+    """Ukuran file, halaman, freelist dan WAL (blocking)"""
+    with database.connection() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist,
+        'free_percent': round(freelist / page_count * 100, 2) if page_count else 0.0,
+        'db_size': page_size * page_count,
+        'wal_size': get_wal_size(),
+        'auto_vacuum': AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum))
+    }
+
+def checkpoint(mode: str = 'PASSIVE') -> Dict:
+    """
+    Jalankan wal_checkpoint. PASSIVE tidak pernah menunggu; TRUNCATE
+    menunggu reader/writer (busy_timeout) lalu mengosongkan file WAL.
+    """
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Invalid checkpoint mode: {mode}")
+
+    wal_before = get_wal_size()
+    started = time.perf_counter()
+    with database.connection() as conn:
+        busy, wal_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return {
+        'mode': mode,
+        'busy': bool(busy),
+        'wal_frames': wal_frames,
+        'checkpointed': checkpointed,
+        'wal_before': wal_before,
+        'wal_after': get_wal_size(),
+        'seconds': round(time.perf_counter() - started, 3),
+        'at': datetime.now(timezone.utc)
+    }
+
+def incremental_vacuum(pages: int) -> Dict:
+    """Lepaskan maksimal `pages` halaman freelist ke filesystem"""
+    started = time.perf_counter()
+    with database.connection() as conn:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # execute() hanya menjalankan satu step (satu halaman) untuk pragma ini,
+        # executescript menjalankannya sampai selesai
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        'freed_pages': before - after,
+        'freelist_count': after,
+        'seconds': round(time.perf_counter() - started, 3),
+        'at': datetime.now(timezone.utc)
+    }
+
+def enable_incremental_vacuum() -> Dict:
+    """
+    Ubah auto_vacuum ke INCREMENTAL. Mode ini hanya bisa diganti lewat
+    VACUUM penuh, yang menahan writer selama berjalan; panggil saat sepi.
+    """
+    started = time.perf_counter()
+    conn = database.get_pool().connect()
+    try:
+        conn.isolation_level = None
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        'auto_vacuum': AUTO_VACUUM_MODES.get(mode, str(mode)),
+        'seconds': round(time.perf_counter() - started, 3),
+        'at': datetime.now(timezone.utc)
+    }
+
+def optimize() -> Dict:
+    """PRAGMA optimize dengan analysis_limit agar ANALYZE tetap murah"""
+    started = time.perf_counter()
+    with database.connection() as conn:
+        conn.execute("PRAGMA analysis_limit = 400")
+        try:
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.execute("PRAGMA analysis_limit = 0")
+    return {
+        'seconds': round(time.perf_counter() - started, 3),
+        'at': datetime.now(timezone.utc)
+    }
+
+class BackupProgress:
+    """Progress callback thread-safe yang juga mencatat throughput"""
+
+    def __init__(self, name: str, logger: logging.Logger, log_every: float = 25.0):
+        self.name = name
+        self.logger = logger
+        self.log_every = log_every
+        self.copied = 0
+        self.total = 0
+        self.started = time.perf_counter()
+        self._next_log = log_every
+
+    @property
+    def percent(self) -> float:
+        return self.copied / self.total * 100 if self.total else 0.0
+
+    def __call__(self, copied: int, total: int):
+        self.copied, self.total = copied, total
+        if self.percent >= self._next_log:
+            elapsed = time.perf_counter() - self.started
+            self.logger.info(
+                f"{self.name}: {copied}/{total} pages ({self.percent:.0f}%) "
+                f"in {elapsed:.2f}s"
+            )
+            while self._next_log <= self.percent:
+                self._next_log += self.log_every
+
+class DatabaseMaintenance(commands.Cog):
+    """Backup dan maintenance database di background"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.logger = logging.getLogger("DatabaseMaintenance")
+        self._backup_lock = asyncio.Lock()
+        self.last_backup: Optional[Dict] = None
+        self.last_checkpoint: Optional[Dict] = None
+        self.last_vacuum: Optional[Dict] = None
+        self.last_optimize: Optional[Dict] = None
+        self.last_archive: Optional[Dict] = None
+        self.writes_per_min: Optional[float] = None
+        self._write_sample: Optional[tuple] = None
+
+    async def cog_load(self):
+        self.backup_task.start()
+        self.checkpoint_task.start()
+        self.vacuum_task.start()
+        self.optimize_task.start()
+        self.archive_task.start()
+
+    async def cog_unload(self):
+        self.backup_task.cancel()
+        self.checkpoint_task.cancel()
+        self.vacuum_task.cancel()
+        self.optimize_task.cancel()
+        self.archive_task.cancel()
+
+    @property
+    def backup_running(self) -> bool:
+        return self._backup_lock.locked()
+
+    async def run_in_thread(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def create_backup(self, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Buat snapshot di thread terpisah lalu jalankan retention"""
+        if self._backup_lock.locked():
+            raise db_backup.BackupError("A backup or restore is already running")
+
+        async with self._backup_lock:
+            progress = progress or BackupProgress("Backup", self.logger)
+            result = await self.run_in_thread(db_backup.create_snapshot, progress)
+            result['pruned'] = await self.run_in_thread(db_backup.prune_snapshots)
+            self.last_backup = result
+            return result
+
+    async def restore_backup(self, name: str, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Restore snapshot di thread terpisah dan kosongkan cache"""
+        if self._backup_lock.locked():
+            raise db_backup.BackupError("A backup or restore is already running")
+
+        async with self._backup_lock:
+            progress = progress or BackupProgress("Restore", self.logger)
+            result = await self.run_in_thread(db_backup.restore_snapshot, name, progress)
+
+        # Isi cache berasal dari database sebelum restore
+        if hasattr(self.bot, 'cache_manager'):
+            await self.bot.cache_manager.clear_all()
+        return result
+
+    @tasks.loop(seconds=DatabaseSettings.BACKUP_INTERVAL)
+    async def backup_task(self):
+        """Snapshot periodik"""
+        try:
+            snapshots = await self.run_in_thread(db_backup.list_snapshots)
+            if snapshots:
+                age = (datetime.now(timezone.utc) - snapshots[0]['created_at']).total_seconds()
+                # Restart bot tidak perlu memicu snapshot baru
+                if age < DatabaseSettings.BACKUP_INTERVAL * 0.9:
+                    return
+
+            await self.create_backup()
+        except db_backup.BackupError as e:
+            self.logger.error(f"Scheduled backup failed: {e}")
+        except Exception as e:
+            self.logger.error(f"Error in backup task: {e}")
+
+    @backup_task.before_loop
+    async def before_backup_task(self):
+        await self.bot.wait_until_ready()
+
+    # WAL, vacuum dan optimize
+
+    def _sample_write_rate(self):
+        """Hitung job write queue per menit sejak sampel sebelumnya"""
+        jobs = database.get_write_queue().get_stats()['jobs']
+        now = time.monotonic()
+        if self._write_sample is not None:
+            last_jobs, last_at = self._write_sample
+            elapsed = now - last_at
+            if elapsed > 0:
+                self.writes_per_min = (jobs - last_jobs) * 60 / elapsed
+        self._write_sample = (jobs, now)
+
+    @property
+    def is_quiet(self) -> bool:
+        return (
+            self.writes_per_min is not None
+            and self.writes_per_min < DatabaseSettings.QUIET_WRITES_PER_MIN
+        )
+
+    async def run_checkpoint(self, mode: str) -> Dict:
+        result = await self.run_in_thread(checkpoint, mode)
+        self.last_checkpoint = result
+        if mode == 'TRUNCATE' and result['busy']:
+            self.logger.warning(
+                f"TRUNCATE checkpoint could not complete "
+                f"({result['checkpointed']}/{result['wal_frames']} frames)"
+            )
+        else:
+            self.logger.info(
+                f"{mode} checkpoint: {result['checkpointed']}/{result['wal_frames']} frames, "
+                f"WAL {result['wal_before'] / MB:.1f}MB -> {result['wal_after'] / MB:.1f}MB "
+                f"in {result['seconds']:.2f}s"
+            )
+        return result
+
+    async def run_vacuum(self) -> Optional[Dict]:
+        """Incremental vacuum; konversi auto_vacuum dulu jika belum INCREMENTAL"""
+        stats = await self.run_in_thread(get_database_stats)
+
+        if stats['auto_vacuum'] != 'incremental':
+            if self._backup_lock.locked():
+                return None
+            async with self._backup_lock:
+                self.logger.info(
+                    f"Converting database to incremental auto_vacuum "
+                    f"({stats['db_size'] / MB:.1f}MB)"
+                )
+                result = await self.run_in_thread(enable_incremental_vacuum)
+            result['freed_pages'] = stats['freelist_count']
+        elif stats['freelist_count'] < DatabaseSettings.VACUUM_MIN_FREE_PAGES:
+            return None
+        else:
+            result = await self.run_in_thread(incremental_vacuum, DatabaseSettings.VACUUM_PAGES)
+
+        self.last_vacuum = result
+        self.logger.info(
+            f"Vacuum released {result['freed_pages']} pages in {result['seconds']:.2f}s"
+        )
+        return result
+
+    async def run_optimize(self) -> Dict:
+        result = await self.run_in_thread(optimize)
+        self.last_optimize = result
+        self.logger.debug(f"PRAGMA optimize finished in {result['seconds']:.3f}s")
+        return result
+
+    async def run_archive(self) -> Dict:
+        """Pindahkan row di luar retention ke arsip bulanan"""
+        results = await self.run_in_thread(db_archive.archive_all)
+        result = {
+            'tables': {r['table']: r['rows'] for r in results},
+            'rows': sum(r['rows'] for r in results),
+            'seconds': round(sum(r['seconds'] for r in results), 3),
+            'at': datetime.now(timezone.utc)
+        }
+        self.last_archive = result
+        if result['rows']:
+            self.logger.info(f"Archived {result['rows']} rows in {result['seconds']:.2f}s")
+        return result
+
+    async def get_stats(self) -> Dict:
+        stats = await self.run_in_thread(get_database_stats)
+        stats.update({
+            'writes_per_min': self.writes_per_min,
+            'quiet': self.is_quiet,
+            'last_backup': self.last_backup,
+            'last_checkpoint': self.last_checkpoint,
+            'last_vacuum': self.last_vacuum,
+            'last_optimize': self.last_optimize,
+            'last_archive': self.last_archive
+        })
+        return stats
+
+    @tasks.loop(seconds=DatabaseSettings.WAL_CHECK_INTERVAL)
+    async def checkpoint_task(self):
+        """Checkpoint WAL sesuai ukurannya"""
+        try:
+            self._sample_write_rate()
+            wal_size = get_wal_size()
+
+            if wal_size >= DatabaseSettings.WAL_TRUNCATE_MB * MB:
+                mode = 'TRUNCATE'
+            elif wal_size >= DatabaseSettings.WAL_PASSIVE_MB * MB:
+                # Saat sepi sekalian kembalikan file WAL ke nol
+                mode = 'TRUNCATE' if self.is_quiet else 'PASSIVE'
+            else:
+                return
+
+            await self.run_checkpoint(mode)
+        except Exception as e:
+            self.logger.error(f"Error in checkpoint task: {e}")
+
+    @tasks.loop(seconds=DatabaseSettings.VACUUM_INTERVAL)
+    async def vacuum_task(self):
+        """Incremental vacuum saat write queue sepi"""
+        try:
+            if not self.is_quiet or self.backup_running:
+                return
+            await self.run_vacuum()
+        except Exception as e:
+            self.logger.error(f"Error in vacuum task: {e}")
+
+    @tasks.loop(seconds=DatabaseSettings.OPTIMIZE_INTERVAL)
+    async def optimize_task(self):
+        """Perbarui statistik planner untuk tabel yang berubah"""
+        try:
+            await self.run_optimize()
+        except Exception as e:
+            self.logger.error(f"Error in optimize task: {e}")
+
+    @tasks.loop(seconds=DatabaseSettings.ARCHIVE_INTERVAL)
+    async def archive_task(self):
+        """Retention tabel log; halaman yang kosong dilepas oleh vacuum_task"""
+        try:
+            await self.run_archive()
+        except db_archive.ArchiveError as e:
+            self.logger.error(f"Scheduled archive failed: {e}")
+        except Exception as e:
+            self.logger.error(f"Error in archive task: {e}")
+
+    @checkpoint_task.before_loop
+    @vacuum_task.before_loop
+    @optimize_task.before_loop
+    @archive_task.before_loop
+    async def before_maintenance_task(self):
+        await self.bot.wait_until_ready()
+
+async def setup(bot):
+    """Setup DatabaseMaintenance cog"""
+    if not hasattr(bot, COG_LOADED['DB_MAINTENANCE']):
+        await bot.add_cog(DatabaseMaintenance(bot))
+        setattr(bot, COG_LOADED['DB_MAINTENANCE'], True)
+        logging.info(f'DatabaseMaintenance cog loaded at {datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")} UTC')
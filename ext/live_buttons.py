@@ -35,7 +35,7 @@ from .constants import (
     Balance
 )
 
-from .base_handler import BaseLockHandler
+from .base_handler import BaseLockHandler, LockRegistry
 from .cache_manager import CacheManager
 from .product_manager import ProductManagerService
 from .balance_manager import BalanceManagerService
@@ -242,38 +242,17 @@ class ShopView(View):
         self.admin_service = AdminService(bot)
         self.cache_manager = CacheManager()
         self.logger = logging.getLogger("ShopView")
-        self._interaction_locks = {}
-        self._last_cleanup = datetime.utcnow()
-
-    async def _cleanup_locks(self):
-        """Cleanup old locks periodically"""
-        now = datetime.utcnow()
-        if (now - self._last_cleanup).total_seconds() > 300:  # Every 5 minutes
-            self._interaction_locks.clear()
-            self._last_cleanup = now
+        # Lock per interaction dibuang sendiri setelah dilepas
+        self._interaction_locks = LockRegistry("ShopView.interactions")
 
     async def _acquire_interaction_lock(self, interaction_id: str) -> bool:
-        await self._cleanup_locks()
-
-        if interaction_id not in self._interaction_locks:
-            self._interaction_locks[interaction_id] = asyncio.Lock()
-
         try:
-            await asyncio.wait_for(
-                self._interaction_locks[interaction_id].acquire(),
-                timeout=3.0
-            )
-            return True
-        except:
+            return await self._interaction_locks.acquire(interaction_id, timeout=3.0)
+        except Exception:
             return False
 
     def _release_interaction_lock(self, interaction_id: str):
-        if interaction_id in self._interaction_locks:
-            try:
-                if self._interaction_locks[interaction_id].locked():
-                    self._interaction_locks[interaction_id].release()
-            except:
-                pass
+        self._interaction_locks.release(interaction_id)
 
     @discord.ui.button(
         style=discord.ButtonStyle.primary,
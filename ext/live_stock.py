@@ -161,7 +161,7 @@ class LiveStockManager(BaseLockHandler):
                                     self.logger.error(f"Product code not found in data: {str(product)}")
                                     continue
 
-                                stock_cache_key = f'stock_count_{product_code}'
+                                stock_cache_key = self.product_service.stock_cache_key(product_code, 'count')
                                 stock_count = await self.cache_manager.get(stock_cache_key)
                             except Exception as e:
                                 self.logger.error(f"Error accessing product code: {str(e)} for product: {str(product)}")
@@ -300,7 +300,7 @@ class LiveStockManager(BaseLockHandler):
 
             patterns = [
                 'live_stock_*',
-                'stock_count_*',
+                'stock_*',
                 'all_products_display'
             ]
             for pattern in patterns:
@@ -5,6 +5,7 @@ Created at: 2025-03-07 18:04:56 UTC
 Last Modified: 2025-03-15 12:07:52 UTC
 """
 
+import json
 import logging
 import asyncio
 from typing import Dict, List, Optional, Any
@@ -23,9 +24,11 @@ from .constants import (
     COLORS,
     NOTIFICATION_CHANNELS
 )
-from database import get_connection
+from db_executor import DatabaseExecutor
+import queries
 from .base_handler import BaseLockHandler
-from .cache_manager import CacheManager
+from .cache_manager import CacheManager, NEGATIVE
+from .stock_queue import StockReservationQueue
 
 class ProductManagerResponse:
     """Response handler untuk semua operasi product manager"""
@@ -160,7 +163,7 @@ class ProductCallbackManager:
             'product_created': [],
             'product_updated': [],
             'stock_added': [],
-            'stock_updated': [],
+            'stock_updated': [],   # (product_code, stock_ids, status)
             'stock_sold': [],
             'world_updated': [],
             'error': []
@@ -196,6 +199,8 @@ class ProductManagerService(BaseLockHandler):
             self.bot = bot
             self.logger = logging.getLogger("ProductManagerService")
             self.cache_manager = CacheManager()
+            self.db = DatabaseExecutor()
+            self.stock_queue = StockReservationQueue(self.db)
             self.callback_manager = ProductCallbackManager()
             self.setup_default_callbacks()
             self.initialized = True
@@ -249,10 +254,29 @@ class ProductManagerService(BaseLockHandler):
         self.callback_manager.register('stock_added', notify_stock_added)
         self.callback_manager.register('stock_sold', notify_stock_sold)
 
+    @staticmethod
+    def stock_cache_name(product_code: str) -> str:
+        return f"stock_{product_code}"
+
+    def stock_cache_key(self, product_code: str, key: str) -> str:
+        """
+        Key cache stock (list per quantity, stock count) di bawah generasi
+        produk; bump_generation di add_stock/update_stock_status
+        menginvalidasi semuanya sekaligus
+        """
+        return self.cache_manager.versioned_key(self.stock_cache_name(product_code), key)
+
+    @staticmethod
+    def product_cache_key(code: str) -> str:
+        # Lookup produk case-insensitive (COLLATE NOCASE), key cache juga
+        return f"product_{code.lower()}"
+
     async def get_product(self, code: str) -> ProductManagerResponse:
         """Get product dengan info lengkap"""
-        cache_key = f"product_{code}"
+        cache_key = self.product_cache_key(code)
         cached = await self.cache_manager.get(cache_key)
+        if cached is NEGATIVE:
+            return ProductManagerResponse.error(MESSAGES.ERROR['PRODUCT_NOT_FOUND'])
         if cached:
             response = ProductManagerResponse.success(cached)
             response.set_product_info(
@@ -264,16 +288,10 @@ class ProductManagerService(BaseLockHandler):
             return response
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "SELECT * FROM products WHERE code = ? COLLATE NOCASE",
-                (code,)
-            )
-            
-            result = cursor.fetchone()
+            result = await self.db.fetchone(queries.GET_PRODUCT, (code,))
             if not result:
+                # Kode salah ketik di PurchaseModal cukup sekali ke database
+                await self.cache_manager.set_negative(cache_key)
                 return ProductManagerResponse.error(MESSAGES.ERROR['PRODUCT_NOT_FOUND'])
 
             product = dict(result)
@@ -301,51 +319,40 @@ class ProductManagerService(BaseLockHandler):
         except Exception as e:
             self.logger.error(f"Error getting product: {e}")
             return ProductManagerResponse.error(str(e))
-        finally:
-            if conn:
-                conn.close()
 
     async def get_all_products(self) -> ProductManagerResponse:
         """Get all products dengan stock count"""
-        cached = await self.cache_manager.get("all_products")
-        if cached:
-            return ProductManagerResponse.success(cached)
-
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM products ORDER BY code")
-            
-            products = []
-            for row in cursor.fetchall():
-                product = dict(row)
-                stock_count = await self._get_stock_count_internal(product['code'])
-                
-                response = ProductManagerResponse.success(product)
-                response.set_product_info(
-                    code=product['code'],
-                    name=product['name'],
-                    price=product['price'],
-                    description=product.get('description')
-                )
-                response.set_stock_info(count=stock_count)
-                products.append(response.to_dict())
-            
-            await self.cache_manager.set(
+            products = await self.cache_manager.get_or_load(
                 "all_products",
-                products,
-                expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
+                self._load_all_products,
+                ttl=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
             )
-            
             return ProductManagerResponse.success(products)
 
         except Exception as e:
             self.logger.error(f"Error getting all products: {e}")
             return ProductManagerResponse.error(str(e))
-        finally:
-            if conn:
-                conn.close()
+
+    async def _load_all_products(self, stock_counts: Optional[Dict[str, int]] = None) -> List[Dict]:
+        """Loader all_products untuk cache; dijalankan satu kali per miss"""
+        rows = await self.db.fetchall(queries.ALL_PRODUCTS)
+        if stock_counts is None:
+            stock_counts = await self._get_stock_counts()
+
+        products = []
+        for row in rows:
+            product = dict(row)
+            response = ProductManagerResponse.success(product)
+            response.set_product_info(
+                code=product['code'],
+                name=product['name'],
+                price=product['price'],
+                description=product.get('description')
+            )
+            response.set_stock_info(count=stock_counts.get(product['code'], 0))
+            products.append(response.to_dict())
+        return products
 
     async def create_product(self, code: str, name: str, price: int, description: str = None) -> ProductManagerResponse:
         """Create product baru"""
@@ -362,19 +369,11 @@ class ProductManagerService(BaseLockHandler):
             if existing.success:
                 return ProductManagerResponse.error(f"Product with code '{code}' already exists")
 
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                """
-                INSERT INTO products (code, name, price, description)
-                VALUES (?, ?, ?, ?)
-                """,
+            await self.db.execute(
+                queries.INSERT_PRODUCT,
                 (code, name, price, description)
             )
             
-            conn.commit()
-            
             product = {
                 'code': code,
                 'name': name,
@@ -386,9 +385,9 @@ class ProductManagerService(BaseLockHandler):
             response.set_product_info(code, name, price, description)
             response.set_stock_info(count=0)
             
-            # Update cache
+            # Update cache (menggantikan negative cache dari get_product)
             await self.cache_manager.set(
-                f"product_{code}",
+                self.product_cache_key(code),
                 product,
                 expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.MEDIUM)
             )
@@ -401,12 +400,8 @@ class ProductManagerService(BaseLockHandler):
 
         except Exception as e:
             self.logger.error(f"Error creating product: {e}")
-            if conn:
-                conn.rollback()
             return ProductManagerResponse.error(str(e))
         finally:
-            if conn:
-                conn.close()
             self.release_lock(f"product_create_{code}")
 
     async def add_stock(self, product_code: str, content: str, added_by: str) -> ProductManagerResponse:
@@ -438,36 +433,22 @@ class ProductManagerService(BaseLockHandler):
                 return ProductManagerResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
 
             try:
-                conn = get_connection()
-                cursor = conn.cursor()
-                
                 # Check duplicates
-                cursor.execute(
-                    """
-                    SELECT id FROM stock 
-                    WHERE product_code = ? AND content = ? 
-                    AND status != ?
-                    """,
-                    (product_code, content, Status.DELETED.value)
+                duplicate = await self.db.fetchone(
+                    queries.STOCK_DUPLICATE,
+                    (product_code, content)
                 )
                 
-                if cursor.fetchone():
+                if duplicate:
                     return ProductManagerResponse.error("Duplicate stock content detected")
                 
-                cursor.execute(
-                    """
-                    INSERT INTO stock (product_code, content, added_by, status)
-                    VALUES (?, ?, ?, ?)
-                    """,
+                await self.db.execute(
+                    queries.INSERT_STOCK,
                     (product_code, content, added_by, Status.AVAILABLE.value)
                 )
                 
-                conn.commit()
-                
                 # Update caches
-                await self.cache_manager.delete(f"stock_count_{product_code}")
-                for i in range(1, Stock.MAX_ITEMS + 1):
-                    await self.cache_manager.delete(f"stock_{product_code}_q{i}")
+                self.cache_manager.bump_generation(self.stock_cache_name(product_code))
                 
                 # Get updated stock count
                 new_count = await self._get_stock_count_internal(product_code)
@@ -495,13 +476,7 @@ class ProductManagerService(BaseLockHandler):
                 
                 return response
 
-            except Exception as e:
-                if conn:
-                    conn.rollback()
-                raise e
             finally:
-                if conn:
-                    conn.close()
                 self.release_lock(lock_key)
 
         except Exception as e:
@@ -513,7 +488,7 @@ class ProductManagerService(BaseLockHandler):
         if quantity < 1:
             return ProductManagerResponse.error(MESSAGES.ERROR['INVALID_AMOUNT'])
             
-        cache_key = f"stock_{product_code}_q{quantity}"
+        cache_key = self.stock_cache_key(product_code, f"q{quantity}")
         cached = await self.cache_manager.get(cache_key)
         if cached:
             response = ProductManagerResponse.success(cached)
@@ -529,22 +504,13 @@ class ProductManagerService(BaseLockHandler):
             return ProductManagerResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, content, added_at
-                FROM stock
-                WHERE product_code = ? AND status = ?
-                ORDER BY added_at ASC
-                LIMIT ?
-            """, (product_code, Status.AVAILABLE.value, quantity))
+            rows = await self.db.fetchall(queries.AVAILABLE_STOCK, (product_code, quantity))
             
             stock_items = [{
                 'id': row['id'],
                 'content': row['content'],
                 'added_at': row['added_at']
-            } for row in cursor.fetchall()]
+            } for row in rows]
 
             await self.cache_manager.set(
                 cache_key, 
@@ -564,8 +530,6 @@ class ProductManagerService(BaseLockHandler):
             self.logger.error(f"Error getting available stock: {e}")
             return ProductManagerResponse.error(str(e))
         finally:
-            if conn:
-                conn.close()
             self.release_lock(f"stock_get_{product_code}")
 
     async def update_stock_status(
@@ -574,166 +538,200 @@ class ProductManagerService(BaseLockHandler):
         status: str,
         buyer_id: str = None
     ) -> ProductManagerResponse:
-        """Update stock status dengan proper locking"""
+        """Update status satu stock; lihat update_stock_status_many"""
+        return await self.update_stock_status_many([stock_id], status, buyer_id)
+
+    async def update_stock_status_many(
+        self,
+        stock_ids: List[int],
+        status: str,
+        buyer_id: str = None
+    ) -> ProductManagerResponse:
+        """
+        Update status banyak stock dengan satu UPDATE dan satu commit.
+
+        Cache stock tiap produk diinvalidasi sekali (bump_generation);
+        stock_updated (dengan semua id) dan stock_sold (dengan quantity
+        seluruh batch) dipicu sekali per produk.
+        Id yang tidak ada dilewati; error jika tidak ada satu pun yang cocok.
+        """
         if status not in [s.value for s in Status]:
             return ProductManagerResponse.error(f"Invalid status: {status}")
-            
-        lock = await self.acquire_lock(f"stock_update_{stock_id}")
-        if not lock:
-            return ProductManagerResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
+
+        stock_ids = list(dict.fromkeys(stock_ids))
+        if not stock_ids:
+            return ProductManagerResponse.error(MESSAGES.ERROR['INVALID_AMOUNT'])
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Get product code first for cache invalidation
-            cursor.execute(
-                "SELECT product_code, content FROM stock WHERE id = ?", 
-                (stock_id,)
-            )
-            stock_info = cursor.fetchone()
-            if not stock_info:
+            # buyer_id lama dipertahankan jika tidak diberikan
+            def apply_update(conn):
+                return [
+                    dict(row) for row in queries.execute(
+                        conn,
+                        queries.SET_STOCK_STATUS_MANY,
+                        (status, buyer_id or None, json.dumps(stock_ids))
+                    ).fetchall()
+                ]
+
+            rows = await self.db.transaction(apply_update)
+            if not rows:
                 return ProductManagerResponse.error(MESSAGES.ERROR['STOCK_NOT_FOUND'])
-            
-            product_code = stock_info['product_code']
-            stock_content = stock_info['content']
-            
-            # Get product info
-            product_response = await self.get_product(product_code)
-            if not product_response.success:
-                return product_response
-            
-            update_query = """
-                UPDATE stock 
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-            """
-            params = [status]
-
-            if buyer_id:
-                update_query += ", buyer_id = ?"
-                params.append(buyer_id)
 
-            update_query += " WHERE id = ?"
-            params.append(stock_id)
+            order = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+            rows.sort(key=lambda row: order[row['id']])
+            by_product: Dict[str, List[Dict]] = {}
+            for row in rows:
+                by_product.setdefault(row['product_code'], []).append(
+                    {'id': row['id'], 'content': row['content']}
+                )
 
-            cursor.execute(update_query, params)
-            conn.commit()
-            
-            # Invalidate relevant caches
-            await self.cache_manager.delete(f"stock_count_{product_code}")
-            for i in range(1, Stock.MAX_ITEMS + 1):
-                await self.cache_manager.delete(f"stock_{product_code}_q{i}")
-            
-            # Get updated stock count
-            new_count = await self._get_stock_count_internal(product_code)
-            
-            response = ProductManagerResponse.success(None, "Stock status updated successfully")
-            response.set_product_info(
-                code=product_code,
-                name=product_response.product_name,
-                price=product_response.product_price
-            )
-            response.set_stock_info(
-                count=new_count,
-                items=[{'id': stock_id, 'content': stock_content}],
-                status=status
+            # Invalidate relevant caches; id yang keluar dari status available
+            # juga dibuang dari antrian reservasi agar tidak dibagikan lagi
+            for product_code, product_items in by_product.items():
+                self.cache_manager.bump_generation(self.stock_cache_name(product_code))
+                if status != Status.AVAILABLE.value:
+                    self.stock_queue.discard(product_code, [item['id'] for item in product_items])
+
+            items = [item for product_items in by_product.values() for item in product_items]
+            response = ProductManagerResponse.success(
+                None,
+                f"Stock status updated successfully ({len(rows)}/{len(stock_ids)})"
             )
+            response.set_stock_info(count=None, items=items, status=status)
+
+            # Trigger callbacks: sekali per produk untuk seluruh batch
+            total_price = 0
+            for product_code, product_items in by_product.items():
+                await self.callback_manager.trigger(
+                    'stock_updated',
+                    product_code,
+                    [item['id'] for item in product_items],
+                    status
+                )
+
+                product_response = await self.get_product(product_code)
+                if not product_response.success:
+                    continue
+                total_price += product_response.product_price * len(product_items)
+
+                if len(by_product) == 1:
+                    response.set_product_info(
+                        code=product_code,
+                        name=product_response.product_name,
+                        price=product_response.product_price
+                    )
+                    response.set_stock_info(
+                        count=await self._get_stock_count_internal(product_code),
+                        items=items,
+                        status=status
+                    )
+
+                if status == Status.SOLD.value and buyer_id:
+                    await self.callback_manager.trigger(
+                        'stock_sold',
+                        product_response.data,
+                        buyer_id,
+                        len(product_items)
+                    )
+
             if buyer_id:
                 response.set_transaction_info(
                     buyer_id=buyer_id,
-                    quantity=1,
-                    total_price=product_response.product_price,
+                    quantity=len(items),
+                    total_price=total_price,
                     type='purchase'
                 )
-            
-            # Trigger callbacks
-            await self.callback_manager.trigger('stock_updated', stock_id, status)
-            if status == Status.SOLD.value and buyer_id:
-                await self.callback_manager.trigger(
-                    'stock_sold',
-                    product_response.data,
-                    buyer_id,
-                    1
-                )
-            
+
             return response
 
         except Exception as e:
             self.logger.error(f"Error updating stock status: {e}")
-            if conn:
-                conn.rollback()
             return ProductManagerResponse.error(str(e))
-        finally:
-            if conn:
-                conn.close()
-            self.release_lock(f"stock_update_{stock_id}")
 
     async def _get_stock_count_internal(self, product_code: str) -> int:
         """Internal method untuk get stock count"""
+        result = await self.db.fetchone(queries.STOCK_COUNT, (product_code,))
+        
+        return result['count']
+
+    async def _get_stock_counts(self) -> Dict[str, int]:
+        """Stock available semua produk dalam satu query"""
+        rows = await self.db.fetchall(queries.STOCK_COUNTS)
+        return {row['product_code']: row['count'] for row in rows}
+
+    async def get_stock_count(self, product_code: str) -> ProductManagerResponse:
+        """Get jumlah stock available dengan caching"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) as count 
-                FROM stock 
-                WHERE product_code = ? AND status = ?
-            """, (product_code, Status.AVAILABLE.value))
-            
-            return cursor.fetchone()['count']
-        finally:
-            if conn:
-                conn.close()
+            count = await self.cache_manager.get_or_load(
+                self.stock_cache_key(product_code, 'count'),
+                lambda: self._get_stock_count_internal(product_code),
+                ttl=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
+            )
+            return ProductManagerResponse.success(count)
 
-    async def get_world_info(self) -> ProductManagerResponse:
-        """Get world info dengan caching"""
-        cached = await self.cache_manager.get("world_info")
-        if cached:
-            response = ProductManagerResponse.success(cached)
-            response.set_world_info(
-                world=cached['world'],
-                owner=cached['owner'],
-                bot_name=cached['bot'],
-                status=cached['status']
+        except Exception as e:
+            self.logger.error(f"Error getting stock count: {e}")
+            return ProductManagerResponse.error(str(e))
+
+    async def warm_cache(self) -> Dict[str, int]:
+        """
+        Isi cache katalog setelah startup: all_products, stock count per
+        produk dan world info, masing-masing dengan satu query.
+
+        Returns:
+            Jumlah row yang dimuat per jenis data
+        """
+        ttl = CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
+        stale_for = self.cache_manager.STALE_WHILE_REVALIDATE
+
+        stock_counts = await self._get_stock_counts()
+        products = await self._load_all_products(stock_counts)
+        await self.cache_manager.set("all_products", products, expires_in=ttl, stale_for=stale_for)
+        for product in products:
+            code = product['data']['code']
+            await self.cache_manager.set(
+                self.stock_cache_key(code, 'count'),
+                stock_counts.get(code, 0),
+                expires_in=ttl
             )
-            return response
 
-        lock = await self.acquire_lock("world_info_get")
-        if not lock:
-            return ProductManagerResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
+        world_info = await self.db.fetchone(queries.GET_WORLD_INFO)
+        if world_info:
+            await self.cache_manager.set("world_info", dict(world_info), expires_in=ttl, stale_for=stale_for)
+
+        return {
+            'products': len(products),
+            'stock_counts': len(products),
+            'world_info': 1 if world_info else 0
+        }
+
+    async def get_world_info(self) -> ProductManagerResponse:
+        """Get world info dengan caching dan request coalescing"""
+        async def load() -> Optional[Dict]:
+            result = await self.db.fetchone(queries.GET_WORLD_INFO)
+            return dict(result) if result else None
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM world_info WHERE id = 1")
-            result = cursor.fetchone()
-            
-            if result:
-                info = dict(result)
-                await self.cache_manager.set(
-                    "world_info", 
-                    info,
-                    expires_in=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
-                )
-                
-                response = ProductManagerResponse.success(info)
-                response.set_world_info(
-                    world=info['world'],
-                    owner=info['owner'],
-                    bot_name=info['bot'],
-                    status=info['status']
-                )
-                return response
-                
-            return ProductManagerResponse.error(MESSAGES.ERROR['WORLD_INFO_NOT_FOUND'])
+            info = await self.cache_manager.get_or_load(
+                "world_info",
+                load,
+                ttl=CACHE_TIMEOUT.get_seconds(CACHE_TIMEOUT.SHORT)
+            )
+            if not info:
+                return ProductManagerResponse.error(MESSAGES.ERROR['WORLD_INFO_NOT_FOUND'])
+
+            response = ProductManagerResponse.success(info)
+            response.set_world_info(
+                world=info['world'],
+                owner=info['owner'],
+                bot_name=info['bot'],
+                status=info['status']
+            )
+            return response
 
         except Exception as e:
             self.logger.error(f"Error getting world info: {e}")
             return ProductManagerResponse.error(str(e))
-        finally:
-            if conn:
-                conn.close()
-            self.release_lock("world_info_get")
 
     async def update_world_info(
         self,
@@ -748,17 +746,7 @@ class ProductManagerService(BaseLockHandler):
             return ProductManagerResponse.error(MESSAGES.ERROR['LOCK_ACQUISITION_FAILED'])
 
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE world_info 
-                SET world = ?, owner = ?, bot = ?, status = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-            """, (world, owner, bot, status))
-            
-            conn.commit()
+            await self.db.execute(queries.UPDATE_WORLD_INFO, (world, owner, bot, status))
             
             # Invalidate cache
             await self.cache_manager.delete("world_info")
@@ -780,12 +768,8 @@ class ProductManagerService(BaseLockHandler):
 
         except Exception as e:
             self.logger.error(f"Error updating world info: {e}")
-            if conn:
-                conn.rollback()
             return ProductManagerResponse.error(str(e))
         finally:
-            if conn:
-                conn.close()
             self.release_lock("world_info_update")
 
     async def cleanup(self):
@@ -806,17 +790,11 @@ class ProductManagerService(BaseLockHandler):
     async def verify_dependencies(self) -> bool:
         """Verify all required dependencies are available"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
+            await self.db.fetchone("SELECT 1")
             return True
         except Exception as e:
             self.logger.error(f"Failed to verify dependencies: {e}")
             return False
-        finally:
-            if conn:
-                conn.close()
 
 class ProductManagerCog(commands.Cog):
     def __init__(self, bot):
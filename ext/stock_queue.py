@@ -0,0 +1,193 @@
+"""
+Stock Reservation Queue
+Author: fdyytu
+Created at: 2026-10-18 09:30:00 UTC
+
+Antrian FIFO in-memory per produk berisi id stock yang masih available.
+Pembelian yang berjalan bersamaan mengambil id yang berbeda (popleft O(1))
+sebelum masuk ke write queue, jadi tidak ada dua pembeli yang berebut row
+stock paling tua yang sama.
+
+Tabel stock tetap sumber kebenaran: reservasi hanya ada di memory dan status
+baru berubah saat transaksi pembelian commit dengan guard status='available'.
+Jika bot mati sebelum commit, row tidak pernah berubah dan antrian dibangun
+ulang secara lazy dari database. Reservasi yang tidak pernah di-commit atau
+di-release (task mati di tengah jalan) dikembalikan ke antrian setelah
+Stock.RESERVATION_TIMEOUT detik.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Set
+
+from db_executor import DatabaseExecutor
+import queries
+from .base_handler import LockRegistry
+from .constants import Stock, TransactionError
+
+class StaleReservation(TransactionError):
+    """Raised when reserved stock is no longer available in the database"""
+    def __init__(self, stale_ids: Iterable[int]):
+        self.stale_ids = sorted(stale_ids)
+        super().__init__(f"Stock no longer available: {self.stale_ids}")
+
+class _ProductQueue:
+    __slots__ = ('items', 'queued', 'reserved')
+
+    def __init__(self):
+        # Id yang dibuang (discard) tetap di deque dan dilewati saat pop;
+        # `queued` adalah isi antrian yang sebenarnya
+        self.items: Deque[int] = deque()
+        self.queued: Set[int] = set()
+        # id -> waktu reserve (monotonic); urutan insert = urutan umur
+        self.reserved: Dict[int, float] = {}
+
+class StockReservationQueue:
+    """
+    Reservasi id stock per product code.
+
+    reserve() -> transaksi pembelian -> commit() jika berhasil, release()
+    jika gagal, discard() untuk id yang ternyata sudah tidak available.
+    """
+
+    def __init__(self, db: DatabaseExecutor, batch_size: int = None, timeout: float = None):
+        self.db = db
+        self.batch_size = batch_size or Stock.RESERVE_BATCH_SIZE
+        self.timeout = timeout or Stock.RESERVATION_TIMEOUT
+        self.logger = logging.getLogger("StockReservationQueue")
+        self._queues: Dict[str, _ProductQueue] = {}
+        self._refill_locks = LockRegistry("StockReservationQueue")
+        self.stats = {
+            'reserved': 0,
+            'committed': 0,
+            'released': 0,
+            'discarded': 0,
+            'recovered': 0,
+            'refills': 0,
+            'refill_rows': 0
+        }
+
+    def _queue(self, product_code: str) -> _ProductQueue:
+        queue = self._queues.get(product_code)
+        if queue is None:
+            queue = self._queues[product_code] = _ProductQueue()
+        return queue
+
+    def _recover(self, queue: _ProductQueue):
+        """Kembalikan reservasi yang melewati timeout ke depan antrian"""
+        deadline = time.monotonic() - self.timeout
+        expired = []
+        for stock_id, reserved_at in queue.reserved.items():
+            if reserved_at > deadline:
+                break
+            expired.append(stock_id)
+        for stock_id in reversed(expired):
+            del queue.reserved[stock_id]
+            if stock_id not in queue.queued:
+                queue.items.appendleft(stock_id)
+                queue.queued.add(stock_id)
+        if expired:
+            self.stats['recovered'] += len(expired)
+            self.logger.warning(f"Recovered {len(expired)} uncommitted stock reservations")
+
+    async def _refill(self, product_code: str, quantity: int):
+        """Tambah satu batch id available yang belum ada di antrian"""
+        key = f"stock_refill_{product_code}"
+        if not await self._refill_locks.acquire(key, timeout=5.0):
+            return
+        try:
+            queue = self._queue(product_code)
+            if len(queue.queued) >= quantity:
+                return
+
+            # Row yang sudah di antrian/reservasi ikut terbaca, lewati saja
+            limit = max(self.batch_size, quantity) + len(queue.queued) + len(queue.reserved)
+            rows = await self.db.fetchall(queries.AVAILABLE_STOCK, (product_code, limit))
+            added = 0
+            for row in rows:
+                stock_id = row['id']
+                if stock_id in queue.queued or stock_id in queue.reserved:
+                    continue
+                queue.items.append(stock_id)
+                queue.queued.add(stock_id)
+                added += 1
+
+            self.stats['refills'] += 1
+            self.stats['refill_rows'] += added
+        finally:
+            self._refill_locks.release(key)
+
+    async def reserve(self, product_code: str, quantity: int) -> List[int]:
+        """
+        Ambil `quantity` id stock paling tua yang belum direservasi.
+
+        Returns:
+            Daftar id, atau list kosong jika stock tidak cukup
+        """
+        queue = self._queue(product_code)
+        if queue.reserved:
+            self._recover(queue)
+        if len(queue.queued) < quantity:
+            await self._refill(product_code, quantity)
+        # Tidak ada await di bawah ini: cek dan pop atomic terhadap task lain
+        if len(queue.queued) < quantity:
+            return []
+
+        now = time.monotonic()
+        stock_ids = []
+        while len(stock_ids) < quantity:
+            stock_id = queue.items.popleft()
+            if stock_id not in queue.queued:
+                continue  # Sudah di-discard
+            queue.queued.discard(stock_id)
+            queue.reserved[stock_id] = now
+            stock_ids.append(stock_id)
+        self.stats['reserved'] += quantity
+        return stock_ids
+
+    def commit(self, product_code: str, stock_ids: Iterable[int]):
+        """Reservasi sudah tersimpan sebagai sold di database"""
+        queue = self._queues.get(product_code)
+        if queue is None:
+            return
+        for stock_id in stock_ids:
+            if queue.reserved.pop(stock_id, None) is not None:
+                self.stats['committed'] += 1
+
+    def discard(self, product_code: str, stock_ids: Iterable[int]):
+        """
+        Buang id yang di database sudah tidak available, baik yang sedang
+        direservasi maupun yang masih antre (dilewati saat pop). Dipanggil
+        juga oleh update_stock_status_many untuk perubahan di luar pembelian.
+        """
+        queue = self._queues.get(product_code)
+        if queue is None:
+            return
+        for stock_id in stock_ids:
+            if queue.reserved.pop(stock_id, None) is not None or stock_id in queue.queued:
+                queue.queued.discard(stock_id)
+                self.stats['discarded'] += 1
+        # Deque tidak menumpuk id mati tanpa batas
+        if len(queue.items) > 2 * len(queue.queued) + self.batch_size:
+            queue.items = deque(i for i in queue.items if i in queue.queued)
+
+    def release(self, product_code: str, stock_ids: List[int]):
+        """Kembalikan reservasi yang batal ke depan antrian, urutan tetap"""
+        queue = self._queues.get(product_code)
+        if queue is None:
+            return
+        for stock_id in reversed(stock_ids):
+            if queue.reserved.pop(stock_id, None) is None or stock_id in queue.queued:
+                continue
+            queue.items.appendleft(stock_id)
+            queue.queued.add(stock_id)
+            self.stats['released'] += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'products': len(self._queues),
+            'queued': sum(len(q.queued) for q in self._queues.values()),
+            'in_flight': sum(len(q.reserved) for q in self._queues.values())
+        }
@@ -12,6 +12,7 @@ Dependencies:
 - balance_manager.py: For balance operations
 """
 
+import json
 import logging
 import asyncio
 from typing import Optional, Dict, List, Union, Callable, Any
@@ -21,7 +22,6 @@ import discord
 from discord.ext import commands
 
 from .constants import (
-    Status,
     TransactionType,
     Balance,
     TransactionError,
@@ -31,11 +31,13 @@ from .constants import (
     EVENTS,
     NOTIFICATION_CHANNELS
 )
-from database import get_connection
+from db_executor import DatabaseExecutor
+import queries
 from .base_handler import BaseLockHandler
 from .cache_manager import CacheManager
 from .product_manager import ProductManagerService
 from .balance_manager import BalanceManagerService
+from .stock_queue import StaleReservation
 
 class TransactionCallbackManager:
     """Callback manager untuk transaction service"""
@@ -124,6 +126,7 @@ class TransactionManager(BaseLockHandler):
             super().__init__()
             self.bot = bot
             self.logger = logging.getLogger("TransactionManager")
+            self.db = DatabaseExecutor()
             self.cache_manager = CacheManager()
             self.product_manager = ProductManagerService(bot)
             self.balance_manager = BalanceManagerService(bot)
@@ -169,7 +172,16 @@ class TransactionManager(BaseLockHandler):
                                      notify_transaction_failed)
 
     async def process_purchase(self, buyer_id: str, product_code: str, quantity: int = 1) -> Dict:
-        """Process purchase dengan proper coordination"""
+        """
+        Process purchase sebagai satu transaksi database.
+
+        Id stock diambil dari StockReservationQueue sehingga pembeli yang
+        bersamaan tidak berebut row yang sama. Produk, penjualan stock, debit
+        balance dan catatan transaksi dijalankan dalam satu job write queue
+        (BEGIN IMMEDIATE + savepoint), jadi stock basi atau saldo kurang
+        me-rollback semuanya tanpa langkah kompensasi. Reservasi yang gagal
+        dikembalikan ke antrian; cache dan callback baru disentuh setelah commit.
+        """
         if quantity < 1:
             return {'error': MESSAGES.ERROR['INVALID_AMOUNT']}
     
@@ -180,81 +192,102 @@ class TransactionManager(BaseLockHandler):
         try:
             # Get buyer's GrowID
             growid_response = await self.balance_manager.get_growid(buyer_id)
-            if not growid_response.success:  # Gunakan .success karena ini BalanceResponse
+            if not growid_response.success:
                 return {'error': growid_response.error}
-            growid = growid_response.data  # Langsung akses .data
-    
-            # Get product details
+            growid = growid_response.data
+
+            # Code kanonik (lookup NOCASE) untuk key antrian reservasi
             product_response = await self.product_manager.get_product(product_code)
-            if not product_response.success:  # Gunakan .success karena ini ProductResponse
+            if not product_response.success:
                 return {'error': product_response.error}
-            product = product_response.data  # Langsung akses .data
-    
-            # Get available stock
-            stock_response = await self.product_manager.get_available_stock(
-                product_code, 
-                quantity
-            )
-            if not stock_response.success:
-                return {'error': stock_response.error}
-            available_stock = stock_response.data
-    
-            # Calculate total price
-            total_price = product['price'] * quantity
-    
-            # Get and verify balance
-            balance_response = await self.balance_manager.get_balance(growid)
-            if not balance_response.success:  # Gunakan .success karena ini BalanceResponse
-                return {'error': balance_response.error}
-            current_balance = balance_response.data  # Langsung akses .data
-    
-            if total_price > current_balance.total_wl():
-                return {'error': MESSAGES.ERROR['INSUFFICIENT_BALANCE']}
-    
-            # Update stock status via ProductManager
-            stock_update_response = await self.product_manager.update_stock_status(
-                product_code,
-                [item['id'] for item in available_stock[:quantity]],
-                Status.SOLD.value,
-                buyer_id
-            )
-            if not stock_update_response.success:
-                return {'error': stock_update_response.error}
-    
-            # Update balance via BalanceManager
-            balance_update_response = await self.balance_manager.update_balance(
-                growid=growid,
-                wl=-total_price,
-                details=f"Purchase {quantity}x {product['name']}",
-                transaction_type=TransactionType.PURCHASE.value
-            )
-            if not balance_update_response.success:
-                # Rollback stock status if balance update fails
-                await self.product_manager.update_stock_status(
-                    product_code,
-                    [item['id'] for item in available_stock[:quantity]],
-                    Status.AVAILABLE.value,
-                    None
+            code = product_response.data['code']
+
+            def apply_purchase(conn, stock_ids):
+                product = queries.execute(conn, queries.GET_PRODUCT, (code,)).fetchone()
+                if not product:
+                    raise TransactionError(MESSAGES.ERROR['PRODUCT_NOT_FOUND'])
+                product = dict(product)
+                total_price = product['price'] * quantity
+
+                items = queries.execute(
+                    conn,
+                    queries.PURCHASE_SELL_STOCK,
+                    (buyer_id, json.dumps(stock_ids))
+                ).fetchall()
+                if len(items) < len(stock_ids):
+                    raise StaleReservation(set(stock_ids) - {item['id'] for item in items})
+
+                # RETURNING dibaca habis agar statement selesai sebelum commit
+                rows = queries.execute(
+                    conn,
+                    queries.PURCHASE_DEBIT_BALANCE,
+                    (total_price, growid, total_price)
+                ).fetchall()
+                if not rows:
+                    raise TransactionError(MESSAGES.ERROR['INSUFFICIENT_BALANCE'])
+
+                row = rows[0]
+                new_balance = Balance(row['balance_wl'], row['balance_dl'], row['balance_bgl'])
+                old_balance = Balance(new_balance.wl + total_price, new_balance.dl, new_balance.bgl)
+                details = f"Purchase {quantity}x {product['name']}"
+                queries.execute(
+                    conn,
+                    queries.INSERT_TRANSACTION,
+                    (
+                        growid,
+                        TransactionType.PURCHASE.value,
+                        details,
+                        old_balance.format(),
+                        new_balance.format()
+                    )
                 )
-                return {'error': balance_update_response.error}
-    
-            # Prepare success response
+                # RETURNING tidak menjamin urutan; kembalikan urut reservasi (FIFO)
+                order = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+                items = sorted((dict(item) for item in items), key=lambda item: order[item['id']])
+                return product, items, total_price, old_balance, new_balance, details
+
+            stock_queue = self.product_manager.stock_queue
+            # Setiap StaleReservation membuang id mati secara permanen dan
+            # reserve() me-refill dari database, jadi loop ini pasti berhenti
+            while True:
+                stock_ids = await stock_queue.reserve(code, quantity)
+                if not stock_ids:
+                    return {'error': MESSAGES.ERROR['OUT_OF_STOCK']}
+
+                # Job write queue tetap bisa commit walau task ini dibatalkan
+                # (mis. interaction timeout). Settle di-shield dan berjalan
+                # sampai selesai sehingga reservasi, cache dan callback
+                # mengikuti hasil job yang sebenarnya
+                settle = asyncio.ensure_future(
+                    self._settle_purchase(code, growid, buyer_id, quantity, stock_ids, apply_purchase)
+                )
+                settle.add_done_callback(self._log_settle_error)
+                try:
+                    product, items, total_price, old_balance, new_balance, details = \
+                        await asyncio.shield(settle)
+                    break
+                except StaleReservation:
+                    continue  # Id basi sudah dibuang; reservasi ulang
+                except TransactionError as e:
+                    return {'error': str(e)}
+
             return {
                 'success': True,
                 'data': {
+                    'content': [item['content'] for item in items],
                     'product': product,
                     'quantity': quantity,
                     'total_price': total_price,
-                    'content': [item['content'] for item in available_stock[:quantity]],
                     'buyer_id': buyer_id,
                     'growid': growid,
-                    'new_balance': balance_update_response.data.format() if balance_update_response.data else None
+                    'new_balance': new_balance.format()
                 },
                 'message': (
                     f"{MESSAGES.SUCCESS['PURCHASE']}\n"
                     f"Product: {product['name']}\n"
                     f"Quantity: {quantity}x\n"
-                    f"Total paid: {total_price:,} WL"
+                    f"Total paid: {total_price:,} WL\n"
+                    f"New balance: {new_balance.format()}"
                 )
             }
     
@@ -263,108 +296,55 @@ class TransactionManager(BaseLockHandler):
             return {'error': MESSAGES.ERROR['TRANSACTION_FAILED']}
         finally:
             self.release_lock(f"purchase_{buyer_id}_{product_code}")
-
-    async def process_purchase(self, buyer_id: str, product_code: str, quantity: int = 1) -> Dict:
-        """Process purchase dengan proper coordination"""
-        if quantity < 1:
-            return {'error': MESSAGES.ERROR['INVALID_AMOUNT']}
-    
-        lock = await self.acquire_lock(f"purchase_{buyer_id}_{product_code}")
-        if not lock:
-            return {'error': MESSAGES.ERROR['LOCK_ACQUISITION_FAILED']}
-    
+        
+    async def _settle_purchase(self, code: str, growid: str, buyer_id: str, quantity: int,
+                               stock_ids: List[int], apply_purchase: Callable) -> tuple:
+        """Jalankan job pembelian lalu selesaikan reservasi, cache dan callback"""
+        stock_queue = self.product_manager.stock_queue
+        committed = False
         try:
-            # Get buyer's GrowID
-            growid_response = await self.balance_manager.get_growid(buyer_id)
-            if not growid_response.success:  # Gunakan .success untuk BalanceResponse
-                return {'error': growid_response.error}
-            growid = growid_response.data   # Gunakan .data untuk mendapatkan nilai
-    
-            # Get product details
-            product_response = await self.product_manager.get_product(product_code)
-            if not product_response.success:
-                return {'error': product_response.error}
-            product = product_response.data
-    
-            # Get available stock
-            stock_response = await self.product_manager.get_available_stock(
-                product_code, 
-                quantity
-            )
-            if not stock_response.success:
-                return {'error': stock_response.error}
-            available_stock = stock_response.data
-    
-            # Calculate total price
-            total_price = product['price'] * quantity
-    
-            # Get and verify balance
-            balance_response = await self.balance_manager.get_balance(growid)
-            if not balance_response.success:
-                return {'error': balance_response.error}
-            current_balance = balance_response.data
-    
-            if total_price > current_balance.total_wl():
-                return {'error': MESSAGES.ERROR['INSUFFICIENT_BALANCE']}
-    
-            # Update stock status via ProductManager
-            stock_update_response = await self.product_manager.update_stock_status(
-                product_code,
-                [item['id'] for item in available_stock[:quantity]],
-                Status.SOLD.value,
-                buyer_id
-            )
-            if not stock_update_response.success:
-                return {'error': stock_update_response.error}
-    
-            # Update balance via BalanceManager
-            balance_update_response = await self.balance_manager.update_balance(
-                growid=growid,
-                wl=-total_price,
-                details=f"Purchase {quantity}x {product['name']}",
-                transaction_type=TransactionType.PURCHASE.value
-            )
-            if not balance_update_response.success:
-                # Rollback stock status if balance update fails
-                await self.product_manager.update_stock_status(
-                    product_code,
-                    [item['id'] for item in available_stock[:quantity]],
-                    Status.AVAILABLE.value,
-                    None
-                )
-                return {'error': balance_update_response.error}
-    
-            # Format the new balance if available
-            new_balance_str = ""
-            if balance_update_response.data:
-                new_balance_str = f"\nNew balance: {balance_update_response.data.format()}"
-    
-            # Prepare content list
-            content_list = [item['content'] for item in available_stock[:quantity]]
-    
-            return {
-                'success': True,
-                'data': {
-                    'content': content_list,
-                    'product': product,
-                    'quantity': quantity,
-                    'total_price': total_price
-                },
-                'message': (
-                    f"{MESSAGES.SUCCESS['PURCHASE']}\n"
-                    f"Product: {product['name']}\n"
-                    f"Quantity: {quantity}x\n"
-                    f"Total paid: {total_price:,} WL"
-                    f"{new_balance_str}"
-                )
-            }
-    
-        except Exception as e:
-            self.logger.error(f"Error processing purchase: {e}")
-            return {'error': MESSAGES.ERROR['TRANSACTION_FAILED']}
+            result = await self.db.transaction(apply_purchase, stock_ids)
+            committed = True
+        except StaleReservation as e:
+            # Terjual/dihapus di luar antrian
+            stock_queue.discard(code, e.stale_ids)
+            raise
         finally:
-            self.release_lock(f"purchase_{buyer_id}_{product_code}")
-        
+            if committed:
+                stock_queue.commit(code, stock_ids)
+            else:
+                stock_queue.release(code, stock_ids)
+
+        product, items, total_price, old_balance, new_balance, details = result
+
+        # Invalidate cache setelah commit; delete (bukan set) agar commit
+        # balance lain yang selesai lebih dulu tidak tertimpa nilai lama
+        await self.cache_manager.delete(f"balance_{growid}")
+        await self.cache_manager.delete(f"trx_history_{growid}")
+        self.cache_manager.bump_generation(
+            self.product_manager.stock_cache_name(product['code'])
+        )
+
+        # Trigger callbacks
+        await self.balance_manager.callback_manager.trigger(
+            'balance_updated', growid, old_balance, new_balance
+        )
+        await self.balance_manager.callback_manager.trigger(
+            'transaction_added', growid, TransactionType.PURCHASE.value, details
+        )
+        await self.product_manager.callback_manager.trigger(
+            'stock_sold', product, buyer_id, quantity
+        )
+        return result
+
+    def _log_settle_error(self, task: asyncio.Future):
+        # Pemanggil yang dibatalkan tidak lagi membaca hasil settle
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and not isinstance(error, TransactionError):
+            self.logger.error(f"Error settling purchase: {error}")
+
     async def process_withdrawal(
         self, 
         user_id: str, 
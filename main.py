@@ -20,6 +20,7 @@ from discord.ext import commands
 import json
 import logging
 import asyncio
+import time
 import aiohttp
 import sqlite3
 from datetime import datetime, timezone
@@ -45,7 +46,8 @@ from ext.constants import (
 )
 
 # Import database
-from database import setup_database, get_connection
+from database import setup_database, get_connection, close_pool
+from db_executor import DatabaseExecutor
 
 # Import handlers and managers
 from ext.cache_manager import CacheManager
@@ -241,6 +243,9 @@ class StoreBot(commands.Bot):
                 await self.close()
                 return
 
+            # Isi cache sebelum live stock dan tombol mulai melayani interaksi
+            await self.warm_cache()
+
             # Load core features
             logger.info("Loading core features...")
             for ext in EXTENSIONS.FEATURES:
@@ -269,6 +274,33 @@ class StoreBot(commands.Bot):
             logger.critical(f"Failed to load extensions: {e}")
             await self.close()
 
+    async def warm_cache(self):
+        """Preload katalog, world info, maintenance state dan user aktif ke cache"""
+        logger.info("Warming up cache...")
+        started = time.perf_counter()
+        rows = {}
+        try:
+            product_cog = self.get_cog('ProductManagerCog')
+            balance_cog = self.get_cog('BalanceManagerCog')
+            rows.update(await product_cog.product_service.warm_cache())
+            rows.update(await balance_cog.balance_service.warm_cache(Database.CACHE_WARMUP_USERS))
+            # Write-through: cukup dinaikkan dari tabel cache ke memory
+            rows['maintenance'] = 0 if await self.cache_manager.get('maintenance_mode') is None else 1
+        except Exception as e:
+            # Cache kosong tetap berfungsi, hanya interaksi pertama lebih lambat
+            logger.error(f"Cache warm-up failed: {e}")
+
+        elapsed = time.perf_counter() - started
+        self.cache_manager.last_warmup = {
+            'seconds': round(elapsed, 3),
+            'rows': rows,
+            'finished_at': datetime.now(timezone.utc)
+        }
+        logger.info(
+            f"Cache warm-up finished in {elapsed:.2f}s: "
+            + (", ".join(f"{name}={count}" for name, count in rows.items()) or "nothing loaded")
+        )
+
     async def on_ready(self):
         """Called when bot is ready"""
         try:
@@ -325,15 +357,20 @@ class StoreBot(commands.Bot):
     async def close(self):
         """Cleanup before closing"""
         try:
-            # Cleanup tasks
+            # Flush write-behind cache sebelum task dan writer dihentikan
             if hasattr(self, 'cache_manager'):
-                await self.cache_manager.clear_all()
+                await self.cache_manager.close()
 
             # Cancel all tasks
             tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
             [task.cancel() for task in tasks]
 
             await asyncio.gather(*tasks, return_exceptions=True)
+
+            # Selesaikan write yang tersisa lalu tutup semua koneksi database
+            DatabaseExecutor().shutdown()
+            close_pool()
+
             await super().close()
 
         except Exception as e:
@@ -0,0 +1,770 @@
+"""
+Database Migrations
+Author: fdyytu
+Created at: 2026-10-18 05:10:00 UTC
+
+Skema database diversi dengan PRAGMA user_version. Setiap migration
+dijalankan sekali, berurutan, masing-masing dalam satu transaksi yang
+juga menaikkan user_version. Saat startup cukup membaca user_version;
+DDL hanya dijalankan jika skema tertinggal dari SCHEMA_VERSION.
+
+Menambah perubahan skema: tulis fungsi baru dan daftarkan di MIGRATIONS
+dengan version berikutnya. Jangan ubah migration yang sudah dirilis.
+"""
+
+import logging
+import sqlite3
+import time
+from collections import namedtuple
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', ['version', 'description', 'apply'])
+
+def _v1_core_schema(cursor: sqlite3.Cursor):
+    """Skema inti: store, stats, poll, level, music, reminder, welcome, automod dan giveaway"""
+    # 1. Admin System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            growid TEXT PRIMARY KEY,
+            balance_wl INTEGER DEFAULT 0,
+            balance_dl INTEGER DEFAULT 0,
+            balance_bgl INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_growid (
+            discord_id TEXT PRIMARY KEY,
+            growid TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code TEXT NOT NULL,
+            content TEXT NOT NULL UNIQUE,
+            status TEXT DEFAULT 'available' CHECK (status IN ('available', 'sold', 'deleted')),
+            added_by TEXT NOT NULL,
+            buyer_id TEXT,
+            seller_id TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_code) REFERENCES products(code) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            growid TEXT NOT NULL,
+            type TEXT NOT NULL,
+            details TEXT NOT NULL,
+            old_balance TEXT,
+            new_balance TEXT,
+            items_count INTEGER DEFAULT 0,
+            total_price INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS world_info (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            world TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            bot TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bot_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blacklist (
+            growid TEXT PRIMARY KEY,
+            added_by TEXT NOT NULL,
+            reason TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (growid) REFERENCES users(growid) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS admin_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS role_permissions (
+            role_id TEXT PRIMARY KEY,
+            permissions TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_activity (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            discord_id TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (discord_id) REFERENCES user_growid(discord_id)
+        )
+    """)
+
+    # 2. Statistics System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS activity_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            details TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS member_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            member_count INTEGER NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 3. Cache System Table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL,
+            created_at REAL DEFAULT (strftime('%s', 'now')),
+            updated_at REAL DEFAULT (strftime('%s', 'now'))
+        )
+    """)
+
+    # 4. Poll System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS polls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            author_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            options TEXT NOT NULL,
+            end_time DATETIME,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS poll_votes (
+            poll_id INTEGER,
+            user_id TEXT NOT NULL,
+            option_index INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (poll_id) REFERENCES polls (id) ON DELETE CASCADE,
+            UNIQUE (poll_id, user_id)
+        )
+    """)
+
+    # 5. Level System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS levels (
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            xp INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 0,
+            messages INTEGER DEFAULT 0,
+            last_message_time TIMESTAMP,
+            PRIMARY KEY (user_id, guild_id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS level_rewards (
+            guild_id TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            role_id TEXT NOT NULL,
+            PRIMARY KEY (guild_id, level)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS level_settings (
+            guild_id TEXT PRIMARY KEY,
+            min_xp INTEGER DEFAULT 15,
+            max_xp INTEGER DEFAULT 25,
+            cooldown INTEGER DEFAULT 60,
+            announcement_channel TEXT,
+            level_up_message TEXT DEFAULT 'Congratulations {user}! You reached level {level}!',
+            stack_roles BOOLEAN DEFAULT FALSE,
+            ignore_bots BOOLEAN DEFAULT TRUE
+        )
+    """)
+
+    # 6. Music System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS music_settings (
+            guild_id TEXT PRIMARY KEY,
+            default_volume INTEGER DEFAULT 100,
+            vote_skip_ratio FLOAT DEFAULT 0.5,
+            max_queue_size INTEGER DEFAULT 500,
+            max_song_duration INTEGER DEFAULT 7200,
+            dj_role TEXT,
+            music_channel TEXT,
+            announce_songs BOOLEAN DEFAULT TRUE,
+            auto_play BOOLEAN DEFAULT FALSE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS playlists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT,
+            name TEXT,
+            owner_id TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(guild_id, name)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS playlist_songs (
+            playlist_id INTEGER,
+            track_url TEXT,
+            track_title TEXT,
+            added_by TEXT,
+            added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (playlist_id) REFERENCES playlists (id) ON DELETE CASCADE
+        )
+    """)
+
+    # 7. Reminder System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reminder_settings (
+            guild_id TEXT PRIMARY KEY,
+            max_reminders INTEGER DEFAULT 25,
+            max_duration INTEGER DEFAULT 31536000,
+            reminder_channel TEXT,
+            timezone TEXT DEFAULT 'UTC',
+            mention_roles BOOLEAN DEFAULT FALSE,
+            allow_everyone BOOLEAN DEFAULT FALSE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            message TEXT NOT NULL,
+            trigger_time DATETIME NOT NULL,
+            repeat_interval TEXT,
+            last_triggered DATETIME,
+            mentions TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reminder_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            message TEXT NOT NULL,
+            duration TEXT NOT NULL,
+            created_by TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(guild_id, name)
+        )
+    """)
+
+    # 8. Welcome System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS welcome_settings (
+            guild_id TEXT PRIMARY KEY,
+            channel_id TEXT,
+            message TEXT,
+            embed_color INTEGER DEFAULT 3447003,
+            auto_role_id TEXT,
+            verification_required BOOLEAN DEFAULT FALSE,
+            custom_background TEXT,
+            custom_font TEXT
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS welcome_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            action_type TEXT NOT NULL
+        )
+    """)
+
+    # 9. AutoMod System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS automod_settings (
+            guild_id TEXT PRIMARY KEY,
+            enabled BOOLEAN DEFAULT TRUE,
+            spam_threshold INTEGER DEFAULT 5,
+            spam_timeframe INTEGER DEFAULT 5,
+            caps_threshold FLOAT DEFAULT 0.7,
+            caps_min_length INTEGER DEFAULT 10,
+            banned_words TEXT,
+            banned_wildcards TEXT,
+            warn_threshold INTEGER DEFAULT 3,
+            mute_duration INTEGER DEFAULT 10,
+            dj_role TEXT,
+            disabled_channels TEXT
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            warning_type TEXT NOT NULL,
+            reason TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 10. Giveaway System Tables
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS giveaways (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            host_id TEXT NOT NULL,
+            prize TEXT NOT NULL,
+            winners INTEGER DEFAULT 1,
+            entries INTEGER DEFAULT 0,
+            requirements TEXT,
+            end_time DATETIME NOT NULL,
+            ended BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS giveaway_entries (
+            giveaway_id INTEGER,
+            user_id TEXT NOT NULL,
+            entries INTEGER DEFAULT 1,
+            entered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (giveaway_id, user_id),
+            FOREIGN KEY (giveaway_id) REFERENCES giveaways (id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS giveaway_settings (
+            guild_id TEXT PRIMARY KEY,
+            manager_role TEXT,
+            default_duration INTEGER DEFAULT 86400,
+            maximum_duration INTEGER DEFAULT 2592000,
+            maximum_winners INTEGER DEFAULT 20,
+            bypass_roles TEXT,
+            required_roles TEXT,
+            blacklisted_roles TEXT
+        )
+    """)
+
+    # Create indexes for optimization
+    indexes = [
+        # Cache System Indexes
+        ("idx_cache_expiry", "cache(expires_at)"),
+
+        # Admin System Indexes
+        ("idx_user_growid_discord", "user_growid(discord_id)"),
+        ("idx_user_growid_growid", "user_growid(growid)"),
+        ("idx_stock_product_code", "stock(product_code)"),
+        ("idx_stock_status", "stock(status)"),
+        ("idx_stock_content", "stock(content)"),
+        ("idx_transactions_growid", "transactions(growid)"),
+        ("idx_transactions_created", "transactions(created_at)"),
+        ("idx_blacklist_growid", "blacklist(growid)"),
+        ("idx_admin_logs_admin", "admin_logs(admin_id)"),
+        ("idx_admin_logs_created", "admin_logs(created_at)"),
+        ("idx_user_activity_discord", "user_activity(discord_id)"),
+        ("idx_user_activity_type", "user_activity(activity_type)"),
+        ("idx_role_permissions_role", "role_permissions(role_id)"),
+
+        # Stats System Indexes
+        ("idx_activity_logs_guild", "activity_logs(guild_id)"),
+        ("idx_activity_logs_user", "activity_logs(user_id)"),
+        ("idx_activity_logs_type", "activity_logs(activity_type)"),
+        ("idx_activity_logs_timestamp", "activity_logs(timestamp)"),
+        ("idx_member_history_guild", "member_history(guild_id)"),
+        ("idx_member_history_timestamp", "member_history(timestamp)"),
+
+        # Poll System Indexes
+        ("idx_polls_guild", "polls(guild_id)"),
+        ("idx_polls_channel", "polls(channel_id)"),
+        ("idx_polls_message", "polls(message_id)"),
+        ("idx_polls_author", "polls(author_id)"),
+        ("idx_polls_active", "polls(is_active)"),
+        ("idx_poll_votes_poll", "poll_votes(poll_id)"),
+        ("idx_poll_votes_user", "poll_votes(user_id)"),
+
+        # Level System Indexes
+        ("idx_levels_user", "levels(user_id)"),
+        ("idx_levels_guild", "levels(guild_id)"),
+        ("idx_level_settings_guild", "level_settings(guild_id)"),
+
+        # Music System Indexes
+        ("idx_music_settings_guild", "music_settings(guild_id)"),
+        ("idx_playlists_guild", "playlists(guild_id)"),
+        ("idx_playlists_owner", "playlists(owner_id)"),
+        ("idx_playlist_songs_playlist", "playlist_songs(playlist_id)"),
+
+        # Reminder System Indexes
+        ("idx_reminders_guild", "reminders(guild_id)"),
+        ("idx_reminders_user", "reminders(user_id)"),
+        ("idx_reminders_trigger_time", "reminders(trigger_time)"),
+        ("idx_reminder_templates_guild", "reminder_templates(guild_id)"),
+        ("idx_reminder_settings_guild", "reminder_settings(guild_id)"),
+
+        # Welcome System Indexes
+        ("idx_welcome_settings_guild", "welcome_settings(guild_id)"),
+        ("idx_welcome_logs_guild", "welcome_logs(guild_id)"),
+        ("idx_welcome_logs_user", "welcome_logs(user_id)"),
+
+        # AutoMod System Indexes
+        ("idx_warnings_user", "warnings(user_id)"),
+        ("idx_warnings_guild", "warnings(guild_id)"),
+        ("idx_automod_settings_guild", "automod_settings(guild_id)"),
+
+        # Giveaway System Indexes
+        ("idx_giveaways_guild", "giveaways(guild_id)"),
+        ("idx_giveaways_channel", "giveaways(channel_id)"),
+        ("idx_giveaways_message", "giveaways(message_id)"),
+        ("idx_giveaways_host", "giveaways(host_id)"),
+        ("idx_giveaways_end_time", "giveaways(end_time)"),
+        ("idx_giveaway_entries_giveaway", "giveaway_entries(giveaway_id)"),
+        ("idx_giveaway_entries_user", "giveaway_entries(user_id)"),
+        ("idx_giveaway_settings_guild", "giveaway_settings(guild_id)")
+    ]
+
+    for idx_name, idx_cols in indexes:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_cols}")
+
+    # Insert default data
+    cursor.execute("""
+        INSERT OR IGNORE INTO world_info (id, world, owner, bot)
+        VALUES (1, 'YOURWORLD', 'OWNER', 'BOT')
+    """)
+
+    cursor.execute("""
+        INSERT OR IGNORE INTO role_permissions (role_id, permissions)
+        VALUES ('admin', 'all')
+    """)
+
+def _v2_cog_tables(cursor: sqlite3.Cursor):
+    """Tabel milik cog leveling, reputation, management dan automod"""
+    # User levels table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_levels (
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            xp INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 0,
+            messages INTEGER DEFAULT 0,
+            last_message TIMESTAMP,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """)
+
+    # Level rewards table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS level_rewards (
+            guild_id TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            role_id TEXT NOT NULL,
+            PRIMARY KEY (guild_id, level)
+        )
+    """)
+
+    # Leveling settings table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leveling_settings (
+            guild_id TEXT PRIMARY KEY,
+            enabled BOOLEAN DEFAULT TRUE,
+            announcement_channel TEXT,
+            min_xp INTEGER DEFAULT 15,
+            max_xp INTEGER DEFAULT 25,
+            cooldown INTEGER DEFAULT 60,
+            stack_rewards BOOLEAN DEFAULT TRUE,
+            ignored_channels TEXT,
+            ignored_roles TEXT,
+            double_xp_roles TEXT
+        )
+    """)
+
+    # Reputation settings
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reputation_settings (
+            guild_id TEXT PRIMARY KEY,
+            cooldown INTEGER DEFAULT 43200,
+            max_daily INTEGER DEFAULT 3,
+            min_message_age INTEGER DEFAULT 1800,
+            required_role TEXT,
+            blacklisted_roles TEXT,
+            log_channel TEXT,
+            auto_roles TEXT,
+            stack_roles BOOLEAN DEFAULT FALSE,
+            decay_enabled BOOLEAN DEFAULT FALSE,
+            decay_days INTEGER DEFAULT 30
+        )
+    """)
+
+    # User reputation
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_reputation (
+            user_id TEXT,
+            guild_id TEXT,
+            reputation INTEGER DEFAULT 0,
+            total_given INTEGER DEFAULT 0,
+            total_received INTEGER DEFAULT 0,
+            last_given DATETIME,
+            last_received DATETIME,
+            PRIMARY KEY (user_id, guild_id)
+        )
+    """)
+
+    # Reputation history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reputation_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            giver_id TEXT NOT NULL,
+            receiver_id TEXT NOT NULL,
+            message_id TEXT,
+            reason TEXT,
+            amount INTEGER DEFAULT 1,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Reputation roles
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reputation_roles (
+            guild_id TEXT,
+            reputation INTEGER,
+            role_id TEXT,
+            PRIMARY KEY (guild_id, reputation)
+        )
+    """)
+
+    # Server settings
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS server_settings (
+            guild_id TEXT PRIMARY KEY,
+            prefix TEXT DEFAULT '!',
+            auto_role TEXT,
+            mute_role TEXT,
+            mod_role TEXT,
+            admin_role TEXT,
+            suggestion_channel TEXT,
+            report_channel TEXT,
+            log_channel TEXT,
+            join_age INTEGER DEFAULT 0,
+            verification_required BOOLEAN DEFAULT FALSE
+        )
+    """)
+
+    # Channel permissions
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS channel_permissions (
+            guild_id TEXT,
+            channel_id TEXT,
+            role_id TEXT,
+            permission_type TEXT,
+            allowed BOOLEAN DEFAULT TRUE,
+            PRIMARY KEY (guild_id, channel_id, role_id, permission_type)
+        )
+    """)
+
+    # Scheduled tasks
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheduled_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT,
+            task_type TEXT,
+            execute_at DATETIME,
+            data TEXT,
+            created_by TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # AutoMod warnings
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS automod_warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            guild_id TEXT,
+            warning_type TEXT,
+            reason TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _v3_hot_query_indexes(cursor: sqlite3.Cursor):
+    """Index untuk bentuk query yang dipakai service (lihat queries.check_indexes)"""
+    # Redundan dengan index UNIQUE/PRIMARY KEY atau digantikan index komposit,
+    # idx_stock_status juga membuat planner memilih scan per status
+    for idx_name in (
+        'idx_stock_content',
+        'idx_stock_status',
+        'idx_stock_product_code',
+        'idx_user_growid_discord',
+        'idx_transactions_growid'
+    ):
+        cursor.execute(f"DROP INDEX IF EXISTS {idx_name}")
+
+    # Stock picking & stock count: hanya baris available, urut FIFO, covering
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_available
+        ON stock(product_code, added_at, content, status)
+        WHERE status = 'available'
+    """)
+
+    # Riwayat transaksi per GrowID, terbaru dulu
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_growid_created
+        ON transactions(growid, created_at)
+    """)
+
+    # Lookup case-insensitive untuk GrowID dan kode produk
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_growid_nocase
+        ON users(growid COLLATE NOCASE)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_products_code_nocase
+        ON products(code COLLATE NOCASE)
+    """)
+
+    cursor.execute("ANALYZE")
+
+def _v4_cache_tags(cursor: sqlite3.Cursor):
+    """Tag untuk invalidasi cache per kelompok key (CacheManager.invalidate_tag)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_tags (
+            tag TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (tag, key)
+        ) WITHOUT ROWID
+    """)
+
+    # Hapus tag saat key dihapus/expired, termasuk rentang prefix key
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cache_tags_key
+        ON cache_tags(key)
+    """)
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "core schema", _v1_core_schema),
+    Migration(2, "leveling, reputation, management and automod tables", _v2_cog_tables),
+    Migration(3, "indexes for hot stock, balance and transaction queries", _v3_hot_query_indexes),
+    Migration(4, "cache tag index", _v4_cache_tags),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Baca versi skema dari header database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Jalankan semua migration yang belum diterapkan.
+
+    Setiap migration berjalan dalam BEGIN IMMEDIATE sendiri dan versi dicek
+    ulang setelah lock didapat, sehingga aman jika dua proses start bersamaan.
+
+    Returns:
+        Versi skema setelah migrasi
+    """
+    current = get_schema_version(conn)
+    if current > SCHEMA_VERSION:
+        logger.warning(
+            f"Database schema version {current} is newer than this code "
+            f"({SCHEMA_VERSION}), skipping migrations"
+        )
+        return current
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = get_schema_version(conn)
+            if migration.version <= current:
+                conn.rollback()
+                continue
+
+            migration.apply(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {migration.version} ({migration.description}) failed")
+            raise
+
+        current = migration.version
+        logger.info(
+            f"Applied migration {migration.version}: {migration.description} "
+            f"({(time.perf_counter() - started) * 1000:.1f}ms)"
+        )
+
+    return current
@@ -0,0 +1,423 @@
+"""
+Query Registry
+Author: fdyytu
+Created at: 2026-10-18 05:40:00 UTC
+
+Registry statement SQL yang sering dipakai. Setiap Query punya nama dan
+teks SQL yang tetap, sehingga statement cache sqlite3 per koneksi
+(cached_statements) selalu hit dan statement tidak di-parse ulang.
+Eksekusi lewat Query dicatat per nama: jumlah eksekusi, error,
+total waktu dan histogram latency.
+"""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+# Batas atas bucket histogram latency (ms), bucket terakhir untuk sisanya
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+class Query:
+    """
+    Statement SQL bernama; teks SQL dinormalisasi agar cache key stabil.
+    `index` adalah index yang wajib muncul di query plan (dicek oleh
+    check_indexes), `covering` jika plan harus memakai covering index.
+    """
+    __slots__ = ('name', 'sql', 'index', 'covering')
+
+    def __init__(self, name: str, sql: str, index: Optional[str] = None, covering: bool = False):
+        self.name = name
+        self.sql = ' '.join(sql.split())
+        self.index = index
+        self.covering = covering
+
+    def __str__(self) -> str:
+        return self.sql
+
+    def __repr__(self) -> str:
+        return f"<Query {self.name}>"
+
+class _QueryStats:
+    """Counter dan histogram latency untuk satu query"""
+    __slots__ = ('count', 'errors', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float, error: bool):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total += elapsed_ms
+        if elapsed_ms > self.max:
+            self.max = elapsed_ms
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, p: float) -> float:
+        """Perkiraan persentil dari histogram (batas atas bucket)"""
+        if not self.count:
+            return 0.0
+        target = self.count * p
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+def _is_scan(detail: str) -> bool:
+    # json_each(?) hanya membaca daftar id dari parameter, bukan tabel
+    return detail.startswith('SCAN ') and not detail.startswith('SCAN json_each')
+
+class QueryRegistry:
+    """Daftar Query bernama beserta statistik eksekusinya (thread-safe)"""
+
+    def __init__(self):
+        self._queries: Dict[str, Query] = {}
+        self._stats: Dict[str, _QueryStats] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._queries
+
+    def register(self, name: str, sql: str, index: Optional[str] = None, covering: bool = False) -> Query:
+        """Daftarkan statement baru; nama yang sama harus punya SQL yang sama"""
+        query = Query(name, sql, index, covering)
+        existing = self._queries.get(name)
+        if existing is not None:
+            if existing.sql != query.sql:
+                raise ValueError(f"Query {name!r} already registered with different SQL")
+            return existing
+        self._queries[name] = query
+        return query
+
+    def get(self, name: str) -> Query:
+        return self._queries[name]
+
+    def check_indexes(self, conn: sqlite3.Connection) -> List[str]:
+        """
+        Jalankan EXPLAIN QUERY PLAN untuk setiap query yang punya `index`
+        dan pastikan index tersebut dipakai tanpa full scan atau sort.
+
+        Returns:
+            Daftar masalah; kosong jika semua hot query memakai index-nya
+        """
+        problems = []
+        for query in self._queries.values():
+            if not query.index:
+                continue
+            params = (None,) * query.sql.count('?')
+            try:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", params)]
+            except sqlite3.Error as e:
+                problems.append(f"{query.name}: cannot explain ({e})")
+                continue
+
+            details = ' | '.join(plan)
+            expected = f"COVERING INDEX {query.index}" if query.covering else query.index
+            if expected not in details:
+                problems.append(f"{query.name}: expected {expected}, plan: {details}")
+            elif any(_is_scan(d) or 'TEMP B-TREE' in d for d in plan):
+                problems.append(f"{query.name}: scan or temp b-tree in plan: {details}")
+        return problems
+
+    def record(self, name: str, elapsed_ms: float, error: bool = False):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _QueryStats()
+            stats.record(elapsed_ms, error)
+
+    @contextmanager
+    def track(self, sql: Union[str, Query]) -> Iterator[None]:
+        """Ukur waktu blok jika sql adalah Query; no-op untuk SQL biasa"""
+        if not isinstance(sql, Query):
+            yield
+            return
+        error = False
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(sql.name, (time.perf_counter() - started) * 1000, error)
+
+    def get_stats(self, limit: Optional[int] = None) -> List[Dict]:
+        """Statistik per query, diurutkan dari total waktu terbesar"""
+        with self._lock:
+            rows = [
+                {
+                    'name': name,
+                    'count': s.count,
+                    'errors': s.errors,
+                    'total_ms': round(s.total, 2),
+                    'avg_ms': round(s.total / s.count, 3) if s.count else 0,
+                    'p50_ms': s.percentile(0.50),
+                    'p95_ms': s.percentile(0.95),
+                    'p99_ms': s.percentile(0.99),
+                    'max_ms': round(s.max, 3),
+                    'histogram': dict(zip(
+                        [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"],
+                        s.buckets
+                    ))
+                }
+                for name, s in self._stats.items()
+            ]
+        rows.sort(key=lambda r: r['total_ms'], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+registry = QueryRegistry()
+register = registry.register
+track = registry.track
+check_indexes = registry.check_indexes
+
+def execute(conn: sqlite3.Connection, sql: Union[str, Query], params: Sequence = ()) -> sqlite3.Cursor:
+    """conn.execute yang menerima Query dan mencatat latency-nya"""
+    with track(sql):
+        return conn.execute(str(sql), params)
+
+# Balance
+
+GET_GROWID = register('balance.get_growid', """
+    SELECT growid FROM user_growid WHERE discord_id = ? COLLATE binary
+""", index='sqlite_autoindex_user_growid_1')
+
+FIND_GROWID_NOCASE = register('balance.find_growid_nocase', """
+    SELECT growid FROM users WHERE growid = ? COLLATE NOCASE
+""", index='idx_users_growid_nocase', covering=True)
+
+INSERT_USER = register('balance.insert_user', """
+    INSERT OR IGNORE INTO users (growid, balance_wl, balance_dl, balance_bgl)
+    VALUES (?, 0, 0, 0)
+""")
+
+LINK_GROWID = register('balance.link_growid', """
+    INSERT OR REPLACE INTO user_growid (discord_id, growid)
+    VALUES (?, ?)
+""")
+
+GET_BALANCE = register('balance.get', """
+    SELECT balance_wl, balance_dl, balance_bgl
+    FROM users
+    WHERE growid = ? COLLATE binary
+""", index='sqlite_autoindex_users_1')
+
+# User dengan perubahan balance terbaru, untuk warm-up cache saat startup
+RECENT_ACTIVE_USERS = register('balance.recent_active', """
+    SELECT u.growid, ug.discord_id, u.balance_wl, u.balance_dl, u.balance_bgl
+    FROM users u
+    LEFT JOIN user_growid ug ON ug.growid = u.growid
+    ORDER BY u.updated_at DESC
+    LIMIT ?
+""")
+
+# Update relatif dengan guard saldo: tidak menimpa perubahan lain
+# (mis. debit pembelian) yang commit di antara baca dan tulis
+ADJUST_BALANCE = register('balance.adjust', """
+    UPDATE users
+    SET balance_wl = balance_wl + ?, balance_dl = balance_dl + ?,
+        balance_bgl = balance_bgl + ?, updated_at = CURRENT_TIMESTAMP
+    WHERE growid = ? COLLATE binary
+    AND balance_wl + ? >= 0 AND balance_dl + ? >= 0 AND balance_bgl + ? >= 0
+    RETURNING balance_wl, balance_dl, balance_bgl
+""", index='sqlite_autoindex_users_1')
+
+INSERT_TRANSACTION = register('transactions.insert', """
+    INSERT INTO transactions
+    (growid, type, details, old_balance, new_balance, created_at)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+""")
+
+TRANSACTION_HISTORY = register('transactions.history', """
+    SELECT * FROM transactions
+    WHERE growid = ? COLLATE binary
+    ORDER BY created_at DESC
+    LIMIT ?
+""", index='idx_transactions_growid_created')
+
+# Products & stock
+
+GET_PRODUCT = register('products.get', """
+    SELECT * FROM products WHERE code = ? COLLATE NOCASE
+""", index='idx_products_code_nocase')
+
+ALL_PRODUCTS = register('products.all', """
+    SELECT * FROM products ORDER BY code
+""")
+
+INSERT_PRODUCT = register('products.insert', """
+    INSERT INTO products (code, name, price, description)
+    VALUES (?, ?, ?, ?)
+""")
+
+# Status ditulis literal agar partial index idx_stock_available bisa dipakai
+STOCK_DUPLICATE = register('stock.duplicate', """
+    SELECT id FROM stock
+    WHERE product_code = ? AND content = ?
+    AND status != 'deleted'
+""", index='sqlite_autoindex_stock_1')
+
+INSERT_STOCK = register('stock.insert', """
+    INSERT INTO stock (product_code, content, added_by, status)
+    VALUES (?, ?, ?, ?)
+""")
+
+AVAILABLE_STOCK = register('stock.available', """
+    SELECT id, content, added_at
+    FROM stock
+    WHERE product_code = ? AND status = 'available'
+    ORDER BY added_at ASC
+    LIMIT ?
+""", index='idx_stock_available', covering=True)
+
+# Id dikirim sebagai satu JSON array (lihat PURCHASE_SELL_STOCK)
+SET_STOCK_STATUS_MANY = register('stock.set_status_many', """
+    UPDATE stock
+    SET status = ?, updated_at = CURRENT_TIMESTAMP,
+        buyer_id = COALESCE(?, buyer_id)
+    WHERE id IN (SELECT value FROM json_each(?))
+    RETURNING id, product_code, content
+""", index='INTEGER PRIMARY KEY')
+
+STOCK_COUNT = register('stock.count', """
+    SELECT COUNT(*) as count
+    FROM stock
+    WHERE product_code = ? AND status = 'available'
+""", index='idx_stock_available', covering=True)
+
+# Purchase: dijalankan berurutan di satu job write queue (satu transaksi).
+# Id hasil StockReservationQueue dikirim sebagai satu JSON array agar
+# teks statement sama untuk semua quantity; guard status menolak id basi
+PURCHASE_SELL_STOCK = register('purchase.sell_stock', """
+    UPDATE stock
+    SET status = 'sold', buyer_id = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id IN (SELECT value FROM json_each(?)) AND status = 'available'
+    RETURNING id, content
+""", index='INTEGER PRIMARY KEY')
+
+# Debit hanya jika saldo cukup; 0 row berarti saldo kurang
+PURCHASE_DEBIT_BALANCE = register('purchase.debit_balance', """
+    UPDATE users
+    SET balance_wl = balance_wl - ?, updated_at = CURRENT_TIMESTAMP
+    WHERE growid = ? COLLATE binary AND balance_wl >= ?
+    RETURNING balance_wl, balance_dl, balance_bgl
+""", index='sqlite_autoindex_users_1')
+
+# Sengaja membaca seluruh idx_stock_available (covering, sudah urut
+# product_code) sekali untuk semua produk; tidak didaftarkan ke check_indexes
+STOCK_COUNTS = register('stock.counts', """
+    SELECT product_code, COUNT(*) AS count
+    FROM stock
+    WHERE status = 'available'
+    GROUP BY product_code
+""")
+
+GET_WORLD_INFO = register('world_info.get', """
+    SELECT * FROM world_info WHERE id = 1
+""")
+
+UPDATE_WORLD_INFO = register('world_info.update', """
+    UPDATE world_info
+    SET world = ?, owner = ?, bot = ?, status = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1
+""")
+
+# Cache (tier L2 CacheManager)
+
+# Tag digabung dengan separator \x1f (unit separator)
+CACHE_GET = register('cache.get', """
+    SELECT value, expires_at,
+        (SELECT group_concat(tag, char(31)) FROM cache_tags
+         WHERE cache_tags.key = cache.key) AS tags
+    FROM cache
+    WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)
+""", index='sqlite_autoindex_cache_1')
+
+CACHE_UPSERT = register('cache.upsert', """
+    INSERT OR REPLACE INTO cache (key, value, expires_at)
+    VALUES (?, ?, ?)
+""")
+
+CACHE_TAGS_CLEAR_EXPIRED = register('cache.tags_clear_expired', """
+    DELETE FROM cache_tags WHERE key IN (
+        SELECT key FROM cache WHERE expires_at <= ?
+    )
+""", index='idx_cache_expiry')
+
+CACHE_DELETE_EXPIRED = register('cache.delete_expired', """
+    DELETE FROM cache WHERE expires_at <= ?
+""", index='idx_cache_expiry')
+
+CACHE_STATS = register('cache.stats', """
+    SELECT COUNT(*) AS items, COALESCE(SUM(LENGTH(value)), 0) AS bytes FROM cache
+""")
+
+CACHE_DELETE = register('cache.delete', """
+    DELETE FROM cache WHERE key = ?
+""", index='sqlite_autoindex_cache_1')
+
+CACHE_DELETE_RANGE = register('cache.delete_range', """
+    DELETE FROM cache WHERE key >= ? AND key < ?
+""", index='sqlite_autoindex_cache_1')
+
+CACHE_TAG_INSERT = register('cache.tag_insert', """
+    INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)
+""")
+
+CACHE_TAGS_CLEAR_KEY = register('cache.tags_clear_key', """
+    DELETE FROM cache_tags WHERE key = ?
+""", index='idx_cache_tags_key')
+
+CACHE_TAGS_CLEAR_RANGE = register('cache.tags_clear_range', """
+    DELETE FROM cache_tags WHERE key >= ? AND key < ?
+""", index='idx_cache_tags_key')
+
+# INDEXED BY: dengan sqlite_stat1 tabel cache yang kecil (mis. shop.db
+# bawaan) planner memilih SCAN cache dan mencocokkan tiap row ke subquery
+CACHE_DELETE_TAG = register('cache.delete_tag', """
+    DELETE FROM cache INDEXED BY sqlite_autoindex_cache_1
+    WHERE key IN (SELECT key FROM cache_tags WHERE tag = ?)
+""", index='sqlite_autoindex_cache_1')
+
+CACHE_TAG_DELETE = register('cache.tag_delete', """
+    DELETE FROM cache_tags WHERE tag = ?
+""", index='PRIMARY KEY')
+
+# Leveling
+
+ADD_XP = register('leveling.add_xp', """
+    INSERT INTO user_levels (guild_id, user_id, xp, messages, last_message)
+    VALUES (?, ?, ?, 1, ?)
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET
+    xp = xp + ?,
+    messages = messages + 1,
+    last_message = ?
+""")
+
+GET_XP = register('leveling.get_xp', """
+    SELECT xp, level FROM user_levels
+    WHERE guild_id = ? AND user_id = ?
+""", index='sqlite_autoindex_user_levels_1')
+
+SET_LEVEL = register('leveling.set_level', """
+    UPDATE user_levels
+    SET level = ?
+    WHERE guild_id = ? AND user_id = ?
+""")
@@ -0,0 +1,321 @@
+"""
+Query Profiler
+Author: fdyytu
+Created at: 2026-10-18 06:10:00 UTC
+
+Profiler opt-in untuk semua statement SQLite yang lewat connection pool.
+Koneksi pool dibuat dengan ProfiledConnection; selama profiler aktif setiap
+statement dicatat wall time (execute + fetch), jumlah row dan modul
+pemanggilnya. Eksekusi paling lambat disimpan di tabel top-N, dan untuk
+statement di atas threshold EXPLAIN QUERY PLAN diambil otomatis.
+
+Saat profiler tidak aktif overhead-nya hanya satu pengecekan flag.
+"""
+
+import heapq
+import itertools
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from ext.constants import Database as DatabaseSettings
+
+logger = logging.getLogger(__name__)
+
+# Modul internal yang dilewati saat mencari modul pemanggil
+_INTERNAL_MODULES = frozenset({
+    __name__, 'database', 'db_executor', 'queries', 'connection_pool',
+    'contextlib', 'threading', 'concurrent.futures.thread', 'asyncio.events'
+})
+
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+class ProfileEntry:
+    """Satu eksekusi statement yang diprofile"""
+    __slots__ = ('sql', 'elapsed_ms', 'rows', 'module', 'timestamp', 'plan', 'slow')
+
+    def __init__(self, sql: str, elapsed_ms: float, rows: int, module: str):
+        self.sql = sql
+        self.elapsed_ms = elapsed_ms
+        self.rows = rows
+        self.module = module
+        self.timestamp = datetime.now(timezone.utc)
+        self.plan: Optional[List[str]] = None
+        self.slow = False
+
+    def to_dict(self) -> Dict:
+        return {
+            'sql': self.sql,
+            'elapsed_ms': round(self.elapsed_ms, 3),
+            'rows': self.rows,
+            'module': self.module,
+            'timestamp': self.timestamp.isoformat(),
+            'plan': self.plan
+        }
+
+class QueryProfiler:
+    """Kumpulkan statistik eksekusi dan tabel top-N statement paling lambat"""
+
+    MAX_CACHED_PLANS = 256
+
+    def __init__(self, slow_threshold_ms: float = 100.0, top_n: int = 20):
+        self.enabled = False
+        self.slow_threshold_ms = slow_threshold_ms
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._seq = itertools.count()
+        self._slowest: List = []
+        self._plans: Dict[str, List[str]] = {}
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self._stats = {
+            'statements': 0,
+            'rows': 0,
+            'total_ms': 0.0,
+            'slow': 0,
+            'started_at': None
+        }
+
+    def enable(self, slow_threshold_ms: Optional[float] = None, top_n: Optional[int] = None):
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = slow_threshold_ms
+        if top_n is not None:
+            self.top_n = top_n
+        with self._lock:
+            if self._stats['started_at'] is None:
+                self._stats['started_at'] = datetime.now(timezone.utc).isoformat()
+        self.enabled = True
+        logger.info(f"Query profiler enabled (slow threshold {self.slow_threshold_ms}ms, top {self.top_n})")
+
+    def disable(self):
+        self.enabled = False
+        logger.info("Query profiler disabled")
+
+    def reset(self):
+        with self._lock:
+            self._slowest.clear()
+            self._plans.clear()
+            self._reset_counters()
+            if self.enabled:
+                self._stats['started_at'] = datetime.now(timezone.utc).isoformat()
+
+    # Caller attribution
+
+    @contextmanager
+    def attribute(self, module: Optional[str]) -> Iterator[None]:
+        """
+        Tandai statement di thread ini sebagai milik `module`.
+        Dipakai executor/write queue karena stack thread worker tidak
+        berisi frame modul yang mengirim query.
+        """
+        previous = getattr(self._local, 'module', None)
+        self._local.module = module
+        try:
+            yield
+        finally:
+            self._local.module = previous
+
+    @staticmethod
+    def get_caller() -> str:
+        """Cari modul pertama di luar lapisan database"""
+        frame = sys._getframe(1)
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '')
+            if module not in _INTERNAL_MODULES:
+                return module
+            frame = frame.f_back
+        return 'unknown'
+
+    def _current_module(self) -> str:
+        return getattr(self._local, 'module', None) or self.get_caller()
+
+    # Recording
+
+    def record(self, sql: str, elapsed_ms: float, rows: int) -> ProfileEntry:
+        entry = ProfileEntry(sql, elapsed_ms, rows, self._current_module())
+        with self._lock:
+            self._stats['statements'] += 1
+            self._stats['rows'] += max(rows, 0)
+            self._stats['total_ms'] += elapsed_ms
+        return entry
+
+    def add_fetch(self, entry: ProfileEntry, elapsed_ms: float, rows: int):
+        """Tambahkan waktu dan row dari fetch* ke entry yang sudah tercatat"""
+        entry.elapsed_ms += elapsed_ms
+        entry.rows += rows
+        with self._lock:
+            self._stats['rows'] += rows
+            self._stats['total_ms'] += elapsed_ms
+
+    def finish(self, entry: ProfileEntry, conn: sqlite3.Connection, params) -> None:
+        """Masukkan entry ke tabel top-N dan ambil query plan jika lambat"""
+        if not entry.slow and entry.elapsed_ms >= self.slow_threshold_ms:
+            entry.slow = True
+            entry.plan = self._explain(conn, entry.sql, params)
+            with self._lock:
+                self._stats['slow'] += 1
+            logger.warning(
+                f"Slow query ({entry.elapsed_ms:.1f}ms, {entry.rows} rows) "
+                f"from {entry.module}: {entry.sql}"
+            )
+
+        with self._lock:
+            item = (entry.elapsed_ms, next(self._seq), entry)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, item)
+            elif entry.elapsed_ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def _explain(self, conn: sqlite3.Connection, sql: str, params) -> Optional[List[str]]:
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        with self._lock:
+            plan = self._plans.get(sql)
+        if plan is not None:
+            return plan
+        try:
+            # Cursor biasa agar EXPLAIN sendiri tidak ikut diprofile
+            cursor = sqlite3.Cursor(conn)
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            cursor.close()
+            plan = [row[3] for row in rows]
+        except sqlite3.Error as e:
+            logger.debug(f"Could not explain query: {e}")
+            return None
+        with self._lock:
+            if len(self._plans) >= self.MAX_CACHED_PLANS:
+                self._plans.clear()
+            self._plans[sql] = plan
+        return plan
+
+    # Reporting
+
+    def get_slow_queries(self) -> List[Dict]:
+        """Tabel top-N, dari yang paling lambat"""
+        with self._lock:
+            entries = sorted(self._slowest, key=lambda item: item[0], reverse=True)
+        return [entry.to_dict() for _, _, entry in entries]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['slow_threshold_ms'] = self.slow_threshold_ms
+        stats['top_n'] = self.top_n
+        stats['total_ms'] = round(stats['total_ms'], 2)
+        stats['avg_ms'] = round(stats['total_ms'] / stats['statements'], 3) if stats['statements'] else 0
+        return stats
+
+profiler = QueryProfiler(
+    slow_threshold_ms=DatabaseSettings.SLOW_QUERY_MS,
+    top_n=DatabaseSettings.PROFILER_TOP_N
+)
+
+def _normalize(sql: str) -> str:
+    return ' '.join(sql.split())
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor yang mencatat statement ke profiler saat aktif.
+    Untuk SELECT, waktu dan jumlah row dari fetch pertama ikut dihitung;
+    statement yang hasilnya tidak pernah di-fetch dicatat saat cursor
+    dipakai ulang atau ditutup.
+    """
+    _entry: Optional[ProfileEntry] = None
+    _params = ()
+
+    def _flush(self):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            profiler.finish(entry, self.connection, self._params)
+
+    def execute(self, sql, parameters=()):
+        if self._entry is not None:
+            self._flush()
+        if not profiler.enabled:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, parameters, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._entry is not None:
+            self._flush()
+        if not profiler.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        if not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, seq_of_parameters[0] if seq_of_parameters else (), started)
+
+    def _record(self, sql, parameters, started: float):
+        elapsed = (time.perf_counter() - started) * 1000
+        returns_rows = self.description is not None
+        self._entry = profiler.record(_normalize(sql), elapsed, 0 if returns_rows else self.rowcount)
+        self._params = parameters
+        if not returns_rows:
+            self._flush()
+
+    def _fetched(self, started: float, rows: int):
+        profiler.add_fetch(self._entry, (time.perf_counter() - started) * 1000, rows)
+        self._flush()
+
+    def fetchone(self):
+        if self._entry is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self._entry is None:
+            return super().fetchmany(size)
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        if self._entry is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def close(self):
+        if self._entry is not None:
+            self._flush()
+        super().close()
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection factory untuk pool; cursor-nya diprofile saat profiler aktif"""
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = ProfiledCursor if profiler.enabled else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if not profiler.enabled:
+            return super().execute(sql, parameters)
+        return self.cursor(ProfiledCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not profiler.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor(ProfiledCursor).executemany(sql, seq_of_parameters)